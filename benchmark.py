@@ -0,0 +1,732 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from enums import *
+
+
+def bench_vec_env(num_envs: int, steps: int, seed: int = 0):
+    from stable_baselines3.common.vec_env import DummyVecEnv
+    from environment import FiggieEnv
+    from vec_env import FiggieVecEnv
+
+    def run(env):
+        env.seed(seed)
+        env.reset()
+        rng = np.random.default_rng(seed)
+        actions = np.stack([rng.integers(0, n, size=(steps, num_envs)) for n in env.action_space.nvec], axis=-1)
+        start = time.perf_counter()
+        for i in range(steps):
+            env.step(actions[i])
+        return steps * num_envs / (time.perf_counter() - start)
+
+    results = {
+        'DummyVecEnv(FiggieEnv)': run(DummyVecEnv([FiggieEnv for _ in range(num_envs)])),
+        'FiggieVecEnv': run(FiggieVecEnv(num_envs)),
+    }
+    for name, steps_per_sec in results.items():
+        print(f'{name:<24} {num_envs:>6} tables {steps_per_sec:>14,.0f} steps/sec')
+    return results
+
+
+def bench_workers(num_envs: int, steps: int, max_workers: int, seed: int = 0):
+    from vec_env import FiggieVecEnv, SharedMemoryFiggieVecEnv
+
+    rng = np.random.default_rng(seed)
+    actions = np.stack([rng.integers(0, n, size=(steps, num_envs)) for n in [3, 4, 150, 2]], axis=-1)
+
+    def run(env):
+        env.seed(seed)
+        env.reset()
+        start = time.perf_counter()
+        for i in range(steps):
+            env.step(actions[i])
+        elapsed = time.perf_counter() - start
+        env.close()
+        return steps * num_envs / elapsed
+
+    results = {0: run(FiggieVecEnv(num_envs))}
+    print(f'{"in-process":<12} {results[0]:>14,.0f} steps/sec')
+    workers = 1
+    while workers <= max_workers:
+        results[workers] = run(SharedMemoryFiggieVecEnv(num_envs, workers))
+        print(f'{workers:>3} workers  {results[workers]:>14,.0f} steps/sec  x{results[workers] / results[0]:.2f}')
+        workers *= 2
+    return results
+
+
+def record_order_flow(games: int, seed: int = 0) -> list:
+    # Order book calls made by random bots playing the game.py __main__ loop
+    from game import FiggieGame, FiggiePlayer
+    from orderbook import SuitOrderBook
+
+    trace = []
+
+    class RecordingSuitOrderBook(SuitOrderBook):
+        def reset(self):
+            trace.append(('reset',))
+            super().reset()
+
+        def post_order(self, player_id, suit, price, side):
+            trace.append(('post_order', player_id, suit, price, side))
+            super().post_order(player_id, suit, price, side)
+
+        def best_bid(self, suit):
+            trace.append(('best_bid', suit))
+            return super().best_bid(suit)
+
+        def best_ask(self, suit):
+            trace.append(('best_ask', suit))
+            return super().best_ask(suit)
+
+    game = FiggieGame([FiggiePlayer(i) for i in range(4)])
+    game.seed(seed)
+    game.orderbook = RecordingSuitOrderBook(list(FiggieSuit))
+    for _ in range(games):
+        game.reset(False)
+        while not game.game_has_ended():
+            player = game.random.choice(game.players)
+            best_buys = []
+            best_sells = []
+            for suit in FiggieSuit:
+                best_buys.append(game.orderbook.best_bid(suit)[0])
+                best_sells.append(game.orderbook.best_ask(suit)[0])
+            action = player.generate_action({'best_buys': best_buys, 'best_sells': best_sells})
+            game.apply_action(player.player_id, action)
+            game.advance_game_one_second()
+    return trace
+
+
+def bench_orderbook(games: int, repeats: int, seed: int = 0):
+    from orderbook import SuitOrderBook, OrderBook, LadderOrderBook
+
+    trace = record_order_flow(games, seed)
+
+    def replay(book):
+        results = []
+        for call in trace:
+            if call[0] == 'reset':
+                book.reset()
+            elif call[0] == 'post_order':
+                book.post_order(*call[1:])
+            else:
+                results.append(getattr(book, call[0])(call[1]))
+        return results
+
+    class RebuildingSuitOrderBook(SuitOrderBook):
+        # Heap books thrown away and reallocated on every reset
+        def reset(self):
+            self.books = {suit: OrderBook() for suit in self.suits}
+
+    engines = {
+        'heap (rebuild on reset)': RebuildingSuitOrderBook(list(FiggieSuit), OrderBook),
+        'heap': SuitOrderBook(list(FiggieSuit), OrderBook),
+        'ladder': SuitOrderBook(list(FiggieSuit), LadderOrderBook),
+    }
+    # Every engine must answer every query of the recorded flow identically
+    reference = None
+    for name, book in engines.items():
+        results = replay(book)
+        if reference is not None and results != reference:
+            raise AssertionError(f'{name} order book diverges from the heap order book')
+        reference = results
+
+    results = {}
+    for name, book in engines.items():
+        best = min(timeit(lambda: replay(book), repeats))
+        results[name] = len(trace) / best
+        print(f'{name:<24} {len(trace):>9,} calls {results[name]:>14,.0f} calls/sec')
+    return results
+
+
+def bench_game(games: int, repeats: int, seed: int = 0):
+    # Games/sec of the game.py __main__ loop: deal, random bots for 240 seconds, final scores
+    from game import FiggieGame, FiggiePlayer, play_random_game
+
+    game = FiggieGame([FiggiePlayer(i) for i in range(4)])
+    game.seed(seed)
+
+    def run():
+        for _ in range(games):
+            play_random_game(game)
+            game.get_final_scores()
+
+    run()
+    best = min(timeit(run, repeats))
+    games_per_sec = games / best
+    print(f'game.py loop {games:>6} games {games_per_sec:>10,.1f} games/sec {games_per_sec * 240:>12,.0f} actions/sec')
+    return games_per_sec
+
+
+def bench_env(steps: int, seed: int = 0):
+    # FiggieEnv.step throughput under uniformly random agent actions
+    from environment import FiggieEnv
+
+    env = FiggieEnv()
+    env.reset(seed=seed)
+    rng = np.random.default_rng(seed)
+    actions = np.stack([rng.integers(0, n, size=steps) for n in env.action_space.nvec], axis=-1)
+    start = time.perf_counter()
+    for action in actions:
+        _, _, terminated, _, _ = env.step(action)
+        if terminated:
+            env.reset()
+    steps_per_sec = steps / (time.perf_counter() - start)
+    print(f'FiggieEnv.step {steps:>8} steps {steps_per_sec:>12,.0f} steps/sec')
+    return steps_per_sec
+
+
+def bench_bots(num_tables: int, repeats: int, seed: int = 0):
+    # Bot decisions/sec of FiggiePlayer.generate_action against BotPolicyEngine for 3 bot seats
+    from bots import BotPolicyEngine, strategy_params
+    from game import FiggiePlayer, RandomStream
+
+    rng = np.random.default_rng(seed)
+    best_buys = rng.integers(0, 15, size=(num_tables, 4))
+    best_sells = rng.integers(0, 25, size=(num_tables, 4))
+    hands = rng.integers(0, 4, size=(num_tables, 3, 4))
+    cash = rng.integers(0, 400, size=(num_tables, 3))
+
+    players = [FiggiePlayer(i) for i in range(3)]
+    stream = RandomStream(np.random.default_rng(seed))
+    for player in players:
+        player.random = stream
+    offers = [{'best_buys': best_buys[i].tolist(), 'best_sells': best_sells[i].tolist()} for i in range(num_tables)]
+
+    hand_lists = hands.tolist()
+    cash_lists = cash.tolist()
+
+    def run_scalar():
+        for i in range(num_tables):
+            for seat, player in enumerate(players):
+                player.hand = hand_lists[i][seat]
+                player.cash = cash_lists[i][seat]
+                player.generate_action(offers[i])
+
+    engine = BotPolicyEngine(strategy_params(None, num_tables, 3))
+
+    def run_engine():
+        engine.act(best_buys, best_sells, hands, cash, rng)
+
+    results = {
+        'FiggiePlayer.generate_action': num_tables * 3 / min(timeit(run_scalar, repeats)),
+        'BotPolicyEngine.act': num_tables * 3 / min(timeit(run_engine, repeats)),
+    }
+    for name, decisions_per_sec in results.items():
+        print(f'{name:<30} {decisions_per_sec:>14,.0f} decisions/sec')
+    return results
+
+
+def bench_events(steps: int, seed: int = 0):
+    # FiggieEnv.step throughput with game events logged as text (the previous train.py setup),
+    # recorded as binary events, and disabled
+    import logging
+    import tempfile
+    from environment import FiggieEnv
+    from events import BinaryEventRecorder, LoggingEventRecorder, NULL_EVENTS
+
+    rng = np.random.default_rng(seed)
+    actions = np.stack([rng.integers(0, n, size=steps) for n in [3, 4, 150, 2]], axis=-1)
+
+    def run(events, render_mode=None):
+        env = FiggieEnv(render_mode, events=events)
+        env.reset(seed=seed)
+        start = time.perf_counter()
+        for action in actions:
+            _, _, terminated, _, _ = env.step(action)
+            if terminated:
+                env.reset()
+        events.flush()
+        return steps / (time.perf_counter() - start)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        root = logging.getLogger()
+        handler = logging.FileHandler(os.path.join(directory, 'figgie.log'))
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+        previous_level = root.level
+        root.addHandler(handler)
+        root.setLevel(logging.INFO)
+        try:
+            results['text log (INFO file)'] = run(LoggingEventRecorder(), 'human')
+        finally:
+            root.removeHandler(handler)
+            handler.close()
+            root.setLevel(previous_level)
+        events = BinaryEventRecorder(os.path.join(directory, 'figgie.events'))
+        results['binary events'] = run(events, 'human')
+        events.close()
+        results['events off'] = run(NULL_EVENTS, 'human')
+    for name, steps_per_sec in results.items():
+        print(f'{name:<22} {steps_per_sec:>12,.0f} steps/sec')
+    return results
+
+
+def bench_state(count: int, repeats: int, seed: int = 0):
+    # Snapshots/sec of FiggieGame.get_state, set_state and clone halfway through a game
+    from events import NULL_EVENTS
+    from environment import FiggieEnv
+
+    env = FiggieEnv(events=NULL_EVENTS)
+    env.reset(seed=seed)
+    for _ in range(120):
+        env.step(env.action_space.sample())
+    game = env.game
+    state = game.get_state()
+    calls = {
+        'get_state': game.get_state,
+        'set_state': lambda: game.set_state(state),
+        'clone': game.clone,
+    }
+    results = {}
+    for name, call in calls.items():
+        def run():
+            for _ in range(count):
+                call()
+        results[name] = count / min(timeit(run, repeats))
+        print(f'FiggieGame.{name:<10} {results[name]:>12,.0f} calls/sec ({len(state)} byte state)')
+    return results
+
+
+# Benchmark suite: every case takes a seed and returns (run, units per run, unit). run() does
+# the same seeded work on every call and may return the seconds of its timed section when
+# part of it is setup, otherwise the whole call is timed.
+
+# Dependencies the simulator core must not import
+HEAVY_MODULES = ('gymnasium', 'stable_baselines3', 'torch', 'matplotlib')
+# Import statements timed by bench_imports. 'worker' is what a spawned rollout worker runs before
+# its first step: train.py as its main module (under __mp_main__, so its main block is skipped)
+# and shared_rollout
+IMPORT_CASES = {
+    'enums': 'import enums',
+    'game': 'import game',
+    'vec_game': 'import vec_game',
+    'environment': 'import environment',
+    'vec_env': 'import vec_env',
+    'worker': "import runpy; runpy.run_path('train.py', run_name='__mp_main__'); import shared_rollout",
+}
+
+
+def bench_imports(cases: list, repeats: int):
+    # Import time of each case in a fresh interpreter, the median over repeats runs, with the
+    # whole process lifetime and the heavy dependencies it pulled in
+    import subprocess
+    root = os.path.dirname(os.path.abspath(__file__))
+    script = ('import sys, time\nstart = time.perf_counter()\n{}\nelapsed = time.perf_counter() - start\n'
+              f'print(elapsed, *[m for m in {HEAVY_MODULES!r} if m in sys.modules])')
+    print(f'{"case":<14}{"import ms":>12}{"process ms":>12}  heavy modules')
+    results = {}
+    for name in cases:
+        imports, processes = [], []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            output = subprocess.run([sys.executable, '-c', script.format(IMPORT_CASES[name])], cwd=root,
+                                    capture_output=True, text=True, check=True).stdout.split()
+            processes.append(time.perf_counter() - start)
+            imports.append(float(output[0]))
+        results[name] = (float(np.median(imports)), float(np.median(processes)), output[1:])
+        print(f'{name:<14}{results[name][0] * 1e3:>12.1f}{results[name][1] * 1e3:>12.1f}  {" ".join(output[1:]) or "-"}')
+    return results
+
+
+def _mid_game_env(seed: int, seconds: int = 120):
+    from environment import FiggieEnv
+    from events import NULL_EVENTS
+
+    env = FiggieEnv(events=NULL_EVENTS)
+    env.reset(seed=seed)
+    rng = np.random.default_rng(seed)
+    for _ in range(seconds):
+        env.step([rng.integers(n) for n in env.action_space.nvec])
+    return env
+
+
+def case_game_loop(seed: int, games: int = 50):
+    from game import FiggieGame, FiggiePlayer, play_random_game
+
+    game = FiggieGame([FiggiePlayer(i) for i in range(4)])
+
+    def run():
+        game.seed(seed)
+        for _ in range(games):
+            play_random_game(game, player_knocked_out=True)
+            game.get_final_scores()
+    return run, games, 'games'
+
+
+def case_env_step(seed: int, steps: int = 10_000, continuous: bool = False):
+    from config import FiggieConfig
+    from environment import FiggieEnv
+    from events import NULL_EVENTS
+
+    env = FiggieEnv(events=NULL_EVENTS, config=FiggieConfig(continuous=continuous))
+    rng = np.random.default_rng(seed)
+    actions = np.stack([rng.integers(0, n, size=steps) for n in env.action_space.nvec], axis=-1)
+
+    def run():
+        env.reset(seed=seed)
+        start = time.perf_counter()
+        for action in actions:
+            _, _, terminated, _, _ = env.step(action)
+            if terminated:
+                env.reset()
+        return time.perf_counter() - start
+    return run, steps, 'steps'
+
+
+def case_env_reset(seed: int, resets: int = 5_000):
+    from environment import FiggieEnv
+    from events import NULL_EVENTS
+
+    env = FiggieEnv(events=NULL_EVENTS)
+
+    def run():
+        env.reset(seed=seed)
+        for _ in range(resets - 1):
+            env.reset()
+    return run, resets, 'resets'
+
+
+def case_get_obs(seed: int, calls: int = 50_000):
+    env = _mid_game_env(seed)
+
+    def run():
+        for _ in range(calls):
+            env._get_obs()
+    return run, calls, 'calls'
+
+
+def case_generate_action(seed: int, calls: int = 20_000):
+    from game import RandomStream
+
+    env = _mid_game_env(seed)
+    bots = env.players[1:]
+    offers = env.game.get_offers()
+
+    def run():
+        stream = RandomStream(np.random.default_rng(seed))
+        for player in bots:
+            player.random = stream
+        for _ in range(calls // len(bots)):
+            for player in bots:
+                player.generate_action(offers)
+    return run, calls // len(bots) * len(bots), 'decisions'
+
+
+def case_bot_engine(seed: int, num_tables: int = 4096, calls: int = 20):
+    from bots import BotPolicyEngine, strategy_params
+
+    rng = np.random.default_rng(seed)
+    best_buys = rng.integers(0, 15, size=(num_tables, 4))
+    best_sells = rng.integers(0, 25, size=(num_tables, 4))
+    hands = rng.integers(0, 4, size=(num_tables, 3, 4))
+    cash = rng.integers(0, 400, size=(num_tables, 3))
+    engine = BotPolicyEngine(strategy_params(None, num_tables, 3))
+
+    def run():
+        rng = np.random.default_rng(seed)
+        for _ in range(calls):
+            engine.act(best_buys, best_sells, hands, cash, rng)
+    return run, calls * num_tables * 3, 'decisions'
+
+
+def _order_windows(seed: int, games: int = 20) -> list:
+    # Orders posted by random bots between two book resets, as (suit, side, price, player_id)
+    windows = [[]]
+    for call in record_order_flow(games, seed):
+        if call[0] == 'reset':
+            if windows[-1]:
+                windows.append([])
+        elif call[0] == 'post_order':
+            _, player_id, suit, price, side = call
+            windows[-1].append((suit.value, side.value, price, player_id))
+    return [window for window in windows if window]
+
+
+def _orderbook_cases(book_class):
+    # post: every recorded window posted then cleared, best: best bid and ask of full books,
+    # pop: full books drained through pop_best_bid / pop_best_ask
+    def case_post(seed: int):
+        windows = _order_windows(seed)
+        books = [book_class() for _ in FiggieSuit]
+
+        def run():
+            for window in windows:
+                for suit, side, price, player_id in window:
+                    books[suit].post_order(side, price, player_id)
+                for book in books:
+                    book.clear()
+        return run, sum(len(window) for window in windows), 'orders'
+
+    def filled_books(seed: int):
+        books = [book_class() for _ in FiggieSuit]
+        for window in _order_windows(seed):
+            for suit, side, price, player_id in window:
+                books[suit].post_order(side, price, player_id)
+        return books
+
+    def case_best(seed: int, rounds: int = 50_000):
+        books = filled_books(seed)
+
+        def run():
+            for _ in range(rounds):
+                for book in books:
+                    book.best_bid()
+                    book.best_ask()
+        return run, rounds * len(books) * 2, 'queries'
+
+    def case_pop(seed: int):
+        windows = _order_windows(seed)
+        count = sum(len(window) for window in windows)
+
+        def run():
+            books = filled_books(seed)
+            start = time.perf_counter()
+            for book in books:
+                while book.pop_best_bid()[1] != -1:
+                    pass
+                while book.pop_best_ask()[1] != -1:
+                    pass
+            return time.perf_counter() - start
+        return run, count, 'orders'
+
+    return case_post, case_best, case_pop
+
+
+def case_vec_env_step(seed: int, num_envs: int = 256, steps: int = 100):
+    from vec_env import FiggieVecEnv
+
+    env = FiggieVecEnv(num_envs)
+    rng = np.random.default_rng(seed)
+    actions = np.stack([rng.integers(0, n, size=(steps, num_envs)) for n in env.action_space.nvec], axis=-1)
+
+    def run():
+        env.seed(seed)
+        env.reset()
+        start = time.perf_counter()
+        for i in range(steps):
+            env.step(actions[i])
+        return time.perf_counter() - start
+    return run, steps * num_envs, 'steps'
+
+
+def _ppo_rollout_case(make_env, n_steps: int):
+    # End-to-end PPO rollout collection: policy forward passes, env steps and rollout buffer writes
+    def case(seed: int):
+        from stable_baselines3 import PPO
+
+        model = PPO('MultiInputPolicy', make_env(), n_steps=n_steps, seed=seed, device='cpu', verbose=0)
+        _, callback = model._setup_learn(model.n_steps * model.n_envs, None)
+        callback.on_training_start(locals(), globals())
+
+        def run():
+            model.set_random_seed(seed)
+            model._last_obs = model.env.reset()
+            start = time.perf_counter()
+            model.collect_rollouts(model.env, callback, model.rollout_buffer, n_rollout_steps=model.n_steps)
+            return time.perf_counter() - start
+        return run, n_steps * model.n_envs, 'steps'
+    return case
+
+
+def _figgie_env():
+    from environment import FiggieEnv
+    from events import NULL_EVENTS
+    return FiggieEnv(events=NULL_EVENTS)
+
+
+def _figgie_vec_env():
+    from vec_env import FiggieVecEnv
+    return FiggieVecEnv(64)
+
+
+def suite_cases() -> dict:
+    from orderbook import LadderOrderBook, OrderBook
+
+    cases = {
+        'game.loop': case_game_loop,
+        'env.step': case_env_step,
+        # Same actions with continuous matching, to compare against the wipe mode of env.step
+        'env.step.continuous': lambda seed: case_env_step(seed, continuous=True),
+        'env.reset': case_env_reset,
+        'env.get_obs': case_get_obs,
+        'bots.generate_action': case_generate_action,
+        'bots.engine': case_bot_engine,
+    }
+    for name, book_class in [('heap', OrderBook), ('ladder', LadderOrderBook)]:
+        for op, case in zip(['post', 'best', 'pop'], _orderbook_cases(book_class)):
+            cases[f'orderbook.{name}.{op}'] = case
+    cases['vec_env.step'] = case_vec_env_step
+    cases['ppo.rollout.env'] = _ppo_rollout_case(_figgie_env, 1024)
+    cases['ppo.rollout.vec_env'] = _ppo_rollout_case(_figgie_vec_env, 64)
+    return cases
+
+
+def measure(run, units: int, warmup: int, trials: int) -> dict:
+    # Rate statistics over trials runs of run, after warmup untimed runs. As in the timeit
+    # module the garbage collector stays off while a trial runs.
+    import gc
+    for _ in range(warmup):
+        run()
+    rates = []
+    for _ in range(trials):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            elapsed = run()
+            if elapsed is None:
+                elapsed = time.perf_counter() - start
+        finally:
+            gc.enable()
+        rates.append(units / elapsed)
+    rates = np.array(rates)
+    return {
+        'units': units,
+        'mean': float(rates.mean()),
+        'std': float(rates.std(ddof=1)) if trials > 1 else 0.0,
+        'min': float(rates.min()),
+        'median': float(np.median(rates)),
+        'max': float(rates.max()),
+        'trials': rates.tolist(),
+    }
+
+
+def _metadata(seed: int, warmup: int, trials: int) -> dict:
+    import platform
+    import subprocess
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'seed': seed,
+        'warmup': warmup,
+        'trials': trials,
+    }
+
+
+def run_suite(only: list = None, seed: int = 0, warmup: int = 1, trials: int = 5, path: str = None) -> dict:
+    # Runs every suite case whose name contains one of only (all cases by default) and
+    # optionally writes the results as JSON, to be diffed against another commit with compare
+    results = {}
+    print(f'{"case":<26}{"rate/sec":>16}{"std":>8}{"min":>16}{"max":>16}  unit')
+    for name, case in suite_cases().items():
+        if only and not any(pattern in name for pattern in only):
+            continue
+        run, units, unit = case(seed)
+        result = measure(run, units, warmup, trials)
+        result['unit'] = unit
+        results[name] = result
+        cv = result['std'] / result['mean'] * 100
+        print(f'{name:<26}{result["mean"]:>16,.0f}{cv:>7.1f}%{result["min"]:>16,.0f}{result["max"]:>16,.0f}  {unit}')
+    report = {'meta': _metadata(seed, warmup, trials), 'results': results}
+    if path:
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+def compare(old_path: str, new_path: str, threshold: float = 0.1) -> list:
+    # Mean rate of every case in both reports, flagging cases that slowed down by more than threshold
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f'{old["meta"].get("commit")} -> {new["meta"].get("commit")}')
+    regressions = []
+    for name, result in new['results'].items():
+        if name not in old['results']:
+            continue
+        ratio = result['mean'] / old['results'][name]['mean']
+        flag = ''
+        if ratio < 1 - threshold:
+            flag = 'REGRESSION'
+            regressions.append(name)
+        print(f'{name:<26}{old["results"][name]["mean"]:>16,.0f}{result["mean"]:>16,.0f}  x{ratio:.2f}  {flag}')
+    return regressions
+
+
+def timeit(fn, repeats: int) -> list:
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Figgie simulator benchmarks')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+    vec_parser = subparsers.add_parser('vecenv', help='FiggieVecEnv against DummyVecEnv(FiggieEnv)')
+    vec_parser.add_argument('--tables', type=int, default=1024)
+    vec_parser.add_argument('--steps', type=int, default=200)
+    workers_parser = subparsers.add_parser('workers', help='SharedMemoryFiggieVecEnv scaling over worker processes')
+    workers_parser.add_argument('--tables', type=int, default=4096)
+    workers_parser.add_argument('--steps', type=int, default=200)
+    workers_parser.add_argument('--max-workers', type=int, default=os.cpu_count())
+    book_parser = subparsers.add_parser('orderbook', help='Heap against ladder order book under random-bot order flow')
+    book_parser.add_argument('--games', type=int, default=200)
+    book_parser.add_argument('--repeats', type=int, default=5)
+    game_parser = subparsers.add_parser('game', help='Games/sec of the game.py __main__ loop')
+    game_parser.add_argument('--games', type=int, default=200)
+    game_parser.add_argument('--repeats', type=int, default=5)
+    env_parser = subparsers.add_parser('env', help='FiggieEnv.step throughput')
+    env_parser.add_argument('--steps', type=int, default=30_000)
+    bots_parser = subparsers.add_parser('bots', help='Scalar bots against the batched bot policy engine')
+    bots_parser.add_argument('--tables', type=int, default=4096)
+    bots_parser.add_argument('--repeats', type=int, default=5)
+    events_parser = subparsers.add_parser('events', help='Text logging against binary event recording')
+    events_parser.add_argument('--steps', type=int, default=30_000)
+    state_parser = subparsers.add_parser('state', help='Game state snapshot, restore and clone')
+    state_parser.add_argument('--count', type=int, default=5000)
+    state_parser.add_argument('--repeats', type=int, default=5)
+    imports_parser = subparsers.add_parser('imports', help='Import time of the simulator modules and of a rollout worker')
+    imports_parser.add_argument('--cases', nargs='*', default=list(IMPORT_CASES), choices=list(IMPORT_CASES))
+    imports_parser.add_argument('--repeats', type=int, default=5)
+    suite_parser = subparsers.add_parser('suite', help='Every component with warmup, repeated trials and JSON output')
+    suite_parser.add_argument('--only', nargs='*', default=None, help='Run the cases whose name contains any of these')
+    suite_parser.add_argument('--seed', type=int, default=0)
+    suite_parser.add_argument('--warmup', type=int, default=1)
+    suite_parser.add_argument('--trials', type=int, default=5)
+    suite_parser.add_argument('--json', default=None, help='Write the results to this file')
+    compare_parser = subparsers.add_parser('compare', help='Diff two suite JSON files, exits 1 on a regression')
+    compare_parser.add_argument('old')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--threshold', type=float, default=0.1, help='Slowdown that counts as a regression')
+    args = parser.parse_args()
+    if args.benchmark == 'vecenv':
+        bench_vec_env(args.tables, args.steps)
+    elif args.benchmark == 'workers':
+        bench_workers(args.tables, args.steps, args.max_workers)
+    elif args.benchmark == 'orderbook':
+        bench_orderbook(args.games, args.repeats)
+    elif args.benchmark == 'game':
+        bench_game(args.games, args.repeats)
+    elif args.benchmark == 'bots':
+        bench_bots(args.tables, args.repeats)
+    elif args.benchmark == 'events':
+        bench_events(args.steps)
+    elif args.benchmark == 'suite':
+        run_suite(args.only, args.seed, args.warmup, args.trials, args.json)
+    elif args.benchmark == 'compare':
+        if compare(args.old, args.new, args.threshold):
+            sys.exit(1)
+    elif args.benchmark == 'state':
+        bench_state(args.count, args.repeats)
+    elif args.benchmark == 'env':
+        bench_env(args.steps)
+    elif args.benchmark == 'imports':
+        bench_imports(args.cases, args.repeats)
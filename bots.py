@@ -0,0 +1,91 @@
+from dataclasses import dataclass, fields, astuple
+
+import numpy as np
+
+from enums import *
+
+
+@dataclass(frozen=True)
+class BotStrategy:
+    # Heuristic bot: pick a suit and a side at random, then
+    # - BUY side: quote a bid in [bid_low, bid_high] on an empty book when cash >= min_cash_to_bid,
+    #   otherwise sell into a bid >= sell_at_bid when holding the card
+    # - SELL side: quote an ask in [ask_low, ask_high] on an empty book when holding the card,
+    #   otherwise buy from an ask <= buy_at_ask when cash >= min_cash_to_buy
+    bid_low: int = 0
+    bid_high: int = 10
+    ask_low: int = 10
+    ask_high: int = 20
+    sell_at_bid: int = 7
+    buy_at_ask: int = 13
+    min_cash_to_bid: int = 10
+    min_cash_to_buy: int = 13
+
+
+STRATEGY_FIELDS = tuple(field.name for field in fields(BotStrategy))
+
+
+def strategy_params(strategies, num_tables: int, num_seats: int) -> dict:
+    # Strategy parameters as int64 arrays of shape (num_tables, num_seats). strategies is either
+    # one BotStrategy for every seat, one BotStrategy per seat, a (num_tables, num_seats) nested
+    # sequence of BotStrategy or a dict of arrays broadcastable to (num_tables, num_seats)
+    if strategies is None:
+        strategies = BotStrategy()
+    if isinstance(strategies, dict):
+        return {name: np.broadcast_to(np.asarray(strategies[name], dtype=np.int64), (num_tables, num_seats)).copy()
+                for name in STRATEGY_FIELDS}
+    if isinstance(strategies, BotStrategy):
+        values = np.array(astuple(strategies), dtype=np.int64)
+    else:
+        values = np.array([[astuple(s) for s in row] if not isinstance(row, BotStrategy) else astuple(row)
+                           for row in strategies], dtype=np.int64)
+    values = np.broadcast_to(values, (num_tables, num_seats, len(STRATEGY_FIELDS)))
+    return {name: values[:, :, i].copy() for i, name in enumerate(STRATEGY_FIELDS)}
+
+
+def random_population(num_tables: int, num_seats: int, low: BotStrategy, high: BotStrategy, rng=None) -> dict:
+    # Every (table, seat) bot draws each parameter uniformly between the values in low and high
+    rng = np.random.default_rng(rng)
+    return {name: rng.integers(getattr(low, name), getattr(high, name) + 1, size=(num_tables, num_seats))
+            for name in STRATEGY_FIELDS}
+
+
+class BotPolicyEngine:
+    # Computes the actions of heuristic bots for many tables and seats at once from a single
+    # batched RNG draw. Actions use the MultiDiscrete([3, 4, 150, 2]) encoding of FiggieEnv:
+    # [action, suit, price, side], price is only meaningful for SHOW.
+    def __init__(self, params: dict):
+        self.params = params
+
+    def act(self, best_buys: np.ndarray, best_sells: np.ndarray, hands: np.ndarray, cash: np.ndarray,
+            rng: np.random.Generator, seats=slice(None)) -> np.ndarray:
+        # best_buys / best_sells: (N, suits), hands: (N, K, suits), cash: (N, K) for the K seats
+        # selected by seats from the parameter columns. Returns (N, K, 4) int64 actions.
+        p = {name: values[:, seats] for name, values in self.params.items()}
+        n, k = cash.shape
+        draw = rng.random((n, k, 3))
+        suit = (draw[:, :, 0] * len(FiggieSuit)).astype(np.int64)
+        buy = draw[:, :, 1] < 0.5
+        rows = np.arange(n)[:, None]
+        best_buy = best_buys[rows, suit]
+        best_sell = best_sells[rows, suit]
+        held = np.take_along_axis(hands, suit[:, :, None], axis=2)[:, :, 0] > 0
+
+        show_bid = buy & (best_buy == 0) & (cash >= p['min_cash_to_bid'])
+        take_bid = buy & ~show_bid & (best_buy >= p['sell_at_bid']) & held
+        show_ask = ~buy & (best_sell == 0) & held
+        take_ask = ~buy & ~show_ask & (best_sell <= p['buy_at_ask']) & (cash >= p['min_cash_to_buy'])
+
+        low = np.where(show_bid, p['bid_low'], p['ask_low'])
+        high = np.where(show_bid, p['bid_high'], p['ask_high'])
+        price = low + (draw[:, :, 2] * (high - low + 1)).astype(np.int64)
+
+        actions = np.empty((n, k, 4), dtype=np.int64)
+        show = show_bid | show_ask
+        actions[:, :, 0] = np.where(show, FiggieInGameAction.SHOW.value,
+                                    np.where(take_bid | take_ask, FiggieInGameAction.TAKE.value, FiggieInGameAction.PASS.value))
+        actions[:, :, 1] = suit
+        actions[:, :, 2] = np.where(show, price, 0)
+        # Selling into a bid or quoting an ask is a SELL intent, the rest are BUY
+        actions[:, :, 3] = np.where(take_bid | show_ask, FiggieSide.SELL.value, FiggieSide.BUY.value)
+        return actions
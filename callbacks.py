@@ -0,0 +1,116 @@
+import os
+
+import numpy as np
+from stable_baselines3.common.callbacks import BaseCallback
+
+from metrics import TrainingMetrics, format_snapshot, write_snapshot
+from profiling import merge, summarize
+
+
+class ProfileCallback(BaseCallback):
+    # Logs the step profile of environments created with a profiling.Profiler every log_every
+    # steps, as profile/<phase>_us_per_step, profile/<phase>_share and profile/<counter>_per_step
+    # over the steps since the previous log. Totals are read from the 'profile' entry that
+    # profiled environments put in their step info, so this works with any VecEnv.
+    def __init__(self, log_every: int = 2048, verbose: int = 0):
+        super().__init__(verbose)
+        self.log_every = log_every
+        self.latest = {}
+        self.last_logged = None
+
+    def _on_step(self) -> bool:
+        for i, info in enumerate(self.locals.get('infos', [])):
+            if 'profile' in info:
+                self.latest[i] = info['profile']
+        if self.n_calls % self.log_every == 0 and self.latest:
+            totals = merge(self.latest.values())
+            last = self.last_logged or dict.fromkeys(totals, 0)
+            self.last_logged = totals
+            for key, value in summarize({key: value - last[key] for key, value in totals.items()}).items():
+                self.logger.record(f'profile/{key}', value)
+        return True
+
+
+class SelfPlayCallback(BaseCallback):
+    # Adds a snapshot of the policy being trained to a multi_agent.OpponentPool when training
+    # starts and then every snapshot_every steps, so pool seats face past versions of the learner
+    def __init__(self, pool, snapshot_every: int = 50_000, verbose: int = 0):
+        super().__init__(verbose)
+        self.pool = pool
+        self.snapshot_every = snapshot_every
+
+    def _on_training_start(self):
+        self.pool.add(self.model.policy)
+
+    def _on_step(self) -> bool:
+        if self.n_calls % self.snapshot_every == 0:
+            self.pool.add(self.model.policy)
+            self.logger.record('self_play/snapshots', len(self.pool))
+        return True
+
+
+class CurriculumCallback(BaseCallback):
+    # Switches the training environments to the config of the current config.Curriculum stage,
+    # through their set_config method, whenever the number of timesteps enters a new stage
+    def __init__(self, curriculum, verbose: int = 0):
+        super().__init__(verbose)
+        self.curriculum = curriculum
+        self.stage = None
+
+    def _update(self):
+        stage = self.curriculum.stage_at(self.num_timesteps)
+        if stage != self.stage:
+            self.stage = stage
+            config = self.curriculum.stages[stage][1]
+            self.training_env.env_method('set_config', config)
+            self.logger.record('curriculum/stage', stage)
+            self.logger.record('curriculum/game_seconds', config.game_seconds)
+
+    def _on_training_start(self):
+        self._update()
+
+    def _on_step(self) -> bool:
+        self._update()
+        return True
+
+
+class MetricsCallback(BaseCallback):
+    # Folds the reward, PnL, knock-outs, trades and actions of every training episode into a
+    # metrics.TrainingMetrics and appends a snapshot of it to path every snapshot_every calls
+    # (steps of the whole VecEnv) and when training ends, so nothing of the run is kept in memory. Render the snapshots
+    # with python metrics.py report.
+    def __init__(self, path: str = './logs/metrics.jsonl', snapshot_every: int = 10_000, verbose: int = 0):
+        super().__init__(verbose)
+        self.path = path
+        self.snapshot_every = snapshot_every
+        self.metrics = None
+
+    def _on_training_start(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        env = self.training_env
+        self.metrics = TrainingMetrics(env.num_envs, int(env.action_space.nvec[2]))
+        self.metrics.start(self.model._last_obs)
+
+    def _on_step(self) -> bool:
+        dones = self.locals['dones']
+        infos = self.locals['infos']
+        terminal_obs = {row: infos[row]['terminal_observation'] for row in np.flatnonzero(dones)}
+        self.metrics.step(self.locals['actions'], self.locals['rewards'], dones, self.locals['new_obs'], terminal_obs)
+        if self.n_calls % self.snapshot_every == 0:
+            self._snapshot()
+        return True
+
+    def _on_training_end(self):
+        self._snapshot()
+
+    def _snapshot(self):
+        snapshot = self.metrics.snapshot(self.num_timesteps)
+        write_snapshot(self.path, snapshot)
+        window = snapshot['window']
+        if window['episodes']:
+            self.logger.record('figgie/episode_reward', window['reward']['mean'])
+            self.logger.record('figgie/pnl', window['pnl']['mean'])
+            self.logger.record('figgie/trades_per_episode', window['trades']['mean'])
+            self.logger.record('figgie/knockout_rate', window['knockout_rate'])
+        if self.verbose:
+            print(format_snapshot(snapshot))
@@ -0,0 +1,190 @@
+import asyncio
+from collections import deque
+import select
+import socket
+
+import gymnasium as gym
+import numpy as np
+
+from config import FiggieConfig
+from environment import figgie_action_space, figgie_observation_space
+from protocol import (ACTION, ACTION_PAYLOAD, BACKPRESSURE, BACKPRESSURE_PAYLOAD, ERROR, ERROR_PAYLOAD, JOIN,
+                      JOIN_PAYLOAD, NEW_GAME, OBSERVATIONS, SEATED, SEATED_PAYLOAD, TERMINATED, frame, split_frames,
+                      unpack_observations)
+
+# OBSERVATION tuple fields
+FLAGS = -1
+REWARD = -2
+
+
+def connect(address, timeout: float = None) -> socket.socket:
+    # address is a (host, port) pair for TCP or a Unix socket path
+    if isinstance(address, str):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.settimeout(timeout)
+    sock.connect(address)
+    return sock
+
+
+class FiggieClientEnv(gym.Env):
+    # Gymnasium environment playing one seat of a server.FiggieServer table in real time, so
+    # agents built on any framework can play each other from separate processes. Episodes are
+    # games as in FiggieEnv: reset waits for the next game to start at the table and step sends
+    # the action and blocks for the observation of the next tick. The server does not wait:
+    # an action that misses the tick deadline is discarded and the seat passes. A client that
+    # falls behind skips to the newest observation it received, but never past the end of a
+    # game, and a game whose end was missed ends the episode as truncated.
+    # info['dropped_ticks'] counts the ticks the server dropped for this connection.
+    metadata = {'render_modes': []}
+
+    def __init__(self, address=('127.0.0.1', 7777), table: int = -1, seat: int = -1, timeout: float = 30.0):
+        self.timeout = timeout
+        self.sock = connect(address, timeout)
+        self.buffer = bytearray()
+        self.records = deque()
+        self.handle = None
+        self.dropped_ticks = 0
+        self.sock.sendall(frame(JOIN, JOIN_PAYLOAD.pack(table, seat)))
+        while self.handle is None:
+            self._receive(True)
+        self.action_space = figgie_action_space(self.config)
+        self.observation_space = figgie_observation_space(False, self.config)
+        self.tick = None
+        # First observation of a game reached while the episode before it was running
+        self.next_start = None
+
+    def _receive(self, block: bool):
+        # Reads what the server sent, waiting up to timeout for something when block is set
+        while True:
+            ready, _, _ = select.select([self.sock], [], [], self.timeout if block else 0)
+            if not ready:
+                if block:
+                    raise TimeoutError(f'Nothing received from the server for {self.timeout}s')
+                return
+            data = self.sock.recv(1 << 16)
+            if not data:
+                raise ConnectionError('The server closed the connection')
+            self.buffer += data
+            for message_type, payload in split_frames(self.buffer):
+                if message_type == OBSERVATIONS:
+                    tick, records = unpack_observations(payload)
+                    self.records.extend((tick, record) for record in records if record[0] == self.handle)
+                elif message_type == BACKPRESSURE:
+                    _, self.dropped_ticks, _ = BACKPRESSURE_PAYLOAD.unpack(payload)
+                elif message_type == SEATED:
+                    self._seated(*SEATED_PAYLOAD.unpack(payload))
+                elif message_type == ERROR:
+                    code, = ERROR_PAYLOAD.unpack_from(payload)
+                    raise ConnectionError(f'Server error {code}: {payload[ERROR_PAYLOAD.size:].decode()}')
+            block = block and not self.records and self.handle is not None
+
+    def _seated(self, handle, table, seat, num_players, start_cash, ante, game_seconds, tick_seconds, price_levels,
+                max_cash, continuous):
+        self.handle = handle
+        self.table = table
+        self.seat = seat
+        self.config = FiggieConfig(num_players=num_players, start_cash=start_cash, ante=ante,
+                                   game_seconds=game_seconds, tick_seconds=tick_seconds, price_levels=price_levels,
+                                   max_cash=max_cash, continuous=bool(continuous))
+
+    def _next_record(self):
+        if not self.records:
+            self._receive(True)
+        self._receive(False)
+        tick, record = self.records.popleft()
+        # Observations overtaken by a newer one of the same game are skipped
+        while (self.records and not record[FLAGS] & (NEW_GAME | TERMINATED)
+               and not self.records[0][1][FLAGS] & NEW_GAME):
+            tick, record = self.records.popleft()
+        self.tick = tick
+        return record
+
+    @staticmethod
+    def _obs(record) -> dict:
+        cash = record[13]
+        return {
+            'best_buys': np.array(record[1:5]),
+            'best_sells': np.array(record[5:9]),
+            'own_cards': np.array(record[9:13]),
+            'own_cash': int(cash) if cash.is_integer() else cash,
+            'time_left': record[14],
+        }
+
+    def reset(self, seed=None, options=None):
+        # Games are dealt by the server, seed only seeds the action space
+        super().reset(seed=seed)
+        record, self.next_start = self.next_start, None
+        while record is None or not record[FLAGS] & NEW_GAME:
+            record = self._next_record()
+        return self._obs(record), {'tick': self.tick, 'table': self.table, 'seat': self.seat}
+
+    def step(self, action):
+        self.sock.sendall(frame(ACTION, ACTION_PAYLOAD.pack(self.handle, self.tick, *(int(a) for a in action))))
+        record = self._next_record()
+        info = {'tick': self.tick, 'dropped_ticks': self.dropped_ticks}
+        if record[FLAGS] & NEW_GAME:
+            # The end of the last game was dropped, this observation starts the next episode
+            self.next_start = record
+            return self._obs(record), 0.0, False, True, info
+        return self._obs(record), record[REWARD], bool(record[FLAGS] & TERMINATED), False, info
+
+    def close(self):
+        self.sock.close()
+
+
+async def _simulated_client(address, seats: list, slow: bool, seed):
+    # One connection playing seats, a list of (table, seat), with uniformly random actions.
+    # A slow client has a small receive window and stalls now and then, so the server has to
+    # apply backpressure (over TCP, Unix sockets buffer on the sending side).
+    sock = socket.socket(socket.AF_UNIX if isinstance(address, str) else socket.AF_INET, socket.SOCK_STREAM)
+    if slow:
+        # Set before connecting, so that TCP advertises the small window
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    sock.setblocking(False)
+    await asyncio.get_running_loop().sock_connect(sock, address)
+    if isinstance(address, str):
+        reader, writer = await asyncio.open_unix_connection(sock=sock, limit=1 << 16)
+    else:
+        reader, writer = await asyncio.open_connection(sock=sock, limit=1 << 16)
+    writer.write(b''.join(frame(JOIN, JOIN_PAYLOAD.pack(table, seat)) for table, seat in seats))
+    rng = np.random.default_rng(seed)
+    high = np.array([3, 4, FiggieConfig().price_levels, 2])
+    buffer = bytearray()
+    frames = 0
+    while True:
+        try:
+            data = await reader.read(1 << 16)
+        except ConnectionError:
+            break
+        if not data:
+            break
+        buffer += data
+        for message_type, payload in split_frames(buffer):
+            if message_type != OBSERVATIONS:
+                continue
+            frames += 1
+            tick, records = unpack_observations(payload)
+            actions = rng.integers(0, high, (len(records), 4)).tolist()
+            writer.write(b''.join(frame(ACTION, ACTION_PAYLOAD.pack(record[0], tick, *action))
+                                  for record, action in zip(records, actions) if not record[FLAGS] & TERMINATED))
+        if slow and frames % 100 == 0:
+            writer.transport.pause_reading()
+            await asyncio.sleep(3.0)
+            writer.transport.resume_reading()
+    writer.close()
+
+
+def run_simulated_clients(address, connections: int, agents: int, slow_clients: int = 0, seed=None):
+    # Seats agents simulated agents at seats 1 to 3 of consecutive tables, leaving seat 0 to
+    # the bots, spread over connections client connections of which slow_clients are slow
+    seats = [(agent // 3, 1 + agent % 3) for agent in range(agents)]
+    seeds = np.random.SeedSequence(seed).spawn(connections)
+
+    async def main():
+        await asyncio.gather(*(_simulated_client(address, seats[i::connections], i < slow_clients, seeds[i])
+                               for i in range(connections)))
+
+    asyncio.run(main())
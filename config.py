@@ -0,0 +1,70 @@
+from dataclasses import dataclass, replace
+
+
+@dataclass(frozen=True)
+class FiggieConfig:
+    # Rules of a Figgie game and the bounds of the spaces derived from them.
+    # - num_players seats, each starting a series of games with start_cash and paying ante per game.
+    #   A player finishing a game with less than ante is knocked out and everyone starts over.
+    # - game_seconds long games advancing tick_seconds per tick, every seat acting once per tick,
+    #   so a game lasts ceil(game_seconds / tick_seconds) ticks
+    # - quotes priced 0..price_levels - 1, the agent's cash observed up to max_cash
+    # - continuous matching: a SHOW crossing the best opposite quote trades at once, every
+    #   player keeps at most one quote per suit and side, and a trade only cancels the quotes
+    #   of the two players involved. Without it any TAKE wipes every book, as in the original game.
+    num_players: int = 4
+    start_cash: int = 350
+    ante: int = 50
+    game_seconds: int = 240
+    tick_seconds: int = 1
+    price_levels: int = 150
+    max_cash: int = 1199
+    continuous: bool = False
+
+    def __post_init__(self):
+        if self.num_players < 2:
+            raise ValueError(f'Figgie needs at least 2 players, got {self.num_players}')
+        if self.game_seconds < 1 or self.tick_seconds < 1:
+            raise ValueError('game_seconds and tick_seconds must be positive')
+
+    @property
+    def ticks(self) -> int:
+        return -(-self.game_seconds // self.tick_seconds)
+
+    def replace(self, **changes) -> 'FiggieConfig':
+        return replace(self, **changes)
+
+
+DEFAULT_CONFIG = FiggieConfig()
+
+
+class Curriculum:
+    # Configs to train on one after the other. stages is a list of (timesteps, config) pairs:
+    # every stage lasts its timesteps, the last one lasts until training ends.
+    # Stages must keep the spaces of the environment they are applied to (see FiggieEnv.set_config),
+    # which is why short games are shortened from a full length environment.
+    def __init__(self, stages: list):
+        if not stages:
+            raise ValueError('A curriculum needs at least one stage')
+        self.stages = stages
+
+    def stage_at(self, timesteps: int) -> int:
+        end = 0
+        for stage, (length, _) in enumerate(self.stages[:-1]):
+            end += length
+            if timesteps < end:
+                return stage
+        return len(self.stages) - 1
+
+    def config_at(self, timesteps: int) -> FiggieConfig:
+        return self.stages[self.stage_at(timesteps)][1]
+
+    @classmethod
+    def parse(cls, spec: str, base: FiggieConfig = DEFAULT_CONFIG) -> 'Curriculum':
+        # 'SECONDS:TIMESTEPS,...,SECONDS' game lengths and how long to train on each, e.g.
+        # '30:200000,120:200000,240' plays 30 second games for 200k steps, then 120, then full games
+        stages = []
+        for part in spec.split(','):
+            seconds, _, timesteps = part.partition(':')
+            stages.append((int(timesteps) if timesteps else 0, base.replace(game_seconds=int(seconds))))
+        return cls(stages)
@@ -1,26 +1,53 @@
 import logging
+import struct
+from time import perf_counter_ns
 
 import gymnasium as gym
 from gymnasium import spaces
 from gymnasium.envs.registration import register
-from gymnasium.utils.env_checker import check_env
 import numpy as np
 
-from game import FiggieGame, FiggieSide, FiggiePlayer
+from config import DEFAULT_CONFIG, FiggieConfig
+from game import FiggieGame, FiggieSide, FiggiePlayer, seat_reward
+from events import EventRecorder, LoggingEventRecorder
+from posterior import PosteriorEngine
+from profiling import Profiler, ACTION, MATCHING, BOTS, OBSERVATION, SCORING, LOGGING, RESET, GAMES
+from telemetry import ActionTelemetry
 from enums import *
 
-# Register this module as a gym environment. Once registered, the id is usable in gym.make().
-register(
-    id='figgie-env',                                # call it whatever you want
-    entry_point='environment:FiggieEnv', # module_name:class_name
-)
+ENV_ID = 'figgie-env'
 
-action_log = {
-    'action': [],
-    'suit': [],
-    'price': [],
-    'side': []
-}
+
+def register_env():
+    # Registers FiggieEnv as ENV_ID, after which gym.make(ENV_ID) works. Importing this module
+    # registers nothing, so processes that only need the environment class skip it.
+    if ENV_ID not in gym.registry:
+        register(
+            id=ENV_ID,
+            entry_point='environment:FiggieEnv', # module_name:class_name
+        )
+
+# Agent actions of every environment that is not given its own telemetry
+action_telemetry = ActionTelemetry()
+
+def figgie_action_space(config: FiggieConfig = DEFAULT_CONFIG) -> spaces.MultiDiscrete:
+    return spaces.MultiDiscrete([3, 4, config.price_levels, 2])
+
+
+def figgie_observation_space(posterior: bool = False, config: FiggieConfig = DEFAULT_CONFIG) -> spaces.Dict:
+    prices = config.price_levels + 1
+    observation_space = {
+        'best_buys': spaces.MultiDiscrete([prices, prices, prices, prices]),
+        'best_sells': spaces.MultiDiscrete([prices, prices, prices, prices]),
+        'own_cards': spaces.MultiDiscrete([13, 13, 13, 13]),
+        'own_cash': spaces.Discrete(config.max_cash + 1),
+        'time_left': spaces.Discrete(config.game_seconds + 1),
+    }
+    if posterior:
+        # Goal suit probabilities and the expected payout of one more card per suit, see posterior.py
+        observation_space['goal_posterior'] = spaces.Box(0, 1, (4,), dtype=np.float32)
+        observation_space['suit_values'] = spaces.Box(-200, 200, (4,), dtype=np.float32)
+    return spaces.Dict(observation_space)
 
 # Implement our own gym env, must inherit from gym.Env
 # https://gymnasium.farama.org/api/env/
@@ -30,13 +57,27 @@ class FiggieEnv(gym.Env):
     # render_fps is not used in our env, but we are require to declare a non-zero value.
     metadata = {"render_modes": ["human"], 'render_fps': 1}
 
-    def __init__(self, render_mode=None):
+    def __init__(self, render_mode=None, telemetry: ActionTelemetry = None, events: EventRecorder = None,
+                 profiler: Profiler = None, posterior: PosteriorEngine = None, config: FiggieConfig = DEFAULT_CONFIG):
         
         self.render_mode = render_mode
+        self.telemetry = action_telemetry if telemetry is None else telemetry
+        self.telemetry.fit_prices(config.price_levels)
+        # Game events go to the root logger as INFO lines unless another recorder is given
+        self.events = LoggingEventRecorder() if events is None else events
+        # Per-phase timers and counters, only collected when a profiler is given
+        self.profiler = profiler
+        # Adds the goal_posterior and suit_values observations when given
+        self.posterior = posterior
+        if posterior is not None and config.num_players != 4:
+            raise ValueError('The posterior engine models 4 player games')
+        # Rules of the games, set_config changes them from the next reset on
+        self.config = config
+        self.next_config = None
 
         # Initialize the Figgie problem
-        self.players = [FiggiePlayer(0), FiggiePlayer(1), FiggiePlayer(2), FiggiePlayer(3)]
-        self.game = FiggieGame(self.players)
+        self.players = [FiggiePlayer(i, config=config) for i in range(config.num_players)]
+        self.game = FiggieGame(self.players, events=self.events, profiler=profiler, config=config)
 
         # Gym requires defining the action space. The action space is player's set of possible actions.
         # Training code can call action_space.sample() to randomly select an action.
@@ -45,49 +86,54 @@ class FiggieEnv(gym.Env):
         # Array 2 = price
         # Array 3 = buy / sell (as per Side class)
 
-        self.action_space = spaces.MultiDiscrete([3, 4, 150, 2])
+        self.action_space = figgie_action_space(config)
 
         # Gym requires defining the observation space. The observation space consists of the best bids / asks per suit
-        self.observation_space = spaces.Dict(
-            {
-            'best_buys': spaces.MultiDiscrete([151, 151, 151, 151]),
-            'best_sells': spaces.MultiDiscrete([151, 151, 151, 151]),
-            'own_cards': spaces.MultiDiscrete([13, 13, 13, 13]),
-            'own_cash': spaces.Discrete(1200),
-            'time_left': spaces.Discrete(241),
-            }
-        )
+        self.observation_space = figgie_observation_space(posterior is not None, config)
         
         self.latest_action = 0
         self.latest_obs = 0
         self.player_knocked_out = False
         self.player_start_cash = 0
+        # Cards the agent was dealt and the most of every suit it held at once, the evidence of the posterior
+        self.dealt_cards = np.zeros(4, dtype=int)
+        self.seen_cards = np.zeros(4, dtype=int)
+        # get_state appends the series state to the game state: knocked out flag, agent start cash,
+        # dealt and seen cards
+        self._series_state = struct.Struct('<?d4B4B')
 
     def _get_obs(self):
-        best_buys = []
-        best_sells = []
-        agent_hand = []
-        for suit in FiggieSuit:
-            bid = self.game.orderbook.best_bid(suit)
-            ask = self.game.orderbook.best_ask(suit)
-            best_buys.append(bid[0] if bid else 0.0)
-            best_sells.append(ask[0] if ask else 0.0)
-            agent_hand.append(self.game.players[0].get_suit_count(suit))
-        return {
-            'best_buys': np.array(best_buys),
-            'best_sells': np.array(best_sells),
-            'own_cards': np.array(agent_hand),
-            'own_cash': self.game.players[0].cash,
-            'time_left': self.game.seconds_passed
-        }
+        obs = self.game.get_observation(0)
+        if self.posterior is not None:
+            hand = obs['own_cards']
+            np.maximum(self.seen_cards, hand, out=self.seen_cards)
+            # Both lookups hit the engine's caches unless the hand or the evidence changed
+            goal_probs, _ = self.posterior.posterior(self.dealt_cards, 0, self.seen_cards)
+            obs['goal_posterior'] = goal_probs.astype(np.float32)
+            obs['suit_values'] = self.posterior.suit_values(hand, self.dealt_cards, 0, self.seen_cards).astype(np.float32)
+        return obs
 
     # Gym required function (and parameters) to reset the environment
     def reset(self, seed=None, options=None):
+        profiler = self.profiler
+        if profiler is not None:
+            t = perf_counter_ns()
         # Reset superclass
         super().reset(seed=seed)
+        if seed is not None:
+            # A seeded reset draws the game and the bots from np_random and starts a new series
+            # of games from full cash, so the same seed always plays out the same way
+            self.game.seed(self.np_random)
+            self.player_knocked_out = True
+        if self.next_config is not None:
+            self.config = self.next_config
+            self.next_config = None
+            self.game.configure(self.config)
         # Reset game, reset player_knocked_out when done
         self.game.reset(self.player_knocked_out)
         self.player_knocked_out = False
+        self.dealt_cards[:] = self.game.hands[0]
+        self.seen_cards[:] = self.dealt_cards
         # Construct observation state
         self.latest_obs = self._get_obs()
         # Reset action state
@@ -96,16 +142,27 @@ class FiggieEnv(gym.Env):
         self.player_start_cash = self.game.players[0].cash
         # Additional info to return. For debugging or whatever.
         info = {}
+        if profiler is not None:
+            t = profiler.lap(RESET, t)
         # Render environment
         if(self.render_mode=='human'):
             self.render()
+        if profiler is not None:
+            profiler.lap(LOGGING, t)
+            info['profile'] = profiler.totals()
         # Return observation and info
         return self.latest_obs, info
 
     # Gym required function (and parameters) to perform an action
     def step(self, action):
+        # With a profiler, t is the clock at the start of the current phase
+        profiler = self.profiler
+        if profiler is not None:
+            t = perf_counter_ns()
         #Initialize
         terminated = False
+        # What the agent saw and did, for events.step (the bots below reuse the name action)
+        obs, agent_action = self.latest_obs, action
         converted_action = FiggieAction(
             FiggieInGameAction(action[0]),
             FiggieSuit(action[1]),
@@ -113,66 +170,156 @@ class FiggieEnv(gym.Env):
             action[2]
             )
         self.latest_action = converted_action
-        self._log_agent_action(converted_action)
+        if profiler is not None:
+            t = profiler.lap(ACTION, t)
+        self.telemetry.record(converted_action)
+        if profiler is not None:
+            t = profiler.lap(LOGGING, t)
         #Check if game has ended
         reward = 0
         if self.game.game_has_ended():
-            logging.info('---GAME HAS ENDED---')
-            for player in self.game.players:
-                logging.info(f'Player {player.player_id} holds {player.get_suit_count(self.game.goal_suit)} of {self.game.goal_suit}')
             final_cash_from_round = self.game.get_final_scores()
             # Assign final cash to players
             for i, player in enumerate(self.game.players):
                 player.cash = final_cash_from_round[i]
-            logging.info(f'Final scores: {final_cash_from_round}')
             # Reward agent relative to how it placed in the round
             agent_payout = final_cash_from_round[0]
-            reward = agent_payout - self.player_start_cash
-            # If any player has final cash < 50, reset all players cash to restart a series of games
-            if any(final_cash < 50 for final_cash in final_cash_from_round):
-                logging.info('Player knocked, resetting all cash')
+            # If the agent is the one that cannot pay the ante assign punishment
+            ante = self.config.ante
+            reward = seat_reward(agent_payout, self.player_start_cash, ante)
+            # If any player cannot pay the next ante, reset all players cash to restart a series of games
+            if any(final_cash < ante for final_cash in final_cash_from_round):
                 self.player_knocked_out = True
-            # If the agent is the one with final cash < 50 assign punishment
-            if agent_payout < 50:
-                logging.info('Agent knocked, punishing')
-                reward = -1000
-            logging.info(f'Reward to agent: {reward}')
+            if profiler is not None:
+                t = profiler.lap(SCORING, t)
+                profiler.counts[GAMES] += 1
+            if self.events.games:
+                holdings = [player.get_suit_count(self.game.goal_suit) for player in self.game.players]
+                self.events.game_end(self.game.goal_suit.value, holdings, final_cash_from_round,
+                                     self.player_knocked_out, agent_payout < ante, reward)
             terminated=True
-        else:
+        elif profiler is None:
             # Agent acts
             self.game.apply_action(0, converted_action)
             # Other players act
             for player in self.players[1:]:
-                # Fetch latest game state
-                last_obs = self._get_obs()
-                # Act and apply
-                action = player.generate_action(last_obs)
+                # Act on the latest best prices and apply
+                action = player.generate_action(self.game.get_offers())
                 self.game.apply_action(player.player_id, action)
             self.game.advance_game_one_second()
             # Construct observation state for agent's next round
             self.latest_obs = self._get_obs()
+        else:
+            # Same as above with every phase timed
+            self.game.apply_action(0, converted_action)
+            t = profiler.lap(MATCHING, t)
+            for player in self.players[1:]:
+                action = player.generate_action(self.game.get_offers())
+                t = profiler.lap(BOTS, t)
+                self.game.apply_action(player.player_id, action)
+                t = profiler.lap(MATCHING, t)
+            self.game.advance_game_one_second()
+            self.latest_obs = self._get_obs()
+            t = profiler.lap(OBSERVATION, t)
+        if self.events.actions:
+            self.events.step(obs, agent_action, reward, terminated, self.latest_obs)
         # Render environment
         if(self.render_mode=='human'):
             self.render()
             
-        # Return observation, reward, terminated, truncated, info (for debugging/other purposes)
-        return self.latest_obs, reward, terminated, False, {}
+        if profiler is None:
+            # Return observation, reward, terminated, truncated, info (for debugging/other purposes)
+            return self.latest_obs, reward, terminated, False, {}
+        profiler.lap(LOGGING, t)
+        profiler.step_done()
+        return self.latest_obs, reward, terminated, False, {'profile': profiler.totals()}
+
+    def action_masks(self) -> np.ndarray:
+        # Factored mask of the agent's useful actions, one block per MultiDiscrete dimension
+        # concatenated as [action (3), suit (4), price (150), side (2)], the layout MaskablePPO
+        # expects. Only public state is used: the books, the agent's hand and cash.
+        # - TAKE with intent BUY needs an ask from another player the agent can pay, with
+        #   intent SELL a bid from another player in a suit the agent holds
+        # - SHOW needs a price that becomes the best quote: a bid above the best bid the
+        #   agent can afford, an ask below the best ask in a suit the agent holds
+        # A value is allowed when some useful action uses it, dimensions without any useful
+        # value stay fully allowed. vec_game.FiggieTables.action_masks is the batched version.
+        max_price = self.action_space.nvec[2] - 1
+        agent = self.players[0]
+        agent_id = agent.player_id
+        hand = agent.hand
+        cash = int(agent.cash)
+        books = self.game.orderbook.books
+        price_mask = np.zeros(max_price + 1, dtype=bool)
+        suit_mask = np.zeros(len(FiggieSuit), dtype=bool)
+        show = take = buy = sell = False
+        for suit in FiggieSuit:
+            book = books[suit]
+            bid_price, bid_owner = book.best_bid()
+            ask_price, ask_owner = book.best_ask()
+            held = hand[suit.value] > 0
+            take_buy = ask_owner != -1 and ask_owner != agent_id and cash >= ask_price
+            take_sell = bid_owner != -1 and bid_owner != agent_id and held
+            bid_low = bid_price + 1 if bid_owner != -1 else 0
+            bid_high = min(cash, max_price)
+            ask_high = ask_price - 1 if ask_owner != -1 else max_price
+            show_buy = bid_low <= bid_high
+            show_sell = held and ask_high >= 0
+            if show_buy:
+                price_mask[bid_low:bid_high + 1] = True
+            if show_sell:
+                price_mask[:ask_high + 1] = True
+            suit_mask[suit.value] = show_buy or show_sell or take_buy or take_sell
+            show = show or show_buy or show_sell
+            take = take or take_buy or take_sell
+            buy = buy or show_buy or take_buy
+            sell = sell or show_sell or take_sell
+        if not suit_mask.any():
+            suit_mask[:] = True
+        if not price_mask.any():
+            price_mask[:] = True
+        side_mask = [buy, sell] if buy or sell else [True, True]
+        return np.concatenate([[True, show, take], suit_mask, price_mask, side_mask])
+
+    def set_config(self, config: FiggieConfig):
+        # Rules for the games from the next reset on, e.g. from a config.Curriculum. The
+        # environment and its buffers are kept, so the spaces must not change: same players and
+        # prices, and games no longer than the one the observation space was built for.
+        if (config.num_players, config.price_levels, config.max_cash) != (
+                self.config.num_players, self.config.price_levels, self.config.max_cash):
+            raise ValueError('set_config cannot change the number of players, price levels or cash bound')
+        if config.game_seconds >= self.observation_space['time_left'].n:
+            raise ValueError(f'Games of {config.game_seconds} seconds do not fit the observation space, '
+                             f'create the environment with the longest game instead')
+        self.next_config = config
+
+    def get_state(self) -> bytes:
+        # Fixed-size snapshot of the game and the series of games, see FiggieGame.get_state
+        return self.game.get_state() + self._series_state.pack(self.player_knocked_out, self.player_start_cash,
+                                                               *self.dealt_cards, *self.seen_cards)
+
+    def set_state(self, state: bytes):
+        game_size = self.game.state_size
+        self.game.set_state(state[:game_size])
+        self.player_knocked_out, start_cash, *cards = self._series_state.unpack(state[game_size:])
+        self.dealt_cards[:] = cards[:4]
+        self.seen_cards[:] = cards[4:]
+        self.player_start_cash = int(start_cash) if start_cash.is_integer() else start_cash
+        self.latest_obs = self._get_obs()
 
     # Gym required function to render environment
     def render(self):
-        logging.debug(f'Latest agent action: {self.latest_action}')
-        logging.debug(f'State passed to agent for next action: {self.latest_obs}')
-
-    def _log_agent_action(self, action: FiggieAction):
-        action_log['action'].append(action.action)
-        action_log['suit'].append(action.suit)
-        action_log['price'].append(action.price)
-        action_log['side'].append(action.acting_intent_side)
+        # Formatting whole observations is costly, skip it unless DEBUG is enabled
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug(f'Latest agent action: {self.latest_action}')
+            logging.debug(f'State passed to agent for next action: {self.latest_obs}')
 
 '''
 # For unit testing
 if __name__=="__main__":
-    env = gym.make('figgie-env', render_mode='human')
+    from gymnasium.utils.env_checker import check_env
+    register_env()
+    env = gym.make(ENV_ID, render_mode='human')
 
     # Use this to check our custom environment
     print("Check environment begin")
@@ -0,0 +1,224 @@
+import argparse
+import logging
+import struct
+import sys
+import time
+
+from enums import *
+
+# Event levels: OFF records nothing, GAMES records game starts and ends, TRADES also every trade,
+# ACTIONS also every action of every seat and every agent step (for replay.ReplayRecorder)
+OFF = 0
+GAMES = 1
+TRADES = 2
+ACTIONS = 3
+LEVELS = {'off': OFF, 'games': GAMES, 'trades': TRADES}
+
+MAGIC = b'FIGEV1\n'
+
+GAME_START = 1
+TRADE = 2
+GAME_END = 3
+
+# type, wall time, goal suit, number of players, then one float64 cash per player
+_GAME_START = struct.Struct('<BdBB')
+# type, counterpart sells (1) or buys (0), counterpart, aggressor, suit, price, game second
+_TRADE = struct.Struct('<BBBBBHH')
+# type, wall time, goal suit, number of players, knock flags, reward to agent,
+# then one uint8 goal suit holding and one float64 final score per player
+_GAME_END = struct.Struct('<BdBBBd')
+PLAYER_KNOCKED = 1
+AGENT_KNOCKED = 2
+
+
+def _number(value):
+    # Cash prints as an int unless a split pot made it fractional
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+def format_game_start(goal_suit: int, cash) -> list:
+    lines = ['---GAME RESET---', 'Starting state']
+    lines.extend(f'Player {player_id} has cash {_number(c)}' for player_id, c in enumerate(cash))
+    lines.append(f'Goal suit {FiggieSuit(goal_suit)}')
+    return lines
+
+
+def format_trade(counterpart_sells: bool, counterpart_id: int, aggressor_id: int, suit: int, price: int) -> list:
+    if counterpart_sells:
+        return [f'Player {counterpart_id} sells to Player {aggressor_id} {FiggieSuit(suit)} @ {price}']
+    return [f'Player {counterpart_id} buys from Player {aggressor_id} {FiggieSuit(suit)} @ {price}']
+
+
+def format_game_end(goal_suit: int, holdings, final_scores, player_knocked: bool, agent_knocked: bool,
+                    reward) -> list:
+    lines = ['---GAME HAS ENDED---']
+    lines.extend(f'Player {player_id} holds {h} of {FiggieSuit(goal_suit)}' for player_id, h in enumerate(holdings))
+    lines.append(f'Final scores: {[_number(s) for s in final_scores]}')
+    if player_knocked:
+        lines.append('Player knocked, resetting all cash')
+    if agent_knocked:
+        lines.append('Agent knocked, punishing')
+    lines.append(f'Reward to agent: {_number(reward)}')
+    return lines
+
+
+class EventRecorder:
+    # Receives game events. Call sites check the games / trades flags before building any
+    # event, so a recorder below the event's level costs a single attribute lookup.
+    actions = False
+
+    def __init__(self, level: int = OFF):
+        self.games = level >= GAMES
+        self.trades = level >= TRADES
+        self.actions = level >= ACTIONS
+
+    def game_start(self, goal_suit: int, cash, hands):
+        pass
+
+    def trade(self, counterpart_sells: bool, counterpart_id: int, aggressor_id: int, suit: int, price: int,
+              seconds: int):
+        pass
+
+    def game_end(self, goal_suit: int, holdings, final_scores, player_knocked: bool, agent_knocked: bool, reward):
+        pass
+
+    def action(self, player_id: int, action: int, suit: int, price: int, side: int, seconds: int):
+        pass
+
+    def step(self, obs: dict, action, reward, terminated: bool, next_obs: dict):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+NULL_EVENTS = EventRecorder(OFF)
+
+
+class LoggingEventRecorder(EventRecorder):
+    # Writes events as INFO log lines, the format train.py used to log directly.
+    # Levels follow the logger, so no line is formatted while INFO is disabled.
+    def __init__(self, level: int = TRADES, logger: logging.Logger = None):
+        self.level = level
+        self.logger = logger or logging.getLogger()
+
+    @property
+    def games(self):
+        return self.level >= GAMES and self.logger.isEnabledFor(logging.INFO)
+
+    @property
+    def trades(self):
+        return self.level >= TRADES and self.logger.isEnabledFor(logging.INFO)
+
+    def _log(self, lines: list):
+        for line in lines:
+            self.logger.info(line)
+
+    def game_start(self, goal_suit, cash, hands):
+        self._log(format_game_start(goal_suit, cash))
+
+    def trade(self, counterpart_sells, counterpart_id, aggressor_id, suit, price, seconds):
+        self._log(format_trade(counterpart_sells, counterpart_id, aggressor_id, suit, price))
+
+    def game_end(self, goal_suit, holdings, final_scores, player_knocked, agent_knocked, reward):
+        self._log(format_game_end(goal_suit, holdings, final_scores, player_knocked, agent_knocked, reward))
+
+
+class BinaryEventRecorder(EventRecorder):
+    # Packs events into compact binary records, buffered in memory and written to path in
+    # batches of buffer_size bytes. `python events.py decode path` turns them back into text.
+    def __init__(self, path: str, level: int = TRADES, buffer_size: int = 1 << 16):
+        super().__init__(level)
+        self.path = path
+        self.buffer_size = buffer_size
+        self.buffer = bytearray()
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC)
+
+    def game_start(self, goal_suit, cash, hands):
+        buffer = self.buffer
+        buffer += _GAME_START.pack(GAME_START, time.time(), goal_suit, len(cash))
+        buffer += struct.pack(f'<{len(cash)}d', *cash)
+        if len(buffer) >= self.buffer_size:
+            self.flush()
+
+    def trade(self, counterpart_sells, counterpart_id, aggressor_id, suit, price, seconds):
+        self.buffer += _TRADE.pack(TRADE, counterpart_sells, counterpart_id, aggressor_id, suit, price, seconds)
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def game_end(self, goal_suit, holdings, final_scores, player_knocked, agent_knocked, reward):
+        flags = (PLAYER_KNOCKED if player_knocked else 0) | (AGENT_KNOCKED if agent_knocked else 0)
+        buffer = self.buffer
+        buffer += _GAME_END.pack(GAME_END, time.time(), goal_suit, len(holdings), flags, reward)
+        buffer += struct.pack(f'<{len(holdings)}B{len(final_scores)}d', *holdings, *final_scores)
+        if len(buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.file.write(self.buffer)
+            self.buffer.clear()
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+def read_events(path: str):
+    # Yields (event type, wall time of the latest game start/end, lines) from a binary event log
+    with open(path, 'rb') as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f'{path} is not a Figgie event log')
+    offset = len(MAGIC)
+    wall_time = 0.0
+    while offset < len(data):
+        event = data[offset]
+        if event == GAME_START:
+            _, wall_time, goal_suit, n = _GAME_START.unpack_from(data, offset)
+            offset += _GAME_START.size
+            cash = struct.unpack_from(f'<{n}d', data, offset)
+            offset += 8 * n
+            yield event, wall_time, format_game_start(goal_suit, cash)
+        elif event == TRADE:
+            _, sells, counterpart_id, aggressor_id, suit, price, _ = _TRADE.unpack_from(data, offset)
+            offset += _TRADE.size
+            yield event, wall_time, format_trade(sells, counterpart_id, aggressor_id, suit, price)
+        elif event == GAME_END:
+            _, wall_time, goal_suit, n, flags, reward = _GAME_END.unpack_from(data, offset)
+            offset += _GAME_END.size
+            holdings = struct.unpack_from(f'<{n}B', data, offset)
+            final_scores = struct.unpack_from(f'<{n}d', data, offset + n)
+            offset += 9 * n
+            yield event, wall_time, format_game_end(goal_suit, holdings, final_scores, bool(flags & PLAYER_KNOCKED),
+                                                    bool(flags & AGENT_KNOCKED), reward)
+        else:
+            raise ValueError(f'Unknown event type {event} at byte {offset} of {path}')
+
+
+def decode(path: str, out=sys.stdout):
+    # Prints a binary event log in the '%(asctime)s - %(levelname)s - %(message)s' log format
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    for _, wall_time, lines in read_events(path):
+        for line in lines:
+            record = logging.makeLogRecord({'msg': line, 'levelname': 'INFO', 'levelno': logging.INFO})
+            record.created = wall_time
+            record.msecs = (wall_time - int(wall_time)) * 1000
+            out.write(formatter.format(record) + '\n')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Figgie binary event logs')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    decode_parser = subparsers.add_parser('decode', help='Print a binary event log as human-readable log lines')
+    decode_parser.add_argument('path')
+    args = parser.parse_args()
+    if args.command == 'decode':
+        decode(args.path)
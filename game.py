@@ -1,48 +1,113 @@
-import random
+import struct
 from typing import List
-import logging
 
-from orderbook import SuitOrderBook
+import numpy as np
+
+from bots import BotStrategy
+from config import DEFAULT_CONFIG, FiggieConfig
+from events import EventRecorder, NULL_EVENTS
+from orderbook import BUY, BUY_SIDE, EMPTY_ORDER, NUM_SUITS, SELL, SuitOrderBook, LadderOrderBook
+from profiling import Profiler, PASSES, ORDERS, TAKES, TRADES
+from scoring import scoring_table
 from enums import *
 
 
+SUITS = tuple(FiggieSuit)
+SIDES = tuple(FiggieSide)
+PASS_ACTION = FiggieAction(FiggieInGameAction.PASS, None, None, None)
+
+
+class RandomStream:
+    # Uniform floats from a numpy Generator, drawn chunk_size at a time so that bots pay for a
+    # list lookup instead of a Generator call per decision. Its state is the generator state
+    # before the current chunk plus the position in it, enough to replay the stream exactly.
+    __slots__ = ('generator', 'chunk_size', 'values', 'position', 'chunk_state')
+
+    def __init__(self, generator: np.random.Generator, chunk_size: int = 256):
+        self.generator = generator
+        self.chunk_size = chunk_size
+        self.refill()
+
+    def refill(self):
+        self.chunk_state = self.generator.bit_generator.state
+        self.values = self.generator.random(self.chunk_size).tolist()
+        self.position = 0
+
+    def restore(self, chunk_state: dict, position: int):
+        self.generator.bit_generator.state = chunk_state
+        self.refill()
+        self.position = position
+
+    def random(self) -> float:
+        position = self.position
+        if position == self.chunk_size:
+            self.refill()
+            position = 0
+        self.position = position + 1
+        return self.values[position]
+
+    def randint(self, low: int, high: int) -> int:
+        # Uniform integer in [low, high], both ends included like random.randint
+        return low + int(self.random() * (high - low + 1))
+
+    def choice(self, seq):
+        return seq[int(self.random() * len(seq))]
+
+
+# Stream of players that are not seated at a game, see FiggieGame.seed
+UNSEATED_RANDOM = RandomStream(np.random.default_rng())
+
+
+def seat_reward(final_cash: float, start_cash: float, ante: int) -> float:
+    # Reward of FiggieEnv for any seat: cash won in the game, -1000 for being knocked out
+    return -1000 if final_cash < ante else final_cash - start_cash
+
+
 class FiggiePlayer:
-    def __init__(self, player_id: int):
+    __slots__ = ('player_id', 'hand', 'cash', 'strategy', 'random', 'config')
+
+    def __init__(self, player_id: int, strategy: BotStrategy = BotStrategy(), config: FiggieConfig = DEFAULT_CONFIG):
         self.player_id = player_id
-        self.hand = []
-        self.cash = 350
+        # Number of cards held per suit, indexed by FiggieSuit value
+        self.hand = [0] * len(FiggieSuit)
+        self.config = config
+        self.cash = config.start_cash
+        self.strategy = strategy
+        # Source of the bot's random decisions, replaced by the game's stream once seated
+        self.random = UNSEATED_RANDOM
     
     def reset(self, any_player_knocked_out: bool):
-        self.hand = []
+        # Emptied in place, the hand may be a row of the game's observation buffer
+        self.hand[:] = [0] * len(FiggieSuit)
         if any_player_knocked_out:
-            self.cash = 350
+            self.cash = self.config.start_cash
     
     def generate_action(self, offers: dict) -> FiggieAction:
-        # Bots act as follows: pick a suit at random, pick a side at random
-        best_buys = offers['best_buys']
-        best_sells = offers['best_sells']
-        suit = random.choice(list(FiggieSuit))
-        side = random.choice(list(FiggieSide))
-        action = FiggieAction(FiggieInGameAction.PASS, None, None, None)
+        # Bots act as follows: pick a suit at random, pick a side at random, then follow their strategy
+        # (bots.BotPolicyEngine runs the same logic for many bots at once)
+        strategy = self.strategy
+        random = self.random
+        suit = random.choice(SUITS)
+        side = random.choice(SIDES)
         if side == FiggieSide.BUY:
-            best_buy = best_buys[suit.value]
-            if best_buy == 0 and self.cash >= 10:
-                # If the side does not contain a quote and is buy and bot has enough cash -> place random quote between 0 and 10
-                action = FiggieAction(FiggieInGameAction.SHOW, suit, side, random.randint(0, 10))
+            best_buy = offers['best_buys'][suit.value]
+            if best_buy == 0 and self.cash >= strategy.min_cash_to_bid:
+                # If the side does not contain a quote and is buy and bot has enough cash -> place random quote between bid_low and bid_high
+                return FiggieAction(FiggieInGameAction.SHOW, suit, side, random.randint(strategy.bid_low, strategy.bid_high))
             # If someone offers to buy at a high price then sell to them
-            elif best_buy >= 7 and suit in self.hand:
-                # If the side is buy and contains a bid >= 7 and the bot has the correct card -> sell
-                action = FiggieAction(FiggieInGameAction.TAKE, suit, FiggieSide.SELL, 0)
-        elif side == FiggieSide.SELL:
-            best_sell = best_sells[suit.value]
-            if best_sell == 0 and suit in self.hand:
-                # If the side does not contain a quote and is sell and the bot has the suit -> place random quote between 10 and 20
-                action = FiggieAction(FiggieInGameAction.SHOW, suit, side, random.randint(10, 20))
+            elif best_buy >= strategy.sell_at_bid and self.hand[suit.value] > 0:
+                # If the side is buy and contains a bid >= sell_at_bid and the bot has the correct card -> sell
+                return FiggieAction(FiggieInGameAction.TAKE, suit, FiggieSide.SELL, 0)
+        else:
+            best_sell = offers['best_sells'][suit.value]
+            if best_sell == 0 and self.hand[suit.value] > 0:
+                # If the side does not contain a quote and is sell and the bot has the suit -> place random quote between ask_low and ask_high
+                return FiggieAction(FiggieInGameAction.SHOW, suit, side, random.randint(strategy.ask_low, strategy.ask_high))
             # If someone offers to sell at a low price then buy from them
-            elif best_sell <= 13 and self.cash >= 13:
-                # If the side is sell and contains an ask < 13 -> buy
-                action = FiggieAction(FiggieInGameAction.TAKE, suit, FiggieSide.BUY, 0)
-        return action
+            elif best_sell <= strategy.buy_at_ask and self.cash >= strategy.min_cash_to_buy:
+                # If the side is sell and contains an ask <= buy_at_ask -> buy
+                return FiggieAction(FiggieInGameAction.TAKE, suit, FiggieSide.BUY, 0)
+        return PASS_ACTION
 
     def add_cash(self, cash_to_add: int):
         self.cash += cash_to_add
@@ -51,76 +116,223 @@ class FiggiePlayer:
         self.cash -= cash_to_subtract
 
     def receive_card(self, card: FiggieSuit):
-        self.hand.append(card)
+        self.hand[card.value] += 1
 
-    def remove_card(self, card_index: int):
-        for card in self.hand:
-            if card[1] == card_index:
-                self.hand.remove(card)
-                return card
-        return None
+    def remove_card(self, card: FiggieSuit):
+        if self.hand[card.value] == 0:
+            return None
+        self.hand[card.value] -= 1
+        return card
 
     def get_suit_count(self, suit: FiggieSuit) -> int:
-        suit_cnt = 0
-        for card in self.hand:
-            if card == suit:
-                suit_cnt += 1
-        return suit_cnt
+        return int(self.hand[suit.value])
 
 
 class FiggieGame:
-    def __init__(self, players: List[FiggiePlayer]):
+    def __init__(self, players: List[FiggiePlayer], book_class=LadderOrderBook, events: EventRecorder = NULL_EVENTS,
+                 profiler: Profiler = None, config: FiggieConfig = None):
         self.players = players
+        # Rules of the game, by default those of the seated players
+        self.config = players[0].config if config is None else config
+        if self.config.num_players != len(players):
+            raise ValueError(f'{len(players)} players seated for a {self.config.num_players} player game')
+        for player in players:
+            player.config = self.config
+        self.events = events
+        # Counts passes, orders, takes and trades when set
+        self.profiler = profiler
+        self.book_class = book_class
+        # Payout lookup table for this number of players
+        self.scoring = scoring_table(len(players))
+        # Observation buffer updated in place as the game changes: best bids, best asks,
+        # then the hand counts of every player. Players hold their row as their hand.
+        self.observation_block = np.zeros((2 + len(players), len(FiggieSuit)), dtype=np.int64)
+        self.orderbook = SuitOrderBook(list(FiggieSuit), book_class, self.observation_block[:2], self.config)
+        self.hands = self.observation_block[2:]
+        for player, hand in zip(players, self.hands):
+            player.hand = hand
+        self.offers = {'best_buys': self.orderbook.best_buys, 'best_sells': self.orderbook.best_sells}
+        self._observation_rows = [np.array([0, 1, 2 + i]) for i in range(len(players))]
+        self.seed()
+        self._state_layout()
+        self.goal_suit = FiggieSuit.HEARTS
+        self.pot = 0
+        self.seconds_passed = 0
+        self.deck = [0] * len(FiggieSuit)
+
+    def seed(self, seed=None):
+        # All randomness of the game and its bots comes from self.rng, a numpy Generator.
+        # seed is anything np.random.default_rng accepts, a Generator is used as is.
+        self.rng = np.random.default_rng(seed)
+        self.random = RandomStream(self.rng)
+        for player in self.players:
+            player.random = self.random
+
+    def _state_layout(self):
+        # get_state layout: goal suit, seconds passed, pot, cards per suit in the deck, then
+        # hands, cash, the orders of every book and the random stream, see get_state.
+        # Only the top order of a book matters when any take wipes the books, with continuous
+        # matching every player may have a quote resting on every book.
+        num_players = len(self.players)
+        self._book_depth = num_players if self.config.continuous else 1
+        orders = 8 * self._book_depth
+        self._state = struct.Struct(f'<BHd4B{4 * num_players}B{num_players}d{orders}H{orders}b16s16sBIH')
+
+    @property
+    def state_size(self) -> int:
+        return self._state.size
+
+    def get_state(self) -> bytes:
+        # Snapshot of the whole game as state_size bytes. Without continuous matching only the
+        # top order of every book is kept: the game clears all books after each take, so orders
+        # behind the top can never trade or show up in an observation. With it, the books keep
+        # every quote in priority order. The generator must be a PCG64 (numpy's default).
+        books = self.orderbook.books
+        depth = self._book_depth
+        if depth == 1:
+            tops = [books[suit].best_bid() for suit in SUITS] + [books[suit].best_ask() for suit in SUITS]
+        else:
+            tops = []
+            for side in SIDES:
+                for suit in SUITS:
+                    orders = books[suit].orders(side.value)
+                    tops.extend(orders + [EMPTY_ORDER] * (depth - len(orders)))
+        random = self.random
+        rng_state = random.chunk_state
+        if rng_state['bit_generator'] != 'PCG64':
+            raise ValueError(f'Cannot snapshot a {rng_state["bit_generator"]} generator, only PCG64')
+        return self._state.pack(
+            self.goal_suit.value, self.seconds_passed, self.pot, *self.deck,
+            *self.hands.ravel().tolist(), *[player.cash for player in self.players],
+            *[price for price, _ in tops], *[owner for _, owner in tops],
+            rng_state['state']['state'].to_bytes(16, 'little'), rng_state['state']['inc'].to_bytes(16, 'little'),
+            rng_state['has_uint32'], rng_state['uinteger'], random.position,
+        )
+
+    def set_state(self, state: bytes):
+        # Restores a snapshot taken by get_state on a game with the same number of players
+        values = self._state.unpack(state)
+        num_players = len(self.players)
+        goal_suit, self.seconds_passed, pot = values[:3]
+        self.goal_suit = SUITS[goal_suit]
+        self.pot = int(pot) if pot.is_integer() else pot
+        self.deck = list(values[3:7])
+        offset = 7 + 4 * num_players
+        self.hands[:] = np.array(values[7:offset]).reshape(num_players, len(FiggieSuit))
+        for player, cash in zip(self.players, values[offset:offset + num_players]):
+            player.cash = int(cash) if cash.is_integer() else cash
+        offset += num_players
+        depth = self._book_depth
+        orders = 8 * depth
+        prices = values[offset:offset + orders]
+        owners = values[offset + orders:offset + 2 * orders]
+        self.orderbook.reset()
+        post = self.orderbook.replace_order if self.config.continuous else self.orderbook.post_order
+        for i, (price, owner) in enumerate(zip(prices, owners)):
+            if owner != -1:
+                book = i // depth
+                post(owner, SUITS[book % 4], price, SIDES[book // 4])
+        state, inc, has_uint32, uinteger, position = values[offset + 2 * orders:]
+        self.random.restore({
+            'bit_generator': 'PCG64',
+            'state': {'state': int.from_bytes(state, 'little'), 'inc': int.from_bytes(inc, 'little')},
+            'has_uint32': has_uint32,
+            'uinteger': uinteger,
+        }, position)
+
+    def configure(self, config: FiggieConfig):
+        # Changes the rules from the next reset on, keeping the players and every buffer
+        if config.num_players != len(self.players) or config.price_levels != self.config.price_levels:
+            raise ValueError('A game cannot change its number of players or price levels')
+        continuous = config.continuous != self.config.continuous
+        self.config = config
+        for player in self.players:
+            player.config = config
+        if continuous:
+            self.orderbook.reset()
+            self.orderbook.track_quotes(config.continuous)
+            self._state_layout()
+
+    def clone(self) -> 'FiggieGame':
+        # Independent copy of the game in its current state, with its own players and books
+        players = [FiggiePlayer(player.player_id, player.strategy, self.config) for player in self.players]
+        game = FiggieGame(players, self.book_class, self.events, self.profiler, self.config)
+        game.set_state(self.get_state())
+        return game
 
     def _build_deck(self) -> list:
-        deck = []
-        goal_suit_cards = random.choice([8, 10])
-        deck.extend([self.goal_suit] * goal_suit_cards)
+        # Number of cards per suit, indexed by FiggieSuit value
+        deck = [10] * len(FiggieSuit)
+        deck[self.goal_suit.value] = 8 if self.rng.random() < 0.5 else 10
         if self.goal_suit in [FiggieSuit.DIAMONDS, FiggieSuit.HEARTS]:
-            deck.extend([FiggieSuit.CLUBS] * 10)
-            deck.extend([FiggieSuit.SPADES] * 10)
             if self.goal_suit == FiggieSuit.HEARTS:
-                deck.extend([FiggieSuit.DIAMONDS] * 12)
+                deck[FiggieSuit.DIAMONDS.value] = 12
             else:
-                deck.extend([FiggieSuit.HEARTS] * 12)
+                deck[FiggieSuit.HEARTS.value] = 12
         elif self.goal_suit in [FiggieSuit.CLUBS, FiggieSuit.SPADES]:
-            deck.extend([FiggieSuit.DIAMONDS] * 10)
-            deck.extend([FiggieSuit.HEARTS] * 10)
             if self.goal_suit == FiggieSuit.CLUBS:
-                deck.extend([FiggieSuit.SPADES] * 12)
+                deck[FiggieSuit.SPADES.value] = 12
             else:
-                deck.extend([FiggieSuit.CLUBS] * 12)
+                deck[FiggieSuit.CLUBS.value] = 12
         return deck
 
     def _deal_cards(self):
-        random.shuffle(self.deck)
-        for i, card in enumerate(self.deck):
-            self.players[i % len(self.players)].receive_card(card)
+        # Shuffle the deck once and deal it round-robin, counting the cards every player receives
+        num_players = len(self.players)
+        cards = self.rng.permutation(np.repeat(np.arange(len(FiggieSuit)), self.deck))
+        seats = np.arange(len(cards)) % num_players
+        hands = np.bincount(seats * len(FiggieSuit) + cards, minlength=num_players * len(FiggieSuit))
+        self.hands[:] = hands.reshape(num_players, len(FiggieSuit))
 
     def reset(self, player_knocked_out: bool):
         for player in self.players:
             player.reset(player_knocked_out)
-        [player.subtract_cash(50) for player in self.players]
-        self.goal_suit = random.choice(list(FiggieSuit))
-        self.pot = 50 * len(self.players)
+        ante = self.config.ante
+        [player.subtract_cash(ante) for player in self.players]
+        self.goal_suit = SUITS[self.rng.integers(len(SUITS))]
+        self.pot = ante * len(self.players)
         self.seconds_passed = 0
-        self.orderbook = SuitOrderBook(list(FiggieSuit))
+        self.orderbook.reset()
         self.deck = self._build_deck()
         self._deal_cards()
-        logging.info('---GAME RESET---')
-        logging.info('Starting state')
-        for player in self.players:
-            logging.info(f'Player {player.player_id} has cash {player.cash}')
-        logging.info(f'Goal suit {self.goal_suit}')
+        # The deal drew from rng directly, start a new chunk so the stream state describes rng again
+        self.random.refill()
+        if self.events.games:
+            self.events.game_start(self.goal_suit.value, [player.cash for player in self.players], self.hands)
+
+    def get_offers(self) -> dict:
+        # Best bid / ask prices per suit as views of the observation buffer, enough for the bots
+        return self.offers
+
+    def get_observation(self, player_id: int) -> dict:
+        # Observation of one player, taken from the observation buffer with a single copy
+        block = self.observation_block.take(self._observation_rows[player_id], axis=0)
+        return {
+            'best_buys': block[0],
+            'best_sells': block[1],
+            'own_cards': block[2],
+            'own_cash': self.players[player_id].cash,
+            'time_left': self.seconds_passed
+        }
 
     def advance_game_one_second(self):
-        self.seconds_passed += 1
+        # One tick, tick_seconds long, stopping at the end of the game
+        self.seconds_passed = min(self.seconds_passed + self.config.tick_seconds, self.config.game_seconds)
     
     def apply_action(self, player_id: int, figgie_action: FiggieAction):
+        if self.profiler is not None:
+            self._count_action(figgie_action)
         if figgie_action.action == FiggieInGameAction.PASS:
             return
-        elif figgie_action.action == FiggieInGameAction.SHOW:
-            self.orderbook.post_order(player_id, figgie_action.suit, figgie_action.price, figgie_action.acting_intent_side)
+        if self.events.actions:
+            self.events.action(player_id, figgie_action.action.value, figgie_action.suit.value, figgie_action.price,
+                               figgie_action.acting_intent_side.value, self.seconds_passed)
+        if figgie_action.action == FiggieInGameAction.SHOW:
+            if self.config.continuous:
+                self.show_continuous(player_id, figgie_action.suit, figgie_action.price, figgie_action.acting_intent_side)
+            else:
+                self.orderbook.post_order(player_id, figgie_action.suit, figgie_action.price,
+                                          figgie_action.acting_intent_side)
         elif figgie_action.action == FiggieInGameAction.TAKE:
             # If player_intent_side == BUY -> we must accept best price on the SELL side, likewise on opposite side
             if figgie_action.acting_intent_side == FiggieSide.BUY:
@@ -128,8 +340,30 @@ class FiggieGame:
             else:
                 self.accept_best_price(player_id, figgie_action.suit, FiggieSide.BUY)
         
+    def _count_action(self, figgie_action: FiggieAction):
+        counts = self.profiler.counts
+        if figgie_action.action == FiggieInGameAction.PASS:
+            counts[PASSES] += 1
+        elif figgie_action.action == FiggieInGameAction.SHOW:
+            counts[ORDERS] += 1
+        else:
+            counts[TAKES] += 1
+
     def accept_best_price(self, aggressor_id: int, suit: FiggieSuit, best_price_side: FiggieSide):
         # If best_price_side = BUY -> aggressor 
+        if self.config.continuous:
+            # Reads the book by suit and side values, as show_continuous does
+            suit_value = suit.value
+            book = self.orderbook.book_list[suit_value]
+            if best_price_side is BUY_SIDE:
+                price, counterpart_id = book.best_bid()
+                resting_side = BUY
+            else:
+                price, counterpart_id = book.best_ask()
+                resting_side = SELL
+            if counterpart_id != -1 and counterpart_id != aggressor_id:
+                self._match(aggressor_id, counterpart_id, suit_value, price, resting_side)
+            return
         best_order = self.orderbook.best(best_price_side, suit)
         price = best_order[0]
         counterpart_id = best_order[1]
@@ -141,62 +375,104 @@ class FiggieGame:
         # Counterpart is seller
         if best_price_side == FiggieSide.SELL:
             # Counterpart must hold the card to trade AND aggressor must have enough cash
-            if suit in counterpart.hand and aggressor.cash >= price:
-                counterpart.hand.remove(suit)
-                aggressor.hand.append(suit)
-                aggressor.cash -= price
-                counterpart.cash += price
-                logging.info(f'Player {counterpart_id} sells to Player {aggressor_id} {suit} @ {price}')
+            if counterpart.hand[suit.value] > 0 and aggressor.cash >= price:
+                self._transfer(counterpart, aggressor, suit.value, price)
+                if self.events.trades:
+                    self.events.trade(True, counterpart_id, aggressor_id, suit.value, price, self.seconds_passed)
         # Counterpart is buyer
         elif best_price_side == FiggieSide.BUY:
             # Aggressor must hold the card to trade AND counterpart must have enough cash
-            if suit in aggressor.hand and counterpart.cash >= price:
-                aggressor.hand.remove(suit)
-                counterpart.hand.append(suit)
-                aggressor.cash += price
-                counterpart.cash -= price
-                logging.info(f'Player {counterpart_id} buys from Player {aggressor_id} {suit} @ {price}')
+            if aggressor.hand[suit.value] > 0 and counterpart.cash >= price:
+                self._transfer(aggressor, counterpart, suit.value, price)
+                if self.events.trades:
+                    self.events.trade(False, counterpart_id, aggressor_id, suit.value, price, self.seconds_passed)
         self.orderbook.reset()
         return True
 
+    def _transfer(self, seller: FiggiePlayer, buyer: FiggiePlayer, suit_value: int, price: int):
+        seller.hand[suit_value] -= 1
+        buyer.hand[suit_value] += 1
+        buyer.cash -= price
+        seller.cash += price
+        if self.profiler is not None:
+            self.profiler.counts[TRADES] += 1
+
+    def _match(self, aggressor_id: int, counterpart_id: int, suit_value: int, price: int, resting_side: int) -> bool:
+        # Continuous matching: the aggressor trades with the counterpart's resting quote at its
+        # price. Returns whether they traded. A quote its owner can no longer honour is cancelled.
+        # A trade changes the cards and cash both players quoted on, so all their quotes are
+        # cancelled and every other quote keeps resting. Suit and side are values, as in the books.
+        aggressor = self.players[aggressor_id]
+        counterpart = self.players[counterpart_id]
+        counterpart_sells = resting_side == SELL
+        seller, buyer = (counterpart, aggressor) if counterpart_sells else (aggressor, counterpart)
+        seller_ok = seller.hand[suit_value] > 0
+        buyer_ok = buyer.cash >= price
+        if not (seller_ok and buyer_ok):
+            if not (seller_ok if counterpart_sells else buyer_ok):
+                self.orderbook.cancel_quote(counterpart_id, suit_value, resting_side)
+            return False
+        self._transfer(seller, buyer, suit_value, price)
+        if self.events.trades:
+            self.events.trade(counterpart_sells, counterpart_id, aggressor_id, suit_value, price, self.seconds_passed)
+        self.orderbook.cancel_players((aggressor_id, counterpart_id))
+        return True
+
+    def show_continuous(self, player_id: int, suit: FiggieSuit, price: int, side: FiggieSide):
+        # SHOW with continuous matching: an order crossing the best opposite quote trades with it
+        # at the resting price, otherwise it replaces the player's quote for this suit and side.
+        # The player's own crossing quote is cancelled rather than traded with, as are quotes
+        # their owners can no longer honour, until the order trades, rests or cannot be paid for.
+        orderbook = self.orderbook
+        suit_value = suit.value
+        buying = side is BUY_SIDE
+        resting_side = SELL if buying else BUY
+        book = orderbook.book_list[suit_value]
+        best = book.best_ask if buying else book.best_bid
+        quotes = orderbook.quotes
+        while True:
+            best_price, owner = best()
+            if owner == -1 or (price < best_price if buying else price > best_price):
+                break
+            if owner == player_id:
+                orderbook.cancel_quote(player_id, suit_value, resting_side)
+                continue
+            if self._match(player_id, owner, suit_value, best_price, resting_side):
+                return
+            if quotes[(owner * NUM_SUITS + suit_value) * 2 + resting_side] == best_price:
+                # The counterpart's quote still rests, so this player could not pay or deliver
+                return
+        orderbook.replace_quote(player_id, suit_value, int(price), BUY if buying else SELL)
+
     def game_has_ended(self) -> bool:
-        if self.seconds_passed >= 4 * 60:
+        if self.seconds_passed >= self.config.game_seconds:
             return True
         return False
 
     def get_final_scores(self):
-        counts = [p.get_suit_count(self.goal_suit) for p in self.players]
-        payouts = [0, 0, 0, 0]
-        #Standard payout
-        payouts[0] += 10 * counts[0]
-        payouts[1] += 10 * counts[1]
-        payouts[2] += 10 * counts[2]
-        payouts[3] += 10 * counts[3]
-        self.pot -= sum(payouts)
-        #Bonus
-        max_val = max(counts)
-        winners = [i for i, val in enumerate(counts) if val == max_val]
-        number_of_winners = len(winners)
-        for w in winners:
-            payouts[w] += self.pot/number_of_winners
+        goal = self.goal_suit.value
+        counts = [int(hand[goal]) for hand in self.hands]
+        payouts = self.scoring.payouts(counts, self.pot)
+        self.pot -= 10 * sum(counts)
         final_cash = [player.cash for player in self.players]
         return [x + y for x,y in zip(payouts, final_cash)]
 
 
-if __name__ == '__main__':
-    players = [FiggiePlayer(0), FiggiePlayer(1), FiggiePlayer(2), FiggiePlayer(3)]
-    game = FiggieGame(players)
-    game.reset(False)
+def play_random_game(game: FiggieGame, player_knocked_out: bool = False):
+    # Random bots take turns, one action per second, until the game ends
+    players = game.players
+    game.reset(player_knocked_out)
     while not game.game_has_ended():
-        player = random.choice(players)
-        best_buys = []
-        best_sells = []
-        for suit in FiggieSuit:
-            best_buys.append(game.orderbook.best_bid(suit)[0])
-            best_sells.append(game.orderbook.best_ask(suit)[0])
-        action = player.generate_action({'best_buys': best_buys, 'best_sells': best_sells})
+        player = game.random.choice(players)
+        action = player.generate_action(game.get_offers())
         game.apply_action(player.player_id, action)
         game.advance_game_one_second()
+
+
+if __name__ == '__main__':
+    players = [FiggiePlayer(0), FiggiePlayer(1), FiggiePlayer(2), FiggiePlayer(3)]
+    game = FiggieGame(players)
+    play_random_game(game)
     print(game.goal_suit)
     for player in players:
         print(f'Player {player.player_id} holds {player.get_suit_count(game.goal_suit)} of {game.goal_suit}')
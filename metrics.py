@@ -0,0 +1,277 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from enums import *
+
+# Reward of an episode whose agent was knocked out, see FiggieEnv.step
+KNOCKED_OUT_REWARD = -1000
+HISTOGRAMS = ('action', 'suit', 'price', 'side')
+
+
+class RunningStats:
+    # Count, mean, variance (Welford), min and max of a stream of values in constant memory
+    __slots__ = ('count', 'mean', 'm2', 'min', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = float('inf')
+        self.max = float('-inf')
+
+    def add(self, values: np.ndarray):
+        # Merges a batch of values (Chan et al.)
+        n = len(values)
+        if n == 0:
+            return
+        mean = float(values.mean())
+        m2 = float(((values - mean) ** 2).sum())
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.count * n / total
+        self.count = total
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def summary(self) -> dict:
+        if self.count == 0:
+            return {'count': 0}
+        return {'count': self.count, 'mean': self.mean, 'std': (self.m2 / self.count) ** 0.5,
+                'min': self.min, 'max': self.max}
+
+
+class TrainingMetrics:
+    # Per-episode agent metrics and action histograms of num_envs vectorized environments,
+    # folded in every step so that memory does not grow with the length of training:
+    # - reward: the episode's summed reward
+    # - pnl: cash won or lost trading during the game, from the agent's observed cash (the
+    #   payout at the end of the game is in the reward)
+    # - knock-outs: episodes ending with the knocked out reward
+    # - trades: cards the agent bought or sold, counted from its observed hand
+    # Every statistic is kept over the whole run and over the window since the last snapshot.
+    # Observations are the FiggieEnv dicts of all environments, as stacked by a VecEnv.
+    def __init__(self, num_envs: int, price_levels: int = 150):
+        self.num_envs = num_envs
+        self.sizes = {'action': len(FiggieInGameAction), 'suit': len(FiggieSuit), 'price': price_levels,
+                      'side': len(FiggieSide)}
+        self.totals = self._empty()
+        self.window = self._empty()
+        self.steps = 0
+        self.window_steps = 0
+        self.window_start = time.perf_counter()
+        # Running episode of every environment
+        self.returns = np.zeros(num_envs)
+        self.trades = np.zeros(num_envs, dtype=np.int64)
+        self.start_cash = np.zeros(num_envs)
+        self.cards = np.zeros((num_envs, len(FiggieSuit)), dtype=np.int64)
+
+    def _empty(self) -> dict:
+        return {
+            'reward': RunningStats(),
+            'pnl': RunningStats(),
+            'trades': RunningStats(),
+            'knockouts': 0,
+            'histograms': {name: np.zeros(size, dtype=np.int64) for name, size in self.sizes.items()},
+        }
+
+    def start(self, obs: dict):
+        # Observations the episodes in progress started from
+        self.start_cash[:] = obs['own_cash']
+        self.cards[:] = obs['own_cards']
+
+    def step(self, actions: np.ndarray, rewards: np.ndarray, dones: np.ndarray, obs: dict, terminal_obs: dict = None):
+        # actions (num_envs, 4) in the MultiDiscrete encoding, obs after the step. terminal_obs
+        # maps the index of every finished environment to its last observation.
+        actions = np.asarray(actions).reshape(self.num_envs, -1)
+        for column, name in enumerate(HISTOGRAMS):
+            counts = np.bincount(actions[:, column], minlength=self.sizes[name])[:self.sizes[name]]
+            self.totals['histograms'][name] += counts
+            self.window['histograms'][name] += counts
+        self.steps += self.num_envs
+        self.window_steps += self.num_envs
+        self.returns += rewards
+        cards = np.asarray(obs['own_cards'])
+        cash = np.asarray(obs['own_cash'], dtype=float).reshape(self.num_envs)
+        rows = np.flatnonzero(dones)
+        if len(rows):
+            # Finished environments were reset, their last hand and cash are in the terminal observations
+            cards = cards.copy()
+            final_cash = cash.copy()
+            for row in rows:
+                final = terminal_obs[row]
+                cards[row] = final['own_cards']
+                final_cash[row] = final['own_cash']
+        self.trades += np.abs(cards - self.cards).sum(axis=1)
+        self.cards[:] = cards
+        if len(rows):
+            episode = {
+                'reward': self.returns[rows],
+                'pnl': final_cash[rows] - self.start_cash[rows],
+                'trades': self.trades[rows].astype(float),
+            }
+            knockouts = int((self.returns[rows] == KNOCKED_OUT_REWARD).sum())
+            for stats in (self.totals, self.window):
+                for name, values in episode.items():
+                    stats[name].add(values)
+                stats['knockouts'] += knockouts
+            self.returns[rows] = 0
+            self.trades[rows] = 0
+            self.start_cash[rows] = cash[rows]
+            self.cards[rows] = np.asarray(obs['own_cards'])[rows]
+
+    @staticmethod
+    def _summary(stats: dict) -> dict:
+        episodes = stats['reward'].count
+        return {
+            'episodes': episodes,
+            'reward': stats['reward'].summary(),
+            'pnl': stats['pnl'].summary(),
+            'trades': stats['trades'].summary(),
+            'knockout_rate': stats['knockouts'] / episodes if episodes else None,
+            'histograms': {name: counts.tolist() for name, counts in stats['histograms'].items()},
+        }
+
+    def snapshot(self, timesteps: int) -> dict:
+        # Totals and window statistics, then starts a new window
+        now = time.perf_counter()
+        snapshot = {
+            'timesteps': timesteps,
+            'time': time.time(),
+            'steps_per_sec': self.window_steps / max(now - self.window_start, 1e-9),
+            'total': self._summary(self.totals),
+            'window': self._summary(self.window),
+        }
+        self.window = self._empty()
+        self.window_steps = 0
+        self.window_start = now
+        return snapshot
+
+
+def write_snapshot(path: str, snapshot: dict):
+    # Snapshots are appended as JSON lines, one per line
+    with open(path, 'a') as f:
+        f.write(json.dumps(snapshot, separators=(',', ':')) + '\n')
+
+
+def read_snapshots(path: str) -> list:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def plot_actions(histograms: dict, title: str = None):
+    # histograms: counts per action / suit / side / price as in snapshots and ActionTelemetry.histograms
+    from matplotlib import pyplot as plt
+    fig, axes = plt.subplots(2, 2, figsize=(10, 8))
+    if title:
+        fig.suptitle(title)
+    # Plot Action distribution
+    ax = axes[0][0]
+
+    ax.bar([a.name for a in FiggieInGameAction], histograms['action'])
+    ax.set_ylabel("Count")
+    ax.set_title("Action Distribution")
+
+    # Plot Suit distribution
+    ax = axes[0][1]
+
+    ax.bar([a.name for a in FiggieSuit], histograms['suit'])
+    ax.set_ylabel("Count")
+    ax.set_title("Suit Distribution")
+
+    # Plot Side distribution
+    ax = axes[1][0]
+
+    ax.bar([a.name for a in FiggieSide], histograms['side'])
+    ax.set_ylabel("Count")
+    ax.set_title("Side Distribution")
+
+    # Plot Prices
+    ax = axes[1][1]
+
+    # Fold the per-price counts into 15 bins
+    prices = np.asarray(histograms['price'])
+    bin_counts = np.add.reduceat(prices, np.linspace(0, len(prices), 16).astype(int)[:-1])
+    bin_edges = np.linspace(0.0, len(prices), 16)
+
+    # Bar plot
+    bin_centers = 0.5 * (bin_edges[:-1] + bin_edges[1:])
+    ax.bar(bin_centers, bin_counts, width=0.15)
+    ax.set_ylabel("Count")
+    ax.set_title("Price Histogram")
+    return fig
+
+
+def plot_progress(snapshots: list):
+    # Window mean reward, PnL, trades per episode and knock-out rate against timesteps
+    from matplotlib import pyplot as plt
+    fig, axes = plt.subplots(2, 2, figsize=(10, 8))
+    timesteps = [s['timesteps'] for s in snapshots]
+    windows = [s['window'] for s in snapshots]
+    for ax, name, title in ((axes[0][0], 'reward', 'Episode Reward'), (axes[0][1], 'pnl', 'Trading PnL'),
+                            (axes[1][0], 'trades', 'Trades per Episode')):
+        ax.plot(timesteps, [w[name].get('mean', np.nan) for w in windows])
+        ax.set_title(title)
+    ax = axes[1][1]
+    ax.plot(timesteps, [np.nan if w['knockout_rate'] is None else w['knockout_rate'] for w in windows])
+    ax.set_title('Knock-out Rate')
+    for ax in axes.ravel():
+        ax.set_xlabel('Timesteps')
+    fig.tight_layout()
+    return fig
+
+
+def render_report(path: str, out_dir: str) -> list:
+    # Headless report of a snapshot file: action histograms over the whole run and over the
+    # last window, plus training progress, written as PNG files into out_dir
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib import pyplot as plt
+    snapshots = read_snapshots(path)
+    if not snapshots:
+        raise ValueError(f'No snapshots in {path}')
+    os.makedirs(out_dir, exist_ok=True)
+    last = snapshots[-1]
+    figures = {
+        'actions.png': plot_actions(last['total']['histograms'], f'All actions, {last["timesteps"]:,} timesteps'),
+        'actions_recent.png': plot_actions(last['window']['histograms'], 'Actions since the previous snapshot'),
+        'progress.png': plot_progress(snapshots),
+    }
+    paths = []
+    for name, fig in figures.items():
+        paths.append(os.path.join(out_dir, name))
+        fig.savefig(paths[-1])
+        plt.close(fig)
+    return paths
+
+
+def format_snapshot(snapshot: dict) -> str:
+    total, window = snapshot['total'], snapshot['window']
+    reward = window['reward'].get('mean', float('nan'))
+    knockouts = window['knockout_rate']
+    return (f"{snapshot['timesteps']:,} timesteps, {total['episodes']:,} episodes: window reward {reward:.1f}, "
+            f"PnL {window['pnl'].get('mean', float('nan')):.1f}, "
+            f"trades {window['trades'].get('mean', float('nan')):.1f}, "
+            f"knock-outs {'n/a' if knockouts is None else f'{knockouts:.1%}'}, {snapshot['steps_per_sec']:,.0f} steps/sec")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Training metric snapshots written by callbacks.MetricsCallback')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    report_parser = subparsers.add_parser('report', help='Render the action histograms and progress plots as PNG files')
+    report_parser.add_argument('path', nargs='?', default='./logs/metrics.jsonl')
+    report_parser.add_argument('--out', default='./logs/report')
+    show_parser = subparsers.add_parser('show', help='Print one line per snapshot')
+    show_parser.add_argument('path', nargs='?', default='./logs/metrics.jsonl')
+    args = parser.parse_args()
+
+    if args.command == 'report':
+        for path in render_report(args.path, args.out):
+            print(f'Wrote {path}')
+    elif args.command == 'show':
+        for snapshot in read_snapshots(args.path):
+            print(format_snapshot(snapshot))
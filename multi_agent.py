@@ -0,0 +1,315 @@
+import numpy as np
+
+from bots import BotStrategy
+from config import DEFAULT_CONFIG, FiggieConfig
+from environment import action_telemetry, figgie_action_space, figgie_observation_space
+from events import EventRecorder, NULL_EVENTS
+from game import FiggieGame, FiggiePlayer, SUITS, SIDES, seat_reward
+from vec_env import InProcessVecEnv
+from vec_game import NUM_PLAYERS, OBS_SHAPES, FiggieTables
+from enums import *
+
+# Who plays a seat of SelfPlayVecEnv
+LEARNER = 'learner'
+POOL = 'pool'
+BOT = 'bot'
+
+
+class FiggieParallelEnv:
+    # One Figgie table with every seat open to an agent, following the PettingZoo parallel API
+    # (reset / step take and return dicts keyed by agent name) without depending on PettingZoo.
+    # Seats listed in bots are played by FiggiePlayer bots with that strategy instead.
+    # Every second all agents decide from the same observations, then actions are applied in
+    # seat order, bots deciding when their turn comes as in FiggieEnv. A game is one episode,
+    # rewards follow FiggieEnv for every seat and cash carries over to the next game.
+    # config sets the rules, as for FiggieEnv.
+    metadata = {'render_modes': [], 'name': 'figgie_parallel_v0'}
+
+    def __init__(self, bots: dict = None, events: EventRecorder = NULL_EVENTS, config: FiggieConfig = DEFAULT_CONFIG):
+        bots = bots or {}
+        self.config = config
+        self.players = [FiggiePlayer(seat, bots.get(seat, BotStrategy()), config) for seat in range(config.num_players)]
+        self.game = FiggieGame(self.players, events=events, config=config)
+        self.bot_seats = set(bots)
+        self.possible_agents = [f'player_{seat}' for seat in range(config.num_players) if seat not in self.bot_seats]
+        self.agents = []
+        self._seats = {agent: int(agent.split('_')[1]) for agent in self.possible_agents}
+        self._action_space = figgie_action_space(config)
+        self._observation_space = figgie_observation_space(config=config)
+        self.player_knocked_out = False
+        self.start_cash = [0] * config.num_players
+
+    def observation_space(self, agent: str):
+        return self._observation_space
+
+    def action_space(self, agent: str):
+        return self._action_space
+
+    def _observations(self) -> dict:
+        return {agent: self.game.get_observation(self._seats[agent]) for agent in self.agents}
+
+    def reset(self, seed=None, options=None):
+        if seed is not None:
+            self.game.seed(seed)
+            self.player_knocked_out = True
+        self.game.reset(self.player_knocked_out)
+        self.player_knocked_out = False
+        self.start_cash = [player.cash for player in self.players]
+        self.agents = list(self.possible_agents)
+        return self._observations(), {agent: {} for agent in self.agents}
+
+    def step(self, actions: dict):
+        game = self.game
+        rewards = dict.fromkeys(self.agents, 0)
+        terminated = game.game_has_ended()
+        if terminated:
+            final_cash = game.get_final_scores()
+            for player, cash in zip(self.players, final_cash):
+                player.cash = cash
+            ante = self.config.ante
+            self.player_knocked_out = any(cash < ante for cash in final_cash)
+            for agent in self.agents:
+                seat = self._seats[agent]
+                rewards[agent] = seat_reward(final_cash[seat], self.start_cash[seat], ante)
+        else:
+            for player in self.players:
+                seat = player.player_id
+                if seat in self.bot_seats:
+                    game.apply_action(seat, player.generate_action(game.get_offers()))
+                    continue
+                action = actions[f'player_{seat}']
+                game.apply_action(seat, FiggieAction(FiggieInGameAction(action[0]), SUITS[action[1]],
+                                                     SIDES[action[3]], action[2]))
+            game.advance_game_one_second()
+        observations = self._observations()
+        terminations = dict.fromkeys(self.agents, terminated)
+        truncations = dict.fromkeys(self.agents, False)
+        infos = {agent: {} for agent in self.agents}
+        if terminated:
+            self.agents = []
+        return observations, rewards, terminations, truncations, infos
+
+    def close(self):
+        pass
+
+
+class OpponentPool:
+    # League of frozen policy snapshots that play the POOL seats of SelfPlayVecEnv.
+    # Every snapshot gets an id, the newest capacity snapshots are kept. A table draws the
+    # latest snapshot with probability latest_prob, otherwise a past one weighted towards the
+    # snapshots the learner beats least often (prioritized fictitious self-play).
+    def __init__(self, capacity: int = 20, latest_prob: float = 0.5, rng=None):
+        self.capacity = capacity
+        self.latest_prob = latest_prob
+        self.rng = np.random.default_rng(rng)
+        self.policies = {}
+        self.games = {}
+        self.wins = {}
+        self.next_id = 0
+
+    def __len__(self) -> int:
+        return len(self.policies)
+
+    def add(self, policy) -> int:
+        # Stores a frozen copy of an SB3 policy (model.policy) and returns its id. The copy is
+        # rebuilt from the policy's constructor arguments and weights, as SB3 loads policies.
+        snapshot = policy.__class__(**policy._get_constructor_parameters())
+        snapshot.load_state_dict(policy.state_dict())
+        snapshot.set_training_mode(False)
+        snapshot_id = self.next_id
+        self.next_id += 1
+        self.policies[snapshot_id] = snapshot
+        self.games[snapshot_id] = 0
+        self.wins[snapshot_id] = 0
+        while len(self.policies) > self.capacity:
+            oldest = min(self.policies)
+            del self.policies[oldest], self.games[oldest], self.wins[oldest]
+        return snapshot_id
+
+    def add_saved(self, path: str) -> int:
+        # Adds the policy of a model saved with model.save
+        from stable_baselines3 import PPO
+        return self.add(PPO.load(path, device='cpu').policy)
+
+    def win_rate(self, snapshot_id: int) -> float:
+        # Share of finished games against this snapshot the learner ended with a profit, 0.5 before any
+        games = self.games[snapshot_id]
+        return self.wins[snapshot_id] / games if games else 0.5
+
+    def sample(self, n: int) -> np.ndarray:
+        # Snapshot ids for n tables
+        ids = np.array(sorted(self.policies))
+        if len(ids) == 1:
+            return np.full(n, ids[0])
+        past = ids[:-1]
+        weights = np.array([1.0 - self.win_rate(i) for i in past]) + 1e-3
+        choice = self.rng.choice(past, size=n, p=weights / weights.sum())
+        return np.where(self.rng.random(n) < self.latest_prob, ids[-1], choice)
+
+    def record(self, snapshot_ids: np.ndarray, learner_pnl: np.ndarray):
+        # Results of finished games: the snapshot played and the learner's PnL on each table
+        for snapshot_id, pnl in zip(snapshot_ids.tolist(), learner_pnl.tolist()):
+            if snapshot_id in self.games:
+                self.games[snapshot_id] += 1
+                self.wins[snapshot_id] += pnl > 0
+
+
+class SelfPlayVecEnv(InProcessVecEnv):
+    # num_tables vectorized tables where seats are LEARNER, POOL or BOT. Every LEARNER seat of
+    # every table is one env of this VecEnv (row table * learners + k), so one forward pass
+    # of the policy being trained acts for all of them. POOL seats are played by snapshots
+    # drawn from pool per table and game, with one forward pass per snapshot in play covering
+    # all its tables and seats. Until the pool holds a snapshot POOL seats play as bots.
+    # Policies decide from the observations at the start of the second, then actions are applied
+    # in seat order and BOT seats decide on their turn. Rewards follow FiggieEnv for every seat.
+    # config sets the rules within what FiggieTables plays, set_config changes them as for FiggieVecEnv.
+    def __init__(self, num_tables: int, seats=(LEARNER,) * NUM_PLAYERS, pool: OpponentPool = None, seed=None,
+                 bot_strategies=None, telemetry=None, deterministic_opponents: bool = False,
+                 config: FiggieConfig = DEFAULT_CONFIG):
+        if len(seats) != NUM_PLAYERS or LEARNER not in seats:
+            raise ValueError(f'Need {NUM_PLAYERS} seats with at least one {LEARNER}, got {seats}')
+        if POOL in seats and pool is None:
+            raise ValueError(f'{POOL} seats need an OpponentPool')
+        self.render_mode = None
+        self.telemetry = action_telemetry if telemetry is None else telemetry
+        self.seats = list(seats)
+        self.learner_seats = [seat for seat, who in enumerate(seats) if who == LEARNER]
+        self.pool_seats = [seat for seat, who in enumerate(seats) if who == POOL]
+        self.pool = pool
+        self.deterministic_opponents = deterministic_opponents
+        self.num_tables = num_tables
+        self.tables = FiggieTables(num_tables, seed, bot_strategies, config)
+        learners = len(self.learner_seats)
+        # Observations of learner and pool seats, (tables, seats, ...) so rows are table-major
+        self.obs = {key: np.zeros((num_tables, learners, *shape), dtype=np.int64) for key, shape in OBS_SHAPES.items()}
+        self.pool_obs = {key: np.zeros((num_tables, len(self.pool_seats), *shape), dtype=np.int64)
+                         for key, shape in OBS_SHAPES.items()}
+        self.actions = np.zeros((num_tables, learners, 4), dtype=np.int64)
+        self.opponents = np.full(num_tables, -1)
+        self.opponent_policies = {}
+        self.player_knocked_out = np.zeros(num_tables, dtype=bool)
+        self.start_cash = np.zeros((num_tables, NUM_PLAYERS))
+        super().__init__(num_tables * learners, figgie_observation_space(config=config), figgie_action_space(config))
+
+    def _update_obs(self):
+        for k, seat in enumerate(self.learner_seats):
+            self.tables.observe(seat, {key: values[:, k] for key, values in self.obs.items()})
+
+    def _flat(self, obs: dict) -> dict:
+        return {key: values.reshape(-1, *values.shape[2:]).copy() for key, values in obs.items()}
+
+    def _draw_opponents(self, rows: np.ndarray):
+        # New pool snapshots for the tables starting a game, only snapshots in play are kept alive
+        if not self.pool_seats or not len(rows):
+            return
+        if len(self.pool) == 0:
+            self.opponents[rows] = -1
+        else:
+            self.opponents[rows] = self.pool.sample(len(rows))
+        in_play = set(self.opponents.tolist())
+        policies = {**self.opponent_policies, **self.pool.policies}
+        self.opponent_policies = {i: policies[i] for i in in_play if i != -1}
+
+    def _start_games(self, rows: np.ndarray):
+        mask = np.zeros(self.num_tables, dtype=bool)
+        mask[rows] = True
+        self.tables.reset(mask, self.player_knocked_out)
+        self.player_knocked_out[rows] = False
+        self.start_cash[rows] = self.tables.cash[rows]
+        self._draw_opponents(rows)
+
+    def reset(self):
+        if self._seeds[0] is not None:
+            self.tables.seed(self._seeds[0])
+            if self.pool is not None:
+                self.pool.rng = np.random.default_rng(self._seeds[0])
+        self._reset_seeds()
+        self._reset_options()
+        self.player_knocked_out[:] = True
+        self._start_games(self.tables.rows)
+        self._update_obs()
+        return self._flat(self.obs)
+
+    def set_config(self, config: FiggieConfig):
+        # New rules for every table, see FiggieVecEnv.set_config
+        if config.game_seconds >= self.observation_space['time_left'].n:
+            raise ValueError(f'Games of {config.game_seconds} seconds do not fit the observation space')
+        self.tables.configure(config)
+
+    def action_masks(self) -> np.ndarray:
+        # Factored masks of every learner row, see FiggieEnv.action_masks
+        masks = np.stack([self.tables.action_masks(seat) for seat in self.learner_seats], axis=1)
+        return masks.reshape(self.num_envs, -1)
+
+    def _pool_actions(self) -> dict:
+        # Actions of the pool seats, one forward pass per snapshot in play
+        actions = {}
+        if not self.pool_seats:
+            return actions
+        for k, seat in enumerate(self.pool_seats):
+            self.tables.observe(seat, {key: values[:, k] for key, values in self.pool_obs.items()})
+        pool_actions = np.zeros((self.num_tables, len(self.pool_seats), 4), dtype=np.int64)
+        for snapshot_id, policy in self.opponent_policies.items():
+            rows = np.flatnonzero(self.opponents == snapshot_id)
+            obs = {key: values[rows].reshape(-1, *values.shape[2:]) for key, values in self.pool_obs.items()}
+            predicted, _ = policy.predict(obs, deterministic=self.deterministic_opponents)
+            pool_actions[rows] = predicted.reshape(len(rows), len(self.pool_seats), 4)
+        for k, seat in enumerate(self.pool_seats):
+            actions[seat] = pool_actions[:, k]
+        return actions
+
+    def step_async(self, actions: np.ndarray):
+        np.copyto(self.actions, np.asarray(actions).reshape(self.actions.shape), casting='unsafe')
+        self.telemetry.record_batch(self.actions.reshape(-1, 4))
+
+    def step_wait(self):
+        tables = self.tables
+        ended = tables.game_has_ended()
+        running = ~ended
+        pool_actions = self._pool_actions()
+        learner_index = {seat: k for k, seat in enumerate(self.learner_seats)}
+        for seat, who in enumerate(self.seats):
+            if seat in learner_index:
+                action = self.actions[:, learner_index[seat]]
+            elif who == POOL:
+                action = pool_actions[seat]
+            else:
+                tables.bot_actions(seat, running)
+                continue
+            acting = running
+            if who == POOL:
+                # Pool seats of tables without a snapshot yet play as bots
+                without_snapshot = running & (self.opponents == -1)
+                tables.bot_actions(seat, without_snapshot)
+                acting = running & ~without_snapshot
+            tables.apply_actions(seat, action[:, 0], action[:, 1], action[:, 2], action[:, 3], acting)
+        tables.advance_game_one_second(running)
+
+        learners = len(self.learner_seats)
+        rewards = np.zeros((self.num_tables, learners), dtype=np.float32)
+        dones = np.repeat(ended, learners)
+        infos = [{} for _ in range(self.num_envs)]
+        rows = np.flatnonzero(ended)
+        if len(rows):
+            final_cash = tables.get_final_scores(rows)
+            tables.cash[rows] = final_cash
+            start_cash = self.start_cash[rows][:, self.learner_seats]
+            learner_cash = final_cash[:, self.learner_seats]
+            ante = tables.config.ante
+            rewards[rows] = np.where(learner_cash < ante, -1000, learner_cash - start_cash)
+            self.player_knocked_out[rows] = (final_cash < ante).any(axis=1)
+            if self.pool_seats:
+                played = self.opponents[rows] != -1
+                # PnL including the ante, as in tournament.py
+                pnl = (learner_cash - start_cash + ante).mean(axis=1)
+                self.pool.record(self.opponents[rows][played], pnl[played])
+            flat = self._flat(self.obs)
+            for row in np.flatnonzero(dones):
+                infos[row]['terminal_observation'] = {key: values[row] for key, values in flat.items()}
+                infos[row]['TimeLimit.truncated'] = False
+            self._start_games(rows)
+        self._update_obs()
+        return self._flat(self.obs), rewards.ravel(), dones, infos
+
+    def close(self):
+        pass
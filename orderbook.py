@@ -1,12 +1,25 @@
+from collections import deque
 import heapq
 import itertools
 from typing import List
 
+import numpy as np
+
+from config import DEFAULT_CONFIG, FiggieConfig
 from enums import *
 
+SUITS = tuple(FiggieSuit)
+SIDES = tuple(FiggieSide)
+
+BUY = FiggieSide.BUY.value
+SELL = FiggieSide.SELL.value
+BUY_SIDE = FiggieSide.BUY
+NUM_SUITS = len(FiggieSuit)
+
 
 class OrderBook:
-    def __init__(self):
+    def __init__(self, max_price: int = None):
+        # Heaps need no price bound, max_price is accepted to match LadderOrderBook
         self.bids = []  # max-heap: (-price, order)
         self.asks = []  # min-heap: (price, order)
         self.counter = itertools.count()
@@ -14,7 +27,7 @@ class OrderBook:
     def post_order(self, side, price, player_id):
         arrival_id = next(self.counter)
         order = (price, player_id)
-        if side == FiggieSide.BUY.value:
+        if side == BUY:
             heapq.heappush(self.bids, (-price, arrival_id, order))
         else:  # 'sell'
             heapq.heappush(self.asks, (price, arrival_id, order))
@@ -31,20 +44,295 @@ class OrderBook:
     def pop_best_ask(self):
         return heapq.heappop(self.asks)[2] if self.asks else (0, -1)
 
+    def cancel(self, side, price, player_id):
+        # Removes the oldest order of player_id at price
+        heap = self.bids if side == BUY else self.asks
+        order = (price, player_id)
+        matches = [i for i, entry in enumerate(heap) if entry[2] == order]
+        if matches:
+            heap.pop(min(matches, key=lambda i: heap[i][1]))
+            heapq.heapify(heap)
+
+    def orders(self, side) -> list:
+        # Every order of a side in priority order
+        return [entry[2] for entry in sorted(self.bids if side == BUY else self.asks)]
+
+    def clear(self):
+        self.bids.clear()
+        self.asks.clear()
+
     def __str__(self):
         return f"Bids: {[(-p, o) for p, id, o in self.bids]}\\nAsks: {self.asks}"
 
 
+EMPTY_ORDER = (0, -1)
+
+
+class LadderOrderBook:
+    # Order book on a preallocated price ladder 0..max_price with a FIFO queue per level.
+    # A level only counts as live when its stamp matches the current generation, so clearing
+    # the book just bumps the generation and allocates nothing. Occupied levels are tracked
+    # as a bitmask per side and the best order per side is cached for O(1) best bid / ask.
+    # A level gets a fresh queue whenever it goes live, so building a book costs no allocations.
+    def __init__(self, max_price: int = 150):
+        self.max_price = max_price
+        levels = max_price + 1
+        self.generation = 0
+        self.bid_queues = [None] * levels
+        self.ask_queues = [None] * levels
+        self.bid_stamps = [-1] * levels
+        self.ask_stamps = [-1] * levels
+        self.bid_occupied = 0
+        self.ask_occupied = 0
+        self.top_bid = EMPTY_ORDER
+        self.top_ask = EMPTY_ORDER
+
+    def post_order(self, side, price, player_id):
+        price = int(price)
+        if price < 0 or price > self.max_price:
+            raise ValueError(f'Price {price} outside the ladder 0..{self.max_price}')
+        order = (price, player_id)
+        generation = self.generation
+        if side == BUY:
+            if self.bid_stamps[price] == generation:
+                self.bid_queues[price].append(order)
+                return
+            self.bid_queues[price] = deque((order,))
+            self.bid_stamps[price] = generation
+            self.bid_occupied |= 1 << price
+            # A new level only becomes the best when it improves on the current best
+            if self.top_bid is EMPTY_ORDER or price > self.top_bid[0]:
+                self.top_bid = order
+        else:  # 'sell'
+            if self.ask_stamps[price] == generation:
+                self.ask_queues[price].append(order)
+                return
+            self.ask_queues[price] = deque((order,))
+            self.ask_stamps[price] = generation
+            self.ask_occupied |= 1 << price
+            if self.top_ask is EMPTY_ORDER or price < self.top_ask[0]:
+                self.top_ask = order
+
+    def best_bid(self):
+        return self.top_bid
+
+    def best_ask(self):
+        return self.top_ask
+
+    def pop_best_bid(self):
+        order = self.top_bid
+        if order is EMPTY_ORDER:
+            return order
+        queue = self.bid_queues[order[0]]
+        queue.popleft()
+        if not queue:
+            self.bid_stamps[order[0]] = -1
+            self.bid_occupied &= ~(1 << order[0])
+        level = self.bid_occupied.bit_length() - 1
+        self.top_bid = self.bid_queues[level][0] if level >= 0 else EMPTY_ORDER
+        return order
+
+    def pop_best_ask(self):
+        order = self.top_ask
+        if order is EMPTY_ORDER:
+            return order
+        queue = self.ask_queues[order[0]]
+        queue.popleft()
+        if not queue:
+            self.ask_stamps[order[0]] = -1
+            self.ask_occupied &= ~(1 << order[0])
+        level = _lowest_bit(self.ask_occupied)
+        self.top_ask = self.ask_queues[level][0] if level >= 0 else EMPTY_ORDER
+        return order
+
+    def cancel(self, side, price, player_id):
+        # Removes the oldest order of player_id at price, a queue holds at most a few orders
+        order = (price, player_id)
+        if side == BUY:
+            if self.bid_stamps[price] != self.generation:
+                return
+            queue = self.bid_queues[price]
+            queue.remove(order)
+            if not queue:
+                self.bid_stamps[price] = -1
+                self.bid_occupied &= ~(1 << price)
+            if price == self.top_bid[0]:
+                level = self.bid_occupied.bit_length() - 1
+                self.top_bid = self.bid_queues[level][0] if level >= 0 else EMPTY_ORDER
+        else:
+            if self.ask_stamps[price] != self.generation:
+                return
+            queue = self.ask_queues[price]
+            queue.remove(order)
+            if not queue:
+                self.ask_stamps[price] = -1
+                self.ask_occupied &= ~(1 << price)
+            if price == self.top_ask[0]:
+                level = _lowest_bit(self.ask_occupied)
+                self.top_ask = self.ask_queues[level][0] if level >= 0 else EMPTY_ORDER
+
+    def orders(self, side) -> list:
+        # Every order of a side in priority order
+        result = []
+        if side == BUY:
+            occupied = self.bid_occupied
+            while occupied:
+                level = occupied.bit_length() - 1
+                result.extend(self.bid_queues[level])
+                occupied &= ~(1 << level)
+        else:
+            occupied = self.ask_occupied
+            while occupied:
+                level = _lowest_bit(occupied)
+                result.extend(self.ask_queues[level])
+                occupied &= ~(1 << level)
+        return result
+
+    def depth(self, side, levels: int = 5):
+        # Up to levels (price, number of orders) pairs from the best price outwards
+        result = []
+        if side == BUY:
+            occupied = self.bid_occupied
+            while occupied and len(result) < levels:
+                level = occupied.bit_length() - 1
+                result.append((level, len(self.bid_queues[level])))
+                occupied &= ~(1 << level)
+        else:
+            occupied = self.ask_occupied
+            while occupied and len(result) < levels:
+                level = _lowest_bit(occupied)
+                result.append((level, len(self.ask_queues[level])))
+                occupied &= ~(1 << level)
+        return result
+
+    def clear(self):
+        self.generation += 1
+        self.bid_occupied = 0
+        self.ask_occupied = 0
+        self.top_bid = EMPTY_ORDER
+        self.top_ask = EMPTY_ORDER
+
+    def __str__(self):
+        levels = self.max_price + 1
+        return f"Bids: {self.depth(BUY, levels)}\\nAsks: {self.depth(FiggieSide.SELL.value, levels)}"
+
+
+def _lowest_bit(mask: int) -> int:
+    return (mask & -mask).bit_length() - 1
+
+
 class SuitOrderBook:
-    def __init__(self, suits: List[FiggieSuit]):
+    def __init__(self, suits: List[FiggieSuit], book_class=OrderBook, best_prices: np.ndarray = None,
+                 config: FiggieConfig = DEFAULT_CONFIG):
         self.suits = suits
-        self.reset()
-    
+        # Books hold prices up to the highest observable one, config.price_levels
+        self.books = {suit: book_class(config.price_levels) for suit in self.suits}
+        # Best bid (row BUY) and ask (row SELL) price per suit, 0 when the side is empty.
+        # Kept up to date on every change so observations never query the books.
+        if best_prices is None:
+            best_prices = np.zeros((len(FiggieSide), len(FiggieSuit)), dtype=np.int64)
+        self.best_prices = best_prices
+        self.best_buys = best_prices[FiggieSide.BUY.value]
+        self.best_sells = best_prices[FiggieSide.SELL.value]
+        # Resting quote of every player per suit and side, see track_quotes
+        self.num_players = config.num_players
+        self.quotes = None
+        self.track_quotes(config.continuous)
+
+    def track_quotes(self, enabled: bool):
+        # With quote tracking every player has at most one quote per suit and side: posting
+        # through replace_order cancels the previous one. quotes[quote_index(player, suit, side)]
+        # is its price, -1 for none, so finding or cancelling a player's quotes takes no search.
+        self.quotes = [-1] * (self.num_players * 2 * NUM_SUITS) if enabled else None
+        # Books and best price rows indexed by suit value and side value, enums are slow to index with
+        self.book_list = [self.books[suit] for suit in SUITS]
+        self._best_rows = [self.best_buys, self.best_sells]
+        self._no_quotes = [-1] * (2 * NUM_SUITS)
+
+    @staticmethod
+    def quote_index(player_id: int, suit: FiggieSuit, side: FiggieSide) -> int:
+        return (player_id * NUM_SUITS + suit.value) * 2 + side.value
+
     def reset(self):
-        self.books = {suit: OrderBook() for suit in self.suits}
+        # Books are emptied in place rather than reallocated
+        for book in self.books.values():
+            book.clear()
+        self.best_prices.fill(0)
+        if self.quotes is not None:
+            self.quotes[:] = [-1] * len(self.quotes)
+
+    def replace_order(self, player_id: int, suit: FiggieSuit, price: int, side: FiggieSide):
+        # Posts the player's quote for suit and side, cancelling the one it had
+        self.replace_quote(player_id, suit.value, int(price), BUY if side is BUY_SIDE else SELL)
+
+    def replace_quote(self, player_id: int, suit_value: int, price: int, side_value: int):
+        # replace_order taking suit and side values, for the matching loop
+        quotes = self.quotes
+        index = (player_id * NUM_SUITS + suit_value) * 2 + side_value
+        old = quotes[index]
+        quotes[index] = price
+        book = self.book_list[suit_value]
+        if side_value == BUY:
+            if old != -1:
+                book.cancel(BUY, old, player_id)
+            book.post_order(BUY, price, player_id)
+            self.best_buys[suit_value] = book.best_bid()[0]
+        else:
+            if old != -1:
+                book.cancel(SELL, old, player_id)
+            book.post_order(SELL, price, player_id)
+            self.best_sells[suit_value] = book.best_ask()[0]
+
+    def cancel_order(self, player_id: int, suit: FiggieSuit, side: FiggieSide):
+        self._cancel((player_id * NUM_SUITS + suit.value) * 2 + (BUY if side is BUY_SIDE else SELL), player_id)
+
+    def cancel_quote(self, player_id: int, suit_value: int, side_value: int):
+        # cancel_order taking suit and side values
+        self._cancel((player_id * NUM_SUITS + suit_value) * 2 + side_value, player_id)
+
+    def cancel_player(self, player_id: int):
+        self.cancel_players((player_id,))
+
+    def cancel_players(self, player_ids):
+        # Cancels every quote of the players, _cancel inlined as every trade cancels two players
+        quotes = self.quotes
+        book_list = self.book_list
+        best_buys, best_sells = self.best_buys, self.best_sells
+        for player_id in player_ids:
+            first = player_id * 2 * NUM_SUITS
+            if quotes[first:first + 2 * NUM_SUITS] == self._no_quotes:
+                continue
+            for offset, price in enumerate(quotes[first:first + 2 * NUM_SUITS]):
+                if price == -1:
+                    continue
+                quotes[first + offset] = -1
+                suit_value = offset >> 1
+                book = book_list[suit_value]
+                if offset & 1:
+                    book.cancel(SELL, price, player_id)
+                    best_sells[suit_value] = book.best_ask()[0]
+                else:
+                    book.cancel(BUY, price, player_id)
+                    best_buys[suit_value] = book.best_bid()[0]
+
+    def _cancel(self, index: int, player_id: int):
+        price = self.quotes[index]
+        if price == -1:
+            return
+        self.quotes[index] = -1
+        side_value = index & 1
+        suit_value = (index >> 1) % NUM_SUITS
+        book = self.book_list[suit_value]
+        book.cancel(side_value, price, player_id)
+        self._best_rows[side_value][suit_value] = (book.best_bid() if side_value == BUY else book.best_ask())[0]
 
     def post_order(self, player_id: int, suit: FiggieSuit, price: int, side: FiggieSide):
-        self.books[suit].post_order(side, price, player_id)
+        book = self.books[suit]
+        book.post_order(side.value, price, player_id)
+        if side == FiggieSide.BUY:
+            self.best_buys[suit.value] = book.best_bid()[0]
+        else:
+            self.best_sells[suit.value] = book.best_ask()[0]
 
     def best(self, side: FiggieSide, suit: FiggieSuit):
         if side == FiggieSide.BUY:
@@ -58,10 +346,16 @@ class SuitOrderBook:
         return self.books[suit].best_ask()
 
     def pop_best_bid(self, suit: FiggieSuit):
-        return self.books[suit].pop_best_bid()
+        book = self.books[suit]
+        order = book.pop_best_bid()
+        self.best_buys[suit.value] = book.best_bid()[0]
+        return order
 
     def pop_best_ask(self, suit: FiggieSuit):
-        return self.books[suit].pop_best_ask()
+        book = self.books[suit]
+        order = book.pop_best_ask()
+        self.best_sells[suit.value] = book.best_ask()[0]
+        return order
 
     def __str__(self):
         return '\\n'.join([f"Suit: {suit}\\n{str(book)}" for suit, book in self.books.items()])
@@ -0,0 +1,172 @@
+from functools import lru_cache
+from math import comb
+
+import numpy as np
+
+from enums import *
+from scoring import scoring_table
+
+NUM_SUITS = len(FiggieSuit)
+NUM_PLAYERS = 4
+ANTE = 50
+POT = ANTE * NUM_PLAYERS
+SCORING = scoring_table(NUM_PLAYERS)
+
+
+def _deck_configurations():
+    # Every deck FiggieGame._build_deck can build, with its goal suit: the suit of the same
+    # colour as the goal holds 12 cards, the goal 8 or 10 and the other two 10 each
+    counts = []
+    goals = []
+    for goal in range(NUM_SUITS):
+        for goal_count in (8, 10):
+            deck = [10] * NUM_SUITS
+            deck[(goal + 2) % NUM_SUITS] = 12
+            deck[goal] = goal_count
+            counts.append(deck)
+            goals.append(goal)
+    return np.array(counts), np.array(goals)
+
+
+# Deck counts per suit and goal suit of the 8 deck configurations, all equally likely a priori
+CONFIG_COUNTS, CONFIG_GOALS = _deck_configurations()
+CONFIG_SIZES = CONFIG_COUNTS.sum(axis=1)
+
+
+def hand_sizes(deck_size: int, num_players: int = NUM_PLAYERS) -> list:
+    # Cards every seat gets when deck_size cards are dealt round-robin from seat 0
+    return [len(range(seat, deck_size, num_players)) for seat in range(num_players)]
+
+
+@lru_cache(maxsize=4096)
+def _posterior(hand: tuple, seat, min_counts: tuple) -> tuple:
+    weights = []
+    cards = sum(hand)
+    for deck in CONFIG_COUNTS.tolist():
+        deck_size = sum(deck)
+        if seat is not None and hand_sizes(deck_size)[seat] != cards:
+            weights.append(0)
+            continue
+        if any(d < m for d, m in zip(deck, min_counts)):
+            weights.append(0)
+            continue
+        # Multivariate hypergeometric: the dealt hand is a uniform draw of its size from the deck
+        ways = 1
+        for d, h in zip(deck, hand):
+            ways *= comb(d, h)
+        weights.append(ways / comb(deck_size, cards))
+    weights = np.array(weights, dtype=float)
+    total = weights.sum()
+    if total == 0:
+        raise ValueError(f'No deck can deal hand {hand} to seat {seat} with at least {min_counts} cards per suit')
+    config_probs = weights / total
+    goal_probs = np.bincount(CONFIG_GOALS, weights=config_probs, minlength=NUM_SUITS)
+    return goal_probs, config_probs
+
+
+def goal_posterior(hand, seat: int = None, min_counts=None):
+    # Exact P(goal suit) and P(deck configuration) given the card counts a player was dealt.
+    # With seat set, the hand size must match the deal: a 42 card deck gives seats 0 and 1
+    # eleven cards, so their hand size tells the goal suit count. min_counts is a lower bound
+    # on every suit's deck count from other evidence, such as the most cards of a suit the
+    # player ever held at once. Results are memoized per argument tuple in a bounded LRU cache.
+    # Returns (goal_probs (4,), config_probs (8,)) over CONFIG_COUNTS, treat both as read-only.
+    hand = tuple(int(h) for h in hand)
+    min_counts = tuple(int(m) for m in min_counts) if min_counts is not None else hand
+    return _posterior(hand, seat, tuple(max(h, m) for h, m in zip(hand, min_counts)))
+
+
+class PosteriorEngine:
+    # Goal suit posterior and Monte Carlo card values for a player, memoized per input in
+    # bounded LRU caches so that calling it every step only pays for hands not seen before.
+    # suit_values estimates what one more card of each suit is worth at the end of the game:
+    # deck configurations are drawn from the posterior, the goal cards the player does not hold
+    # are dealt to the other players, and the payout with one card bought from an opponent is
+    # compared with the payout of the current hand, assuming no further trades. Payouts only
+    # depend on goal cards, so only those are dealt, one vectorized hypergeometric per opponent.
+    def __init__(self, samples: int = 1024, cache_size: int = 4096, seed: int = 0):
+        self.samples = samples
+        self.seed = seed
+        self._suit_values = lru_cache(maxsize=cache_size)(self._compute_suit_values)
+
+    def posterior(self, hand, seat: int = None, min_counts=None):
+        return goal_posterior(hand, seat, min_counts)
+
+    def suit_values(self, hand, dealt=None, seat: int = 0, min_counts=None) -> np.ndarray:
+        # Expected payout gained by buying one card of each suit, (4,). hand is held now, dealt
+        # at the start of the game (hand when omitted), both as counts per suit
+        hand = tuple(int(h) for h in hand)
+        dealt = hand if dealt is None else tuple(int(d) for d in dealt)
+        # Every card held now or dealt is a card of the deck
+        bound = tuple(max(h, d) for h, d in zip(hand, dealt))
+        if min_counts is not None:
+            bound = tuple(max(b, int(m)) for b, m in zip(bound, min_counts))
+        return self._suit_values(hand, dealt, seat, bound)
+
+    def _compute_suit_values(self, hand: tuple, dealt: tuple, seat: int, min_counts: tuple) -> np.ndarray:
+        # The generator is seeded per input, so a value never depends on the order of calls
+        rng = np.random.default_rng([self.seed, *hand, *dealt, seat, *min_counts])
+        _, config_probs = goal_posterior(dealt, seat, min_counts)
+        k = self.samples
+        config = rng.choice(len(config_probs), size=k, p=config_probs)
+        goal = CONFIG_GOALS[config]
+        own = np.array(hand)[goal]
+        # Goal cards and all cards held by the opponents, whose hands are taken as even as possible after trades
+        goal_left = CONFIG_COUNTS[config, goal] - own
+        cards_left = CONFIG_SIZES[config] - sum(hand)
+        opponents = np.zeros((k, NUM_PLAYERS), dtype=int)
+        opponents[:, 0] = own
+        for opponent in range(1, NUM_PLAYERS):
+            size = (cards_left + (NUM_PLAYERS - 1 - opponent)) // (NUM_PLAYERS - opponent)
+            if opponent < NUM_PLAYERS - 1:
+                dealt_goal = rng.hypergeometric(goal_left, cards_left - goal_left, size)
+            else:
+                dealt_goal = goal_left
+            opponents[:, opponent] = dealt_goal
+            goal_left = goal_left - dealt_goal
+            cards_left = cards_left - size
+
+        base = SCORING.batch_payouts(opponents, POT)[:, 0]
+        # Seller drawn among the opponents in proportion to the goal cards they hold
+        held = opponents[:, 1:]
+        total = held.sum(axis=1)
+        pick = rng.random(k) * np.maximum(total, 1)
+        seller = (pick[:, None] >= np.cumsum(held, axis=1)).sum(axis=1).clip(max=NUM_PLAYERS - 2)
+        bought = opponents.copy()
+        available = total > 0
+        bought[:, 0] += available
+        bought[np.arange(k), seller + 1] -= available
+        gain = SCORING.batch_payouts(bought, POT)[:, 0] - base
+        # A card of another suit pays nothing at the end, so a suit only gains in the samples where it is the goal
+        values = np.bincount(goal[available], weights=gain[available], minlength=NUM_SUITS)
+        return values / max(available.sum(), 1)
+
+if __name__ == '__main__':
+    # Posterior and card values for a freshly dealt hand, compared against dealt games
+    import time
+    from game import FiggieGame, FiggiePlayer
+
+    game = FiggieGame([FiggiePlayer(i) for i in range(NUM_PLAYERS)])
+    game.seed(0)
+    engine = PosteriorEngine()
+    hits = 0
+    log_loss = 0.0
+    games = 2000
+    for _ in range(games):
+        game.reset(True)
+        goal_probs, _ = engine.posterior(game.hands[0], seat=0)
+        hits += int(np.argmax(goal_probs) == game.goal_suit.value)
+        log_loss -= np.log(max(goal_probs[game.goal_suit.value], 1e-12))
+    print(f'Most likely goal suit is right in {hits / games:.1%} of {games} deals, log loss {log_loss / games:.3f}')
+    game.reset(True)
+    hand = game.hands[0].copy()
+    print(f'Hand {hand.tolist()}, goal {game.goal_suit.name}')
+    print(f'Goal posterior {np.round(engine.posterior(hand, seat=0)[0], 3).tolist()}')
+    start = time.perf_counter()
+    values = engine.suit_values(hand)
+    elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    engine.suit_values(hand)
+    cached = time.perf_counter() - start
+    print(f'Value of one more card per suit {np.round(values, 2).tolist()} '
+          f'({elapsed * 1000:.1f} ms, {cached * 1e6:.1f} us cached)')
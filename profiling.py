@@ -0,0 +1,96 @@
+import cProfile
+from time import perf_counter_ns
+
+# Phases of FiggieEnv.step / reset timed by a Profiler
+PHASES = ('action', 'matching', 'bots', 'observation', 'scoring', 'logging', 'reset')
+ACTION, MATCHING, BOTS, OBSERVATION, SCORING, LOGGING, RESET = range(len(PHASES))
+
+# Events counted by FiggieEnv and FiggieGame
+COUNTERS = ('steps', 'games', 'passes', 'orders', 'takes', 'trades')
+STEPS, GAMES, PASSES, ORDERS, TAKES, TRADES = range(len(COUNTERS))
+
+# Keys of Profiler.totals
+TOTAL_KEYS = tuple(f'{phase}_ns' for phase in PHASES) + tuple(f'{phase}_calls' for phase in PHASES) + COUNTERS
+
+
+class Profiler:
+    # Opt-in per-phase timers and event counters for FiggieEnv and FiggieGame. Totals are
+    # aggregated in place into fixed lists indexed by the constants above, so profiling a long
+    # run costs no memory. The instrumented code reads the clock once per phase boundary:
+    #     t = perf_counter_ns()
+    #     ...
+    #     t = profiler.lap(BOTS, t)
+    def __init__(self):
+        self.ns = [0] * len(PHASES)
+        self.calls = [0] * len(PHASES)
+        self.counts = [0] * len(COUNTERS)
+        self._last = None
+        self._capture = None
+        self._capture_steps = 0
+        self._capture_path = None
+
+    def lap(self, phase: int, start: int) -> int:
+        # Adds the time since start to phase and returns the current clock for the next lap
+        now = perf_counter_ns()
+        self.ns[phase] += now - start
+        self.calls[phase] += 1
+        return now
+
+    def totals(self) -> dict:
+        # Everything since the profiler was created or cleared: nanoseconds and calls per phase, counts
+        return dict(zip(TOTAL_KEYS, self.ns + self.calls + self.counts))
+
+    def summary(self) -> dict:
+        # Totals since the previous summary: microseconds per step and share of the profiled
+        # time per phase, and counts per step
+        totals = self.totals()
+        last = self._last or dict.fromkeys(totals, 0)
+        self._last = totals
+        return summarize({key: value - last[key] for key, value in totals.items()})
+
+    def clear(self):
+        self.ns[:] = [0] * len(PHASES)
+        self.calls[:] = [0] * len(PHASES)
+        self.counts[:] = [0] * len(COUNTERS)
+        self._last = None
+
+    def capture(self, steps: int, path: str):
+        # Runs cProfile over the next steps env steps and dumps the pstats file to path
+        self._capture = cProfile.Profile()
+        self._capture_steps = steps
+        self._capture_path = path
+        self._capture.enable()
+
+    def step_done(self):
+        self.counts[STEPS] += 1
+        if self._capture is not None:
+            self._capture_steps -= 1
+            if self._capture_steps <= 0:
+                self._capture.disable()
+                self._capture.dump_stats(self._capture_path)
+                self._capture = None
+
+
+def merge(totals: list) -> dict:
+    # Adds up the totals of several profilers, e.g. one per environment of a VecEnv
+    merged = {}
+    for profile in totals:
+        for key, value in profile.items():
+            merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+def summarize(totals: dict) -> dict:
+    # Profiler.totals (or a difference of two) as per step figures
+    steps = max(totals['steps'], 1)
+    profiled = max(sum(totals[f'{phase}_ns'] for phase in PHASES), 1)
+    summary = {}
+    for phase in PHASES:
+        ns = totals[f'{phase}_ns']
+        summary[f'{phase}_us_per_step'] = ns / steps / 1000
+        summary[f'{phase}_share'] = ns / profiled
+    summary['step_us'] = profiled / steps / 1000
+    for counter in COUNTERS[1:]:
+        summary[f'{counter}_per_step'] = totals[counter] / steps
+    summary['steps'] = totals['steps']
+    return summary
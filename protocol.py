@@ -0,0 +1,77 @@
+import struct
+
+import numpy as np
+
+# Binary protocol between server.FiggieServer and its clients. Every message is a frame:
+# a little-endian uint32 payload length and a uint8 message type, then the payload.
+# A connection can hold several seats, possibly at different tables, each known by the
+# handle the server gave it when it was seated.
+HEADER = struct.Struct('<IB')
+MAX_PAYLOAD = 1 << 24
+
+# Client to server
+JOIN = 1            # table (-1 any), seat (-1 any)
+ACTION = 2          # handle, tick of the observation acted on, action, suit, price, side
+LEAVE = 3           # handle
+# Server to client
+SEATED = 10         # handle, table, seat, then the rules of the table
+OBSERVATIONS = 11   # tick, record count, then one record per seat of the connection
+BACKPRESSURE = 12   # tick, ticks dropped, bytes buffered
+ERROR = 13          # error code, utf-8 message
+
+JOIN_PAYLOAD = struct.Struct('<ii')
+ACTION_PAYLOAD = struct.Struct('<HIBBHB')
+LEAVE_PAYLOAD = struct.Struct('<H')
+# handle, table, seat, num_players, start_cash, ante, game_seconds, tick_seconds, price_levels, max_cash,
+# continuous
+SEATED_PAYLOAD = struct.Struct('<HIBBIIIIHIB')
+OBSERVATIONS_PAYLOAD = struct.Struct('<IH')
+# handle, best bids, best asks, own cards, own cash, seconds passed, reward, flags
+OBSERVATION = struct.Struct('<H4H4H4BdHdB')
+# The same record as a numpy dtype, to build the records of many seats at once
+OBSERVATION_DTYPE = np.dtype([('handle', '<u2'), ('bids', '<u2', 4), ('asks', '<u2', 4), ('cards', 'u1', 4),
+                              ('cash', '<f8'), ('seconds', '<u2'), ('reward', '<f8'), ('flags', 'u1')])
+assert OBSERVATION_DTYPE.itemsize == OBSERVATION.size
+BACKPRESSURE_PAYLOAD = struct.Struct('<III')
+ERROR_PAYLOAD = struct.Struct('<B')
+
+# OBSERVATION flags
+NEW_GAME = 1        # first observation of a game, the seat's episode starts here
+TERMINATED = 2      # last observation of a game, reward is the seat's result
+KNOCKED_OUT = 4     # some player could not pay the next ante, cash starts over next game
+
+# ERROR codes
+NO_SEAT = 1
+BAD_MESSAGE = 2
+TOO_SLOW = 3
+
+
+def frame(message_type: int, payload: bytes = b'') -> bytes:
+    return HEADER.pack(len(payload), message_type) + payload
+
+
+def split_frames(buffer: bytearray) -> list:
+    # Removes every complete frame from the front of buffer, returns (type, payload) pairs
+    frames = []
+    offset = 0
+    size = len(buffer)
+    header_size = HEADER.size
+    while size - offset >= header_size:
+        length, message_type = HEADER.unpack_from(buffer, offset)
+        if length > MAX_PAYLOAD:
+            raise ValueError(f'Frame of {length} bytes exceeds the {MAX_PAYLOAD} byte limit')
+        end = offset + header_size + length
+        if end > size:
+            break
+        frames.append((message_type, bytes(buffer[offset + header_size:end])))
+        offset = end
+    del buffer[:offset]
+    return frames
+
+
+def unpack_observations(payload: bytes):
+    # (tick, records), records being OBSERVATION tuples: handle, 4 best bids, 4 best asks,
+    # 4 own cards, own cash, seconds passed, reward, flags
+    tick, count = OBSERVATIONS_PAYLOAD.unpack_from(payload)
+    start = OBSERVATIONS_PAYLOAD.size
+    return tick, list(OBSERVATION.iter_unpack(payload[start:start + count * OBSERVATION.size]))
@@ -0,0 +1,296 @@
+import argparse
+import os
+import struct
+import time
+
+import numpy as np
+
+from events import ACTIONS, EventRecorder
+from enums import *
+
+NUM_SUITS = len(FiggieSuit)
+NUM_PLAYERS = 4
+
+# Every record file starts with MAGIC, the record size and the number of players of the games,
+# then holds packed fixed-width records. Files written before the player count was stored hold
+# zero there and 4 player games.
+MAGIC = b'FIGRPL1\n'
+_HEADER = struct.Struct('<8sIB3x')
+
+# Observation of the agent as in FiggieEnv
+OBS = np.dtype([
+    ('best_buys', 'u1', NUM_SUITS),
+    ('best_sells', 'u1', NUM_SUITS),
+    ('own_cards', 'u1', NUM_SUITS),
+    ('own_cash', '<f8'),
+    ('time_left', '<u2'),
+])
+# One trade, as in EventRecorder.trade
+FILL = np.dtype([
+    ('episode', '<u4'),
+    ('second', '<u2'),
+    ('counterpart_sells', '?'),
+    ('counterpart', 'u1'),
+    ('aggressor', 'u1'),
+    ('suit', 'u1'),
+    ('price', 'u1'),
+])
+PLAYER_KNOCKED = 1
+AGENT_KNOCKED = 2
+
+
+def record_dtypes(num_players: int = NUM_PLAYERS) -> dict:
+    # Record dtypes of the step, fill and episode files for games of num_players players
+    return {
+        # One FiggieEnv.step: the observation acted on, the agent's action, what every seat did
+        # that second (action, suit, price, side; all zero for a pass and in the step that scores
+        # the game), the reward and the observation returned
+        'steps': np.dtype([
+            ('episode', '<u4'),
+            ('obs', OBS),
+            ('action', 'u1', 4),
+            ('actions', 'u1', (num_players, 4)),
+            ('reward', '<f8'),
+            ('terminated', '?'),
+            ('next_obs', OBS),
+        ]),
+        'fills': FILL,
+        # One game, the index into the step and fill files
+        'episodes': np.dtype([
+            ('first_step', '<u8'),
+            ('steps', '<u4'),
+            ('first_fill', '<u8'),
+            ('fills', '<u4'),
+            ('goal_suit', 'u1'),
+            ('hands', 'u1', (num_players, NUM_SUITS)),
+            ('start_cash', '<f8', num_players),
+            ('final_scores', '<f8', num_players),
+            ('reward', '<f8'),
+            ('flags', 'u1'),
+        ]),
+    }
+
+
+FILES = record_dtypes()
+STEP = FILES['steps']
+EPISODE = FILES['episodes']
+
+# struct layouts of the records above, packing a record this way is much cheaper than
+# filling a NumPy record field by field
+_OBS = f'{NUM_SUITS}B{NUM_SUITS}B{NUM_SUITS}BdH'
+_FILL = struct.Struct('<IH?BBBB')
+
+
+def _record_structs(num_players: int) -> tuple:
+    # struct layouts of the step and episode records of record_dtypes(num_players)
+    step = struct.Struct(f'<I{_OBS}4B{4 * num_players}Bd?{_OBS}')
+    episode = struct.Struct(f'<QIQIB{num_players * NUM_SUITS}B{num_players}d{num_players}ddB')
+    dtypes = record_dtypes(num_players)
+    assert (step.size, _FILL.size, episode.size) == (dtypes['steps'].itemsize, FILL.itemsize,
+                                                     dtypes['episodes'].itemsize)
+    return step, episode
+
+
+def _obs_fields(obs: dict) -> list:
+    return [*obs['best_buys'].tolist(), *obs['best_sells'].tolist(), *obs['own_cards'].tolist(),
+            obs['own_cash'], obs['time_left']]
+
+
+def _read_header(path: str) -> tuple:
+    # The record size and number of players of an existing record file
+    with open(path, 'rb') as f:
+        magic, itemsize, num_players = _HEADER.unpack(f.read(_HEADER.size))
+    if magic != MAGIC:
+        raise ValueError(f'{path} is not a Figgie replay file')
+    return itemsize, num_players or NUM_PLAYERS
+
+
+def _open_records(path: str, dtype: np.dtype, num_players: int) -> int:
+    # Creates the record file or checks an existing one, returns the number of records in it
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        with open(path, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, dtype.itemsize, num_players))
+        return 0
+    if _read_header(path) != (dtype.itemsize, num_players):
+        raise ValueError(f'{path} is not a Figgie replay file of {dtype.itemsize} byte records '
+                         f'of {num_players} player games')
+    return (os.path.getsize(path) - _HEADER.size) // dtype.itemsize
+
+
+class ReplayRecorder(EventRecorder):
+    # Records whole FiggieEnv episodes into the replay directory path: the deal, the goal
+    # suit, every action of every seat, every fill and the final scores, plus every agent
+    # transition for offline RL. Pass it as FiggieEnv(events=ReplayRecorder(path)).
+    # Records are appended to steps.bin, fills.bin and episodes.bin, episodes.bin being the
+    # index of the other two. Episodes are buffered and written whole, at least buffer_size
+    # bytes at a time, so the files only ever hold complete episodes and a directory can be
+    # appended to by later runs. Read them back with ReplayReader. num_players is the number of
+    # players of the recorded games, config.num_players of the env, and sizes the records.
+    def __init__(self, path: str, buffer_size: int = 1 << 20, num_players: int = NUM_PLAYERS):
+        super().__init__(ACTIONS)
+        self.path = path
+        self.buffer_size = buffer_size
+        self.num_players = num_players
+        self._step, self._episode = _record_structs(num_players)
+        os.makedirs(path, exist_ok=True)
+        self.files = {}
+        counts = {}
+        for name, dtype in record_dtypes(num_players).items():
+            file_path = os.path.join(path, f'{name}.bin')
+            counts[name] = _open_records(file_path, dtype, num_players)
+            self.files[name] = open(file_path, 'ab')
+        self.step_count = counts['steps']
+        self.fill_count = counts['fills']
+        self.episode_count = counts['episodes']
+        self.buffers = {name: bytearray() for name in FILES}
+        # Rows of the episode in progress, moved to the buffers once it is scored
+        self.episode_steps = bytearray()
+        self.episode_fills = bytearray()
+        self.seat_actions = [0] * (4 * num_players)
+        self.episode = None
+
+    def game_start(self, goal_suit, cash, hands):
+        if len(hands) != self.num_players:
+            raise ValueError(f'ReplayRecorder of {self.num_players} player games got a game of {len(hands)} players')
+        self.episode_steps.clear()
+        self.episode_fills.clear()
+        self.episode = [goal_suit, hands.ravel().tolist(), list(cash), None]
+        self.seat_actions[:] = [0] * (4 * self.num_players)
+
+    def trade(self, counterpart_sells, counterpart_id, aggressor_id, suit, price, seconds):
+        self.episode_fills += _FILL.pack(self.episode_count, seconds, counterpart_sells, counterpart_id, aggressor_id,
+                                         suit, price)
+
+    def action(self, player_id, action, suit, price, side, seconds):
+        self.seat_actions[4 * player_id:4 * player_id + 4] = action, suit, price, side
+
+    def game_end(self, goal_suit, holdings, final_scores, player_knocked, agent_knocked, reward):
+        flags = (PLAYER_KNOCKED if player_knocked else 0) | (AGENT_KNOCKED if agent_knocked else 0)
+        self.episode[3] = (list(final_scores), reward, flags)
+
+    def step(self, obs, action, reward, terminated, next_obs):
+        if self.episode is None:
+            # Started before the recorder was attached to a game
+            return
+        self.episode_steps += self._step.pack(self.episode_count, *_obs_fields(obs), *(int(a) for a in action),
+                                         *self.seat_actions, reward, terminated, *_obs_fields(next_obs))
+        self.seat_actions[:] = [0] * (4 * self.num_players)
+        if terminated and self.episode[3] is not None:
+            self._end_episode()
+
+    def _end_episode(self):
+        goal_suit, hands, start_cash, (final_scores, reward, flags) = self.episode
+        steps = len(self.episode_steps) // self._step.size
+        fills = len(self.episode_fills) // _FILL.size
+        self.buffers['episodes'] += self._episode.pack(self.step_count, steps, self.fill_count, fills, goal_suit, *hands,
+                                                  *start_cash, *final_scores, reward, flags)
+        self.buffers['steps'] += self.episode_steps
+        self.buffers['fills'] += self.episode_fills
+        self.step_count += steps
+        self.fill_count += fills
+        self.episode_count += 1
+        self.episode = None
+        if len(self.buffers['steps']) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        # Writes the buffered episodes, steps and fills first so the index never points past them
+        for name in ('steps', 'fills', 'episodes'):
+            buffer = self.buffers[name]
+            if buffer:
+                self.files[name].write(buffer)
+                buffer.clear()
+            self.files[name].flush()
+
+    def close(self):
+        # An episode still in progress is dropped
+        if not self.files['steps'].closed:
+            self.flush()
+            for f in self.files.values():
+                f.close()
+
+
+class ReplayReader:
+    # Memory-maps the record files of a replay directory. steps, fills and episodes are
+    # read-only structured arrays backed by the files, so slicing them reads from the page
+    # cache without parsing or copying and datasets larger than RAM can be replayed. The record
+    # dtypes are sized by the number of players stored in the file headers.
+    def __init__(self, path: str):
+        self.path = path
+        episodes_path = os.path.join(path, 'episodes.bin')
+        self.num_players = _read_header(episodes_path)[1] if os.path.exists(episodes_path) else NUM_PLAYERS
+        arrays = {}
+        for name, dtype in record_dtypes(self.num_players).items():
+            file_path = os.path.join(path, f'{name}.bin')
+            count = _open_records(file_path, dtype, self.num_players) if os.path.exists(file_path) else 0
+            arrays[name] = (np.memmap(file_path, dtype, mode='r', offset=_HEADER.size, shape=(count,)) if count
+                            else np.zeros(0, dtype))
+        self.steps = arrays['steps']
+        self.fills = arrays['fills']
+        self.episodes = arrays['episodes']
+
+    def __len__(self):
+        return len(self.steps)
+
+    def batches(self, batch_size: int = 65536, start: int = 0, stop: int = None):
+        # Consecutive transitions as views of the step file, access fields as batch['obs']['own_cards'] etc.
+        stop = len(self.steps) if stop is None else min(stop, len(self.steps))
+        for first in range(start, stop, batch_size):
+            yield self.steps[first:min(first + batch_size, stop)]
+
+    def sample(self, batch_size: int, rng: np.random.Generator) -> np.ndarray:
+        # Uniformly drawn transitions, a copy since the rows are not contiguous
+        return self.steps[np.sort(rng.integers(0, len(self.steps), batch_size))]
+
+    def episode(self, index: int):
+        # The index record of an episode with views of its steps and fills
+        record = self.episodes[index]
+        first_step, first_fill = int(record['first_step']), int(record['first_fill'])
+        return (record, self.steps[first_step:first_step + int(record['steps'])],
+                self.fills[first_fill:first_fill + int(record['fills'])])
+
+
+def record_random_episodes(path: str, episodes: int, seed: int = None):
+    # Plays FiggieEnv with uniformly random agent actions and records every episode
+    from environment import FiggieEnv
+    from telemetry import ActionTelemetry
+    recorder = ReplayRecorder(path)
+    env = FiggieEnv(telemetry=ActionTelemetry(), events=recorder)
+    env.reset(seed=seed)
+    env.action_space.seed(seed)
+    for _ in range(episodes):
+        terminated = False
+        while not terminated:
+            _, _, terminated, _, _ = env.step(env.action_space.sample())
+        env.reset()
+    recorder.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Figgie episode replays')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    record_parser = subparsers.add_parser('record', help='Record episodes of random agent actions into a replay directory')
+    record_parser.add_argument('path')
+    record_parser.add_argument('--episodes', type=int, default=100)
+    record_parser.add_argument('--seed', type=int, default=None)
+    info_parser = subparsers.add_parser('info', help='Summarize a replay directory and time reading it')
+    info_parser.add_argument('path')
+    info_parser.add_argument('--batch-size', type=int, default=65536)
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        start = time.perf_counter()
+        record_random_episodes(args.path, args.episodes, args.seed)
+        elapsed = time.perf_counter() - start
+        print(f'{args.episodes} episodes recorded in {elapsed:.1f}s')
+    elif args.command == 'info':
+        reader = ReplayReader(args.path)
+        size = sum(os.path.getsize(os.path.join(args.path, f'{name}.bin')) for name in FILES)
+        print(f'{len(reader.episodes):,} episodes, {len(reader.steps):,} steps, {len(reader.fills):,} fills, '
+              f'{size / 2 ** 20:,.1f} MiB')
+        start = time.perf_counter()
+        reward = 0.0
+        for batch in reader.batches(args.batch_size):
+            reward += batch['reward'].sum()
+        elapsed = time.perf_counter() - start
+        print(f'Total reward {reward:,.1f}, read in {elapsed:.3f}s ({len(reader.steps) / max(elapsed, 1e-9):,.0f} steps/sec)')
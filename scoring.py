@@ -0,0 +1,92 @@
+from functools import lru_cache
+
+import numpy as np
+
+# Every goal card pays its holder CARD_VALUE out of the pot, the rest of the pot is split
+# between the players holding the most goal cards
+CARD_VALUE = 10
+# The goal suit has 8 or 10 cards, so no player can hold more
+MAX_GOAL_CARDS = 10
+# Largest table to precompute, the rows grow as (MAX_GOAL_CARDS + 1) ** num_players: 5 players
+# take ~160k rows, beyond that payouts are computed directly from the counts
+MAX_TABLE_ROWS = (MAX_GOAL_CARDS + 1) ** 5
+
+
+class ScoringTable:
+    # Payouts of every possible vector of goal card counts, precomputed once per player count.
+    # A count vector is coded in base max_count + 1 and the tables hold, per code, the goal
+    # cards in play and the bonus winners. Payouts are computed with the same operations as
+    # FiggieGame.get_final_scores, so they match it bit for bit for any pot size:
+    #     payout = CARD_VALUE * count + winner * (pot - CARD_VALUE * total) / number_of_winners
+    # Tables over max_rows rows are not built, the same operations then run on the counts.
+    def __init__(self, num_players: int = 4, max_count: int = MAX_GOAL_CARDS, max_rows: int = MAX_TABLE_ROWS):
+        self.num_players = num_players
+        self.max_count = max_count
+        self.tabulated = (max_count + 1) ** num_players <= max_rows
+        if not self.tabulated:
+            return
+        self.radix = (max_count + 1) ** np.arange(num_players)
+        counts = np.indices((max_count + 1,) * num_players).reshape(num_players, -1).T[:, ::-1]
+        # Row code of counts is counts @ radix
+        self.counts = np.ascontiguousarray(counts)
+        self.totals = counts.sum(axis=1)
+        self.winners = counts == counts.max(axis=1, keepdims=True)
+        self.number_of_winners = self.winners.sum(axis=1)
+        # Scalar lookups index Python tuples, which is faster than indexing arrays one element at a time
+        self._scalar = [(int(total), tuple(np.flatnonzero(winners).tolist()))
+                        for total, winners in zip(self.totals, self.winners)]
+        self._radix = self.radix.tolist()
+
+    def code(self, counts) -> int:
+        return sum(c * r for c, r in zip(counts, self._radix))
+
+    def payouts(self, counts, pot) -> list:
+        # Payout of every player given their goal card counts and the pot before payouts
+        if self.tabulated:
+            total, winners = self._scalar[self.code(counts)]
+        else:
+            total = sum(counts)
+            most = max(counts)
+            winners = [i for i, c in enumerate(counts) if c == most]
+        payouts = [CARD_VALUE * c for c in counts]
+        bonus = (pot - CARD_VALUE * total) / len(winners)
+        for w in winners:
+            payouts[w] += bonus
+        return payouts
+
+    def batch_payouts(self, counts: np.ndarray, pot) -> np.ndarray:
+        # (N, players) goal card counts and a pot per row (or one for all) to (N, players) payouts
+        if self.tabulated:
+            code = counts @ self.radix
+            winners = self.winners[code]
+            totals = self.totals[code]
+            number_of_winners = self.number_of_winners[code]
+        else:
+            winners = counts == counts.max(axis=1, keepdims=True)
+            totals = counts.sum(axis=1)
+            number_of_winners = winners.sum(axis=1)
+        bonus = (pot - CARD_VALUE * totals) / number_of_winners
+        return CARD_VALUE * counts + winners * bonus[:, None]
+
+
+@lru_cache(maxsize=None)
+def scoring_table(num_players: int = 4) -> ScoringTable:
+    # Shared table per player count, built on first use
+    return ScoringTable(num_players)
+
+
+if __name__ == '__main__':
+    # Throughput of the tables, test_scoring.py checks them against the original scoring
+    import time
+
+    rng = np.random.default_rng(0)
+    table = scoring_table(4)
+    counts = rng.integers(0, MAX_GOAL_CARDS + 1, (1 << 20, 4))
+    start = time.perf_counter()
+    table.batch_payouts(counts, 200)
+    print(f'batch_payouts: {len(counts) / (time.perf_counter() - start):,.0f} rows/sec')
+    hand = [3, 2, 3, 0]
+    start = time.perf_counter()
+    for _ in range(100000):
+        table.payouts(hand, 200)
+    print(f'payouts: {100000 / (time.perf_counter() - start):,.0f} calls/sec')
@@ -0,0 +1,607 @@
+import argparse
+import asyncio
+from collections import deque
+import multiprocessing as mp
+import socket
+import time
+
+import numpy as np
+
+from config import DEFAULT_CONFIG, FiggieConfig
+from game import FiggieGame, FiggiePlayer, PASS_ACTION, SUITS, SIDES, seat_reward
+from protocol import (ACTION, ACTION_PAYLOAD, BACKPRESSURE, BACKPRESSURE_PAYLOAD, BAD_MESSAGE, ERROR, ERROR_PAYLOAD,
+                      HEADER, JOIN, JOIN_PAYLOAD, KNOCKED_OUT, LEAVE, LEAVE_PAYLOAD, NEW_GAME, NO_SEAT, OBSERVATION,
+                      OBSERVATION_DTYPE, OBSERVATIONS, OBSERVATIONS_PAYLOAD, SEATED, SEATED_PAYLOAD, TERMINATED,
+                      TOO_SLOW, frame, split_frames)
+from vec_game import ASK, BID, NUM_PLAYERS, FiggieTables, supports_config
+from enums import *
+
+ACTIONS = tuple(FiggieInGameAction)
+
+
+class Table:
+    # One FiggieGame whose seats are played by remote agents, or by bots while nobody sits
+    # there. A table only plays while an agent is seated. Games follow FiggieParallelEnv:
+    # every tick the actions agents sent for the previous observations are applied in seat
+    # order, bots deciding on their turn, and the game advances one tick. The tick that ends
+    # a game also scores it, the next one deals a new game. Cash carries over between games
+    # until a player is knocked out.
+    def __init__(self, table_id: int, config: FiggieConfig, seed):
+        self.table_id = table_id
+        self.config = config
+        self.players = [FiggiePlayer(seat, config=config) for seat in range(config.num_players)]
+        self.game = FiggieGame(self.players, config=config)
+        self.game.seed(seed)
+        # (connection, handle) of the agent of every seat, None for a bot
+        self.agents = [None] * config.num_players
+        self.seated = 0
+        # Action of every agent for the current tick, None until it arrives
+        self.pending = [None] * config.num_players
+        # Seats sent an observation last tick, which owe an action this tick
+        self.expecting = [False] * config.num_players
+        self.game_over = True
+        self.player_knocked_out = True
+        self.start_cash = [0] * config.num_players
+        self.rewards = [0.0] * config.num_players
+        self.flags = 0
+
+    def free_seat(self):
+        return next((seat for seat, agent in enumerate(self.agents) if agent is None), None)
+
+    def sit(self, seat: int, agent: tuple):
+        if self.seated == 0:
+            # Idle tables stop mid-game, agents start from a new game
+            self.game_over = True
+        self.agents[seat] = agent
+        self.pending[seat] = None
+        self.expecting[seat] = False
+        self.seated += 1
+
+    def leave(self, seat: int):
+        self.agents[seat] = None
+        self.pending[seat] = None
+        self.seated -= 1
+
+    def submit(self, seat: int, action: int, suit: int, price: int, side: int):
+        self.pending[seat] = (PASS_ACTION if action == FiggieInGameAction.PASS.value
+                              else FiggieAction(ACTIONS[action], SUITS[suit], SIDES[side], price))
+
+    def tick(self) -> int:
+        # Plays one tick, returns the number of agents that missed its deadline
+        game = self.game
+        players = self.players
+        misses = 0
+        if self.game_over:
+            game.reset(self.player_knocked_out)
+            self.player_knocked_out = False
+            self.start_cash = [player.cash for player in players]
+            self.rewards = [0.0] * len(players)
+            # Actions answering the last observation of the previous game do not carry over
+            self.pending = [None] * len(players)
+            self.game_over = False
+            self.flags = NEW_GAME
+            return 0
+        agents = self.agents
+        pending = self.pending
+        expecting = self.expecting
+        for player in players:
+            seat = player.player_id
+            if agents[seat] is None:
+                game.apply_action(seat, player.generate_action(game.get_offers()))
+                continue
+            action = pending[seat]
+            if action is None:
+                misses += expecting[seat]
+                continue
+            pending[seat] = None
+            game.apply_action(seat, action)
+        game.advance_game_one_second()
+        self.flags = 0
+        if game.game_has_ended():
+            final_cash = game.get_final_scores()
+            ante = self.config.ante
+            for player, cash in zip(players, final_cash):
+                player.cash = cash
+            self.player_knocked_out = any(cash < ante for cash in final_cash)
+            self.rewards = [seat_reward(cash, start, ante) for cash, start in zip(final_cash, self.start_cash)]
+            self.game_over = True
+            self.flags = TERMINATED | (KNOCKED_OUT if self.player_knocked_out else 0)
+        return misses
+
+    def observe(self, tick: int, touched: list):
+        # Adds the observation of every agent to its connection's batch for this tick
+        game = self.game
+        rows = game.observation_block.tolist()
+        bids, asks = rows[0], rows[1]
+        seconds = game.seconds_passed
+        flags = self.flags
+        owes = not flags & TERMINATED
+        for seat, agent in enumerate(self.agents):
+            if agent is None:
+                continue
+            connection, handle = agent
+            if connection.paused:
+                # Nothing is sent to a client that does not keep up, so it owes nothing
+                connection.drop(tick)
+                self.expecting[seat] = False
+                continue
+            records = connection.records
+            if not records:
+                touched.append(connection)
+            records.append(OBSERVATION.pack(handle, *bids, *asks, *rows[2 + seat], self.players[seat].cash, seconds,
+                                            self.rewards[seat] if flags & TERMINATED else 0.0, flags))
+            self.expecting[seat] = owes
+
+
+class BatchedTable:
+    # Seats of one row of a TableBatch, with the interface of Table the connections use
+    def __init__(self, batch: 'TableBatch', table_id: int):
+        self.batch = batch
+        self.table_id = table_id
+        self.config = batch.config
+        self.agents = [None] * NUM_PLAYERS
+        self.seated = 0
+
+    def free_seat(self):
+        return next((seat for seat, agent in enumerate(self.agents) if agent is None), None)
+
+    def sit(self, seat: int, agent: tuple):
+        batch = self.batch
+        if self.seated == 0:
+            batch.game_over[self.table_id] = True
+        self.agents[seat] = agent
+        self.seated += 1
+        batch.seat_changed(self.table_id, seat)
+
+    def leave(self, seat: int):
+        self.agents[seat] = None
+        self.seated -= 1
+        self.batch.seat_changed(self.table_id, seat)
+
+    def submit(self, seat: int, action: int, suit: int, price: int, side: int):
+        batch = self.batch
+        batch.actions[self.table_id, seat] = (action, suit, price, side)
+        batch.has_action[self.table_id, seat] = True
+
+
+class TableBatch:
+    # Every table of a server played as one vec_game.FiggieTables, following the rules of
+    # Table: one tick steps all playing tables with a few array operations per seat, and the
+    # observations of all agents are built as one OBSERVATION_DTYPE array that is sliced per
+    # connection. Bots are those of FiggieTables. Only rules FiggieTables supports can be
+    # played this way, see vec_game.supports_config.
+    def __init__(self, num_tables: int, config: FiggieConfig, seed):
+        self.config = config
+        self.tables = FiggieTables(num_tables, seed, config=config)
+        self.views = [BatchedTable(self, table_id) for table_id in range(num_tables)]
+        self.seated = np.zeros(num_tables, dtype=np.int64)
+        self.present = np.zeros((num_tables, NUM_PLAYERS), dtype=bool)
+        # Action of every agent for the current tick, valid where has_action is set
+        self.actions = np.zeros((num_tables, NUM_PLAYERS, 4), dtype=np.int64)
+        self.has_action = np.zeros((num_tables, NUM_PLAYERS), dtype=bool)
+        self.expecting = np.zeros((num_tables, NUM_PLAYERS), dtype=bool)
+        self.game_over = np.ones(num_tables, dtype=bool)
+        self.player_knocked_out = np.ones(num_tables, dtype=bool)
+        self.start_cash = np.zeros((num_tables, NUM_PLAYERS))
+        self.rewards = np.zeros((num_tables, NUM_PLAYERS))
+        self.flags = np.zeros(num_tables, dtype=np.uint8)
+        # Rows, seats and handles of every agent grouped by connection, rebuilt after seats change
+        self.layout = None
+
+    def seat_changed(self, row: int, seat: int):
+        view = self.views[row]
+        self.seated[row] = view.seated
+        self.present[row, seat] = view.agents[seat] is not None
+        self.has_action[row, seat] = False
+        self.expecting[row, seat] = False
+        self.layout = None
+
+    def _layout(self):
+        if self.layout is None:
+            by_connection = {}
+            for view in self.views:
+                for seat, agent in enumerate(view.agents):
+                    if agent is not None:
+                        connection, handle = agent
+                        by_connection.setdefault(connection, []).append((view.table_id, seat, handle))
+            entries = [entry for seats in by_connection.values() for entry in seats]
+            rows, seats, handles = np.array(entries, dtype=np.int64).reshape(-1, 3).T
+            groups = []
+            start = 0
+            for connection, connection_seats in by_connection.items():
+                groups.append((connection, start, start + len(connection_seats)))
+                start += len(connection_seats)
+            self.layout = rows, seats, handles, groups
+        return self.layout
+
+    def tick(self) -> tuple:
+        # Plays one tick of every table with an agent seated, returns the number of tables
+        # played and of agents that missed the deadline
+        tables = self.tables
+        playing = self.seated > 0
+        new = playing & self.game_over
+        running = playing & ~self.game_over
+        if new.any():
+            tables.reset(new, self.player_knocked_out)
+            self.player_knocked_out[new] = False
+            self.start_cash[new] = tables.cash[new]
+            self.rewards[new] = 0
+            # Actions answering the last observation of the previous game do not carry over
+            self.has_action[new] = False
+            self.game_over[new] = False
+            self.flags[new] = NEW_GAME
+        misses = 0
+        if running.any():
+            actions = self.actions
+            for seat in range(NUM_PLAYERS):
+                present = self.present[:, seat]
+                bots = running & ~present
+                if bots.any():
+                    tables.bot_actions(seat, bots)
+                acting = running & self.has_action[:, seat]
+                misses += int((running & present & ~acting & self.expecting[:, seat]).sum())
+                tables.apply_actions(seat, actions[:, seat, 0], actions[:, seat, 1], actions[:, seat, 2],
+                                     actions[:, seat, 3], acting)
+            self.has_action[running] = False
+            tables.advance_game_one_second(running)
+            self.flags[running] = 0
+            ended = np.flatnonzero(running & tables.game_has_ended())
+            if len(ended):
+                final_cash = tables.get_final_scores(ended)
+                tables.cash[ended] = final_cash
+                ante = self.config.ante
+                knocked_out = (final_cash < ante).any(axis=1)
+                self.player_knocked_out[ended] = knocked_out
+                # seat_reward of every seat
+                self.rewards[ended] = np.where(final_cash < ante, -1000, final_cash - self.start_cash[ended])
+                self.game_over[ended] = True
+                self.flags[ended] = TERMINATED | np.where(knocked_out, KNOCKED_OUT, 0)
+        return int(playing.sum()), misses
+
+    def observe(self, tick: int, touched: list):
+        # Adds the observations of every agent to its connection's batch for this tick
+        rows, seats, handles, groups = self._layout()
+        if not groups:
+            return
+        tables = self.tables
+        flags = self.flags[rows]
+        terminated = (flags & TERMINATED) != 0
+        records = np.empty(len(rows), dtype=OBSERVATION_DTYPE)
+        records['handle'] = handles
+        records['bids'] = tables.book_price[rows, :, BID]
+        records['asks'] = tables.book_price[rows, :, ASK]
+        records['cards'] = tables.hands[rows, seats]
+        records['cash'] = tables.cash[rows, seats]
+        records['seconds'] = tables.seconds_passed[rows]
+        records['reward'] = np.where(terminated, self.rewards[rows, seats], 0.0)
+        records['flags'] = flags
+        self.expecting[rows, seats] = ~terminated
+        for connection, start, stop in groups:
+            if connection.paused:
+                # Nothing is sent to a client that does not keep up, so it owes nothing
+                connection.drop(tick)
+                self.expecting[rows[start:stop], seats[start:stop]] = False
+                continue
+            if not connection.records:
+                touched.append(connection)
+            connection.records.append(records[start:stop].tobytes())
+
+
+class AgentConnection(asyncio.Protocol):
+    # One client connection, holding any number of seats at any tables. Seat handles index
+    # self.seats. Observations of a tick are batched into one OBSERVATIONS frame per connection.
+    # The transport signals when its write buffer passes the server's limit: the client is then
+    # sent BACKPRESSURE, its observations are dropped until the buffer drains, and a client
+    # that stays behind for max_paused_ticks is disconnected.
+    def __init__(self, server: 'FiggieServer'):
+        self.server = server
+        self.transport = None
+        self.buffer = bytearray()
+        self.seats = []
+        self.records = []
+        self.paused = False
+        self.paused_since = 0
+        self.dropped = 0
+        self.dropped_tick = -1
+
+    def connection_made(self, transport):
+        self.transport = transport
+        transport.set_write_buffer_limits(high=self.server.write_buffer_limit)
+        # A small kernel buffer too, otherwise seconds of stale observations queue up there
+        # before the transport sees any backpressure
+        transport.get_extra_info('socket').setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF,
+                                                      self.server.write_buffer_limit)
+        self.server.connections.add(self)
+
+    def connection_lost(self, exc):
+        self.server.connections.discard(self)
+        for handle in range(len(self.seats)):
+            self._leave(handle)
+
+    def data_received(self, data):
+        self.buffer += data
+        try:
+            frames = split_frames(self.buffer)
+        except ValueError as e:
+            self.error(BAD_MESSAGE, str(e))
+            self.transport.close()
+            return
+        for message_type, payload in frames:
+            if message_type == ACTION and len(payload) == ACTION_PAYLOAD.size:
+                self.server.submit(self, *ACTION_PAYLOAD.unpack(payload))
+            elif message_type == JOIN and len(payload) == JOIN_PAYLOAD.size:
+                self._join(*JOIN_PAYLOAD.unpack(payload))
+            elif message_type == LEAVE and len(payload) == LEAVE_PAYLOAD.size:
+                self._leave(*LEAVE_PAYLOAD.unpack(payload))
+            else:
+                self.error(BAD_MESSAGE, f'Malformed message of type {message_type}')
+
+    def pause_writing(self):
+        self.paused = True
+        self.paused_since = self.server.tick
+        self.server.stats['backpressure'] += 1
+        self.transport.write(frame(BACKPRESSURE, BACKPRESSURE_PAYLOAD.pack(
+            self.server.tick, self.dropped, self.transport.get_write_buffer_size())))
+
+    def resume_writing(self):
+        self.paused = False
+        self.transport.write(frame(BACKPRESSURE, BACKPRESSURE_PAYLOAD.pack(
+            self.server.tick, self.dropped, self.transport.get_write_buffer_size())))
+
+    def drop(self, tick: int):
+        # Counts a tick whose observations the client did not get
+        if self.dropped_tick != tick:
+            self.dropped_tick = tick
+            self.dropped += 1
+            self.server.stats['dropped'] += 1
+            if tick - self.paused_since >= self.server.max_paused_ticks:
+                self.error(TOO_SLOW, f'No progress reading observations for {tick - self.paused_since} ticks')
+                self.transport.abort()
+
+    def error(self, code: int, message: str):
+        self.transport.write(frame(ERROR, ERROR_PAYLOAD.pack(code) + message.encode()))
+
+    def flush(self, tick: int):
+        # records holds packed OBSERVATION records, one or many per entry
+        records = self.records
+        data = b''.join(records)
+        payload = OBSERVATIONS_PAYLOAD.pack(tick, len(data) // OBSERVATION.size) + data
+        self.transport.write(HEADER.pack(len(payload), OBSERVATIONS) + payload)
+        records.clear()
+
+    def _join(self, table_id: int, seat: int):
+        server = self.server
+        table = server.find_seat(table_id, seat)
+        if table is None or len(self.seats) > 0xFFFF:
+            self.error(NO_SEAT, f'No free seat {seat} at table {table_id}')
+            return
+        if seat < 0:
+            seat = table.free_seat()
+        handle = len(self.seats)
+        self.seats.append((table, seat))
+        table.sit(seat, (self, handle))
+        config = table.config
+        self.transport.write(frame(SEATED, SEATED_PAYLOAD.pack(
+            handle, table.table_id, seat, config.num_players, config.start_cash, config.ante, config.game_seconds,
+            config.tick_seconds, config.price_levels, config.max_cash, config.continuous)))
+
+    def _leave(self, handle: int):
+        if handle < len(self.seats) and self.seats[handle] is not None:
+            table, seat = self.seats[handle]
+            table.leave(seat)
+            self.seats[handle] = None
+
+
+class FiggieServer:
+    # Hosts num_tables tables of FiggieGame for remote agents over TCP or a Unix socket, see
+    # protocol.py for the messages. Every tick_interval seconds all playing tables advance one
+    # tick and every agent is sent its observation. An action must answer the observation of
+    # the current tick and arrive before the next tick starts: late actions are discarded and
+    # an agent that sent nothing passes. Ticks run on the event loop, so serve many tables
+    # from one process and several processes for more cores. Tick percentiles are taken over
+    # the last stats_window ticks, counts, means and maxima over the whole run.
+    # Rules FiggieTables supports are played as one TableBatch, others as one Table per game,
+    # which is ~5x slower per table; batched=False forces the per-table engine.
+    def __init__(self, num_tables: int, config: FiggieConfig = DEFAULT_CONFIG, tick_interval: float = 1.0,
+                 seed=None, write_buffer_limit: int = 1 << 16, max_paused_ticks: int = 100,
+                 stats_window: int = 10_000, batched: bool = None):
+        if batched is None:
+            batched = supports_config(config)
+        if batched:
+            self.batch = TableBatch(num_tables, config, seed)
+            self.tables = self.batch.views
+        else:
+            self.batch = None
+            seeds = np.random.SeedSequence(seed).spawn(num_tables)
+            self.tables = [Table(table_id, config, table_seed) for table_id, table_seed in enumerate(seeds)]
+        self.config = config
+        self.tick_interval = tick_interval
+        self.write_buffer_limit = write_buffer_limit
+        self.max_paused_ticks = max_paused_ticks
+        self.connections = set()
+        self.tick = 0
+        self.listener = None
+        self.stats = dict.fromkeys(('actions', 'misses', 'late', 'invalid', 'dropped', 'backpressure', 'overruns'), 0)
+        # Seconds spent handling the recent ticks and the tables they played
+        self.tick_times = deque(maxlen=stats_window)
+        self.tick_tables = deque(maxlen=stats_window)
+        self.ticks_handled = 0
+        self.tables_played = 0
+        self.max_tick_time = 0.0
+
+    async def start(self, host: str = '127.0.0.1', port: int = 7777, path: str = None):
+        loop = asyncio.get_running_loop()
+        if path is not None:
+            self.listener = await loop.create_unix_server(lambda: AgentConnection(self), path)
+        else:
+            self.listener = await loop.create_server(lambda: AgentConnection(self), host, port)
+
+    async def run(self, ticks: int = None):
+        # Plays ticks ticks, forever when None
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        end = None if ticks is None else self.tick + ticks
+        while end is None or self.tick < end:
+            deadline += self.tick_interval
+            self.step()
+            delay = deadline - loop.time()
+            if delay < 0:
+                # Overran the tick, the next one gets a full interval rather than catching up
+                self.stats['overruns'] += 1
+                deadline = loop.time()
+                delay = 0
+            await asyncio.sleep(delay)
+
+    async def close(self):
+        for connection in list(self.connections):
+            connection.transport.close()
+        if self.listener is not None:
+            self.listener.close()
+            await self.listener.wait_closed()
+
+    def find_seat(self, table_id: int, seat: int):
+        # The table to seat an agent at, None when taken or out of range
+        tables = self.tables if table_id < 0 else self.tables[table_id:table_id + 1]
+        for table in tables:
+            if seat < 0 and table.seated < len(table.agents):
+                return table
+            if 0 <= seat < len(table.agents) and table.agents[seat] is None:
+                return table
+        return None
+
+    def submit(self, connection: AgentConnection, handle: int, tick: int, action: int, suit: int, price: int,
+               side: int):
+        if handle >= len(connection.seats) or connection.seats[handle] is None:
+            self.stats['invalid'] += 1
+            return
+        if tick != self.tick:
+            self.stats['late'] += 1
+            return
+        if action >= len(ACTIONS) or suit >= len(SUITS) or side >= len(SIDES) or price >= self.config.price_levels:
+            self.stats['invalid'] += 1
+            return
+        self.stats['actions'] += 1
+        table, seat = connection.seats[handle]
+        table.submit(seat, action, suit, price, side)
+
+    def step(self):
+        # One tick of every playing table, then one observation frame per connection
+        start = time.perf_counter()
+        self.tick += 1
+        tick = self.tick
+        touched = []
+        if self.batch is not None:
+            played, misses = self.batch.tick()
+            self.batch.observe(tick, touched)
+        else:
+            played = 0
+            misses = 0
+            for table in self.tables:
+                if table.seated:
+                    misses += table.tick()
+                    table.observe(tick, touched)
+                    played += 1
+        for connection in touched:
+            connection.flush(tick)
+        self.stats['misses'] += misses
+        elapsed = time.perf_counter() - start
+        self.tick_times.append(elapsed)
+        self.tick_tables.append(played)
+        self.ticks_handled += 1
+        self.tables_played += played
+        self.max_tick_time = max(self.max_tick_time, elapsed)
+
+    def summary(self) -> dict:
+        times = np.array(self.tick_times)
+        per_table = times / np.maximum(np.array(self.tick_tables), 1)
+        tick_ms = {q: float(np.percentile(times, q) * 1e3) if len(times) else 0.0 for q in (50, 99)}
+        tick_ms[100] = self.max_tick_time * 1e3
+        return {
+            'ticks': self.ticks_handled,
+            'tables': self.tables_played / max(self.ticks_handled, 1),
+            'tick_ms': tick_ms,
+            'table_us': {q: float(np.percentile(per_table, q) * 1e6) if len(times) else 0.0 for q in (50, 99, 100)},
+            **self.stats,
+        }
+
+
+def format_summary(summary: dict) -> str:
+    tick, table = summary['tick_ms'], summary['table_us']
+    return (f"{summary['ticks']} ticks of {summary['tables']:.0f} tables: tick handling p50 {tick[50]:.2f} ms, "
+            f"p99 {tick[99]:.2f} ms, max {tick[100]:.2f} ms; per table p50 {table[50]:.1f} us, p99 {table[99]:.1f} us\n"
+            f"{summary['actions']} actions, {summary['misses']} missed deadlines, {summary['late']} late and {summary['invalid']} invalid actions, "
+            f"{summary['dropped']} ticks dropped by backpressure ({summary['backpressure']} events), "
+            f"{summary['overruns']} overrun ticks")
+
+
+async def serve(num_tables: int, tick_interval: float, host: str, port: int, path: str, seed, config: FiggieConfig):
+    server = FiggieServer(num_tables, config, tick_interval, seed)
+    await server.start(host, port, path)
+    print(f'Serving {num_tables} tables on {path or f"{host}:{port}"}, one tick every {tick_interval}s')
+    try:
+        await server.run()
+    finally:
+        await server.close()
+        print(format_summary(server.summary()))
+
+
+async def load_test(num_tables: int, ticks: int, tick_interval: float, clients: int, slow_clients: int, path: str,
+                    port: int, seed, batched: bool = True):
+    # Fills every seat but one per table with simulated clients answering random actions in a
+    # separate process, then times the server over ticks ticks
+    from client import run_simulated_clients
+    config = DEFAULT_CONFIG
+    server = FiggieServer(num_tables, config, tick_interval, seed, batched=batched)
+    await server.start(port=port, path=path)
+    address = path if path is not None else ('127.0.0.1', port)
+    agents = num_tables * (config.num_players - 1)
+    start_method = 'forkserver' if 'forkserver' in mp.get_all_start_methods() else 'spawn'
+    process = mp.get_context(start_method).Process(
+        target=run_simulated_clients, args=(address, clients, agents, slow_clients, seed))
+    process.start()
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    while sum(table.seated for table in server.tables) < agents:
+        if loop.time() - started > 60 or not process.is_alive():
+            raise RuntimeError('Simulated clients did not take their seats')
+        await asyncio.sleep(0.05)
+    await server.run(ticks)
+    await server.close()
+    process.join(10)
+    return server.summary()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Real-time Figgie server for remote agents')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    serve_parser = subparsers.add_parser('serve', help='Host tables until interrupted')
+    serve_parser.add_argument('--tables', type=int, default=100)
+    serve_parser.add_argument('--tick-interval', type=float, default=1.0, help='Seconds of real time per tick')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=7777)
+    serve_parser.add_argument('--unix', default=None, help='Listen on this Unix socket path instead of TCP')
+    serve_parser.add_argument('--seed', type=int, default=None)
+    serve_parser.add_argument('--continuous', action='store_true', help='Continuous matching, see FiggieConfig')
+    load_parser = subparsers.add_parser('loadtest', help='Time the server against simulated clients')
+    load_parser.add_argument('--tables', type=int, default=200)
+    load_parser.add_argument('--ticks', type=int, default=400)
+    load_parser.add_argument('--tick-interval', type=float, default=0.05)
+    load_parser.add_argument('--clients', type=int, default=8, help='Client connections sharing the seats')
+    load_parser.add_argument('--slow-clients', type=int, default=1,
+                             help='Connections that read slowly, to exercise backpressure')
+    load_parser.add_argument('--port', type=int, default=7777)
+    load_parser.add_argument('--unix', default=None)
+    load_parser.add_argument('--seed', type=int, default=0)
+    load_parser.add_argument('--per-table', action='store_true', help='Time the per-table engine instead of the batch')
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        try:
+            asyncio.run(serve(args.tables, args.tick_interval, args.host, args.port, args.unix, args.seed,
+                              FiggieConfig(continuous=args.continuous)))
+        except KeyboardInterrupt:
+            pass
+    elif args.command == 'loadtest':
+        summary = asyncio.run(load_test(args.tables, args.ticks, args.tick_interval, args.clients, args.slow_clients,
+                                        args.unix, args.port, args.seed, not args.per_table))
+        print(format_summary(summary))
@@ -0,0 +1,133 @@
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from config import DEFAULT_CONFIG
+from vec_game import FiggieVecCore, buffer_layout
+
+# Keep every array on its own cache lines so workers never write to the same line
+ALIGNMENT = 64
+
+
+def _plan(num_tables: int):
+    offsets = {}
+    size = 0
+    for name, (shape, dtype) in buffer_layout(num_tables).items():
+        offsets[name] = (shape, dtype, size)
+        nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        size += -(-nbytes // ALIGNMENT) * ALIGNMENT
+    return offsets, max(size, 1)
+
+
+def _views(shm, offsets: dict, start: int = 0, stop: int = None) -> dict:
+    # Arrays of the buffer layout living in shm, restricted to the rows start:stop
+    return {name: np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)[start:stop]
+            for name, (shape, dtype, offset) in offsets.items()}
+
+
+def _seeds(seed, num_workers: int):
+    if seed is None:
+        return [None] * num_workers
+    return np.random.SeedSequence(seed).spawn(num_workers)
+
+
+def _slice_strategies(bot_strategies, start: int, stop: int):
+    # Per-table parameter arrays are split along with the tables, anything else is shared
+    if isinstance(bot_strategies, dict):
+        return {name: values[start:stop] if np.ndim(values) == 2 else values for name, values in bot_strategies.items()}
+    return bot_strategies
+
+
+def _worker(shm_name: str, num_tables: int, start: int, stop: int, seed, bot_strategies, action_masks: bool, config,
+            conn):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    offsets, _ = _plan(num_tables)
+    core = FiggieVecCore(stop - start, seed, _views(shm, offsets, start, stop), bot_strategies, action_masks, config)
+    try:
+        while True:
+            command, arg = conn.recv()
+            if command == 'step':
+                core.step()
+            elif command == 'reset':
+                core.reset(arg)
+            elif command == 'configure':
+                core.tables.configure(arg)
+            elif command == 'close':
+                break
+            conn.send(None)
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        # Views must be released before the block can be closed
+        del core
+        shm.close()
+        conn.close()
+
+
+class SharedRolloutPool:
+    # Process pool where each worker owns a contiguous slice of num_tables Figgie tables.
+    # Actions are read from and observations, rewards and done flags written to one
+    # shared memory block laid out as vec_game.buffer_layout, so nothing is pickled per step.
+    def __init__(self, num_tables: int, num_workers: int, seed=None, start_method: str = None, bot_strategies=None,
+                 action_masks: bool = False, config=DEFAULT_CONFIG):
+        num_workers = max(1, min(num_workers, num_tables))
+        if start_method is None:
+            # forkserver avoids forking a parent that already holds torch threads, as in SB3's SubprocVecEnv
+            start_method = 'forkserver' if 'forkserver' in mp.get_all_start_methods() else 'spawn'
+        ctx = mp.get_context(start_method)
+        offsets, size = _plan(num_tables)
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.buffers = _views(self.shm, offsets)
+        self.num_workers = num_workers
+        self.conns = []
+        self.processes = []
+        bounds = np.linspace(0, num_tables, num_workers + 1).astype(int)
+        for worker_seed, start, stop in zip(_seeds(seed, num_workers), bounds[:-1], bounds[1:]):
+            parent_conn, child_conn = ctx.Pipe()
+            args = (self.shm.name, num_tables, start, stop, worker_seed, _slice_strategies(bot_strategies, start, stop),
+                    action_masks, config, child_conn)
+            process = ctx.Process(target=_worker, args=args, daemon=True)
+            process.start()
+            child_conn.close()
+            self.conns.append(parent_conn)
+            self.processes.append(process)
+        self.closed = False
+
+    def _broadcast(self, command: str, args):
+        for conn, arg in zip(self.conns, args):
+            conn.send((command, arg))
+
+    def _wait(self):
+        for conn in self.conns:
+            conn.recv()
+
+    def reset(self, seed=None):
+        self._broadcast('reset', _seeds(seed, self.num_workers))
+        self._wait()
+
+    def configure(self, config):
+        # New rules for the tables of every worker, see FiggieTables.configure
+        self._broadcast('configure', [config] * self.num_workers)
+        self._wait()
+
+    def step_async(self):
+        self._broadcast('step', [None] * self.num_workers)
+
+    def step_wait(self):
+        self._wait()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        for conn in self.conns:
+            try:
+                conn.send(('close', None))
+            except (BrokenPipeError, EOFError):
+                pass
+        for process in self.processes:
+            process.join()
+        self.buffers = None
+        self.shm.close()
+        self.shm.unlink()
@@ -0,0 +1,125 @@
+import numpy as np
+
+from enums import *
+
+# Layout of one agent action in spill files
+ACTION_DTYPE = np.dtype([('action', np.int8), ('suit', np.int8), ('side', np.int8), ('price', np.int16)])
+
+
+def histogram_sizes(price_levels: int = 150) -> dict:
+    # Histogram bins per column, one price bin per price level of FiggieConfig
+    return {
+        'action': len(FiggieInGameAction),
+        'suit': len(FiggieSuit),
+        'side': len(FiggieSide),
+        'price': price_levels,
+    }
+
+
+HISTOGRAM_SIZES = histogram_sizes()
+
+
+class ActionTelemetry:
+    # Records agent actions into preallocated columnar ring buffers that keep the latest
+    # capacity actions, plus running histograms over every action ever recorded.
+    # Histograms are folded in and, with spill_path set, records appended to disk one chunk at
+    # a time, so memory stays flat however long training runs. The price histogram has
+    # price_levels bins, fit_prices grows it for an environment with more price levels.
+    def __init__(self, capacity: int = 65536, chunk_size: int = 4096, spill_path: str = None,
+                 price_levels: int = 150):
+        capacity = max(capacity, chunk_size)
+        capacity -= capacity % chunk_size
+        self.capacity = capacity
+        self.chunk_size = chunk_size
+        self.columns = {name: np.zeros(capacity, dtype=ACTION_DTYPE[name]) for name in ACTION_DTYPE.names}
+        self.sizes = histogram_sizes(price_levels)
+        self.counts = {name: np.zeros(size, dtype=np.int64) for name, size in self.sizes.items()}
+        # Number of actions recorded and how many of them are folded into counts / spilled
+        self.recorded = 0
+        self.folded = 0
+        self.spill_path = spill_path
+        self._spill_file = None
+
+    def fit_prices(self, price_levels: int):
+        # Grows the price histogram to price_levels bins, the counts recorded so far are kept
+        extra = price_levels - self.sizes['price']
+        if extra > 0:
+            self.sizes['price'] = price_levels
+            self.counts['price'] = np.concatenate([self.counts['price'], np.zeros(extra, dtype=np.int64)])
+
+    def record(self, action: FiggieAction):
+        i = self.recorded % self.capacity
+        columns = self.columns
+        columns['action'][i] = action.action.value
+        columns['suit'][i] = action.suit.value
+        columns['side'][i] = action.acting_intent_side.value
+        columns['price'][i] = action.price
+        self.recorded += 1
+        if self._chunk_complete():
+            self._fold()
+
+    def record_batch(self, actions: np.ndarray):
+        # actions: (N, 4) array in the MultiDiscrete [action, suit, price, side] encoding
+        actions = np.asarray(actions)
+        start = 0
+        while start < len(actions):
+            # Never write past the end of the pending chunk or of the ring
+            i = self.recorded % self.capacity
+            count = min(len(actions) - start, self.chunk_size - (self.recorded - self.folded), self.capacity - i)
+            rows = actions[start:start + count]
+            self.columns['action'][i:i + count] = rows[:, 0]
+            self.columns['suit'][i:i + count] = rows[:, 1]
+            self.columns['price'][i:i + count] = rows[:, 2]
+            self.columns['side'][i:i + count] = rows[:, 3]
+            self.recorded += count
+            start += count
+            if self._chunk_complete():
+                self._fold()
+
+    def _chunk_complete(self) -> bool:
+        # Pending records are folded before they fill a chunk or reach the end of the ring
+        return self.recorded - self.folded == self.chunk_size or self.recorded % self.capacity == 0
+
+    def _fold(self):
+        # Add the records since the last fold to the histograms and spill them
+        count = self.recorded - self.folded
+        if count == 0:
+            return
+        start = self.folded % self.capacity
+        chunk = {name: column[start:start + count] for name, column in self.columns.items()}
+        for name, size in self.sizes.items():
+            self.counts[name] += np.bincount(chunk[name], minlength=size)[:size]
+        if self.spill_path is not None:
+            records = np.empty(count, dtype=ACTION_DTYPE)
+            for name, values in chunk.items():
+                records[name] = values
+            if self._spill_file is None:
+                self._spill_file = open(self.spill_path, 'ab')
+            self._spill_file.write(records.tobytes())
+        self.folded = self.recorded
+
+    def histograms(self, last: int = None) -> dict:
+        # Counts per action / suit / side / price over every recorded action, or over the
+        # last `last` actions still held in the ring buffer
+        if last is None:
+            self._fold()
+            return {name: counts.copy() for name, counts in self.counts.items()}
+        recent = self.recent(last)
+        return {name: np.bincount(recent[name], minlength=size)[:size] for name, size in self.sizes.items()}
+
+    def recent(self, last: int) -> dict:
+        # The last actions held in the ring buffer as columns, oldest first
+        last = min(last, self.recorded, self.capacity)
+        index = np.arange(self.recorded - last, self.recorded) % self.capacity
+        return {name: column[index] for name, column in self.columns.items()}
+
+    def close(self):
+        self._fold()
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+
+
+def load_spilled(path: str) -> np.ndarray:
+    # Memory-maps a spill file as a structured ACTION_DTYPE array
+    return np.memmap(path, dtype=ACTION_DTYPE, mode='r')
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from config import FiggieConfig
+from environment import FiggieEnv
+from events import NULL_EVENTS
+from game import FiggieGame, FiggiePlayer
+from orderbook import LadderOrderBook, OrderBook
+from telemetry import ActionTelemetry
+
+
+def play_seconds(game: FiggieGame, seconds: int):
+    # Random bots as in game.play_random_game, for a number of seconds
+    for _ in range(seconds):
+        player = game.random.choice(game.players)
+        game.apply_action(player.player_id, player.generate_action(game.get_offers()))
+        game.advance_game_one_second()
+
+
+@pytest.mark.parametrize('book_class', [LadderOrderBook, OrderBook])
+@pytest.mark.parametrize('continuous', [False, True])
+def test_game_state_round_trip(book_class, continuous):
+    config = FiggieConfig(continuous=continuous)
+    game = FiggieGame([FiggiePlayer(i, config=config) for i in range(4)], book_class, config=config)
+    game.seed(3)
+    game.reset(True)
+    play_seconds(game, 120)
+    state = game.get_state()
+    restored = FiggieGame([FiggiePlayer(i, config=config) for i in range(4)], book_class, config=config)
+    restored.set_state(state)
+    assert restored.get_state() == state
+    # Both play on identically, the generator position is part of the state
+    play_seconds(game, 120)
+    play_seconds(restored, 120)
+    assert restored.get_state() == game.get_state()
+    assert restored.get_final_scores() == game.get_final_scores()
+
+
+@pytest.mark.parametrize('continuous', [False, True])
+def test_env_state_round_trip(continuous):
+    env = FiggieEnv(telemetry=ActionTelemetry(), events=NULL_EVENTS, config=FiggieConfig(continuous=continuous))
+    env.reset(seed=5)
+    env.action_space.seed(5)
+    actions = [env.action_space.sample() for _ in range(150)]
+    for action in actions[:100]:
+        env.step(action)
+    state = env.get_state()
+
+    def play():
+        # Observations may be views of buffers the next step overwrites
+        steps = []
+        for action in actions[100:]:
+            obs, reward, terminated = env.step(action)[:3]
+            steps.append(({key: np.copy(value) for key, value in obs.items()}, reward, terminated))
+        return steps
+    first = play()
+    env.set_state(state)
+    second = play()
+    for (obs, reward, terminated), (obs_again, reward_again, terminated_again) in zip(first, second):
+        assert all(np.array_equal(obs[key], obs_again[key]) for key in obs)
+        assert (reward, terminated) == (reward_again, terminated_again)
@@ -0,0 +1,29 @@
+import numpy as np
+
+from config import FiggieConfig
+from multi_agent import BOT, LEARNER, FiggieParallelEnv, SelfPlayVecEnv
+
+
+def test_self_play_set_config():
+    env = SelfPlayVecEnv(4, [LEARNER, BOT, LEARNER, BOT], seed=0)
+    env.set_config(FiggieConfig())
+    env.env_method('set_config', FiggieConfig(game_seconds=30, ante=40))
+    assert env.tables.config.ante == 40
+    obs = env.reset()
+    assert obs['own_cash'].shape == (8,)
+    for _ in range(31):
+        _, rewards, dones, _ = env.step(np.zeros((env.num_envs, 4), dtype=np.int64))
+    assert dones.all()
+
+
+def test_parallel_env_rules_follow_config():
+    config = FiggieConfig(num_players=5, ante=40, game_seconds=5)
+    env = FiggieParallelEnv(config=config)
+    observations, _ = env.reset(seed=0)
+    assert len(observations) == 5
+    done = False
+    while not done:
+        _, rewards, terminations, _, _ = env.step({agent: [0, 0, 0, 0] for agent in env.agents})
+        done = all(terminations.values())
+    # Nobody trades, so the seats share the pot of 5 antes between them
+    assert sum(rewards.values()) == 5 * 40
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from config import FiggieConfig
+from enums import *
+from orderbook import BUY, SELL, LadderOrderBook, OrderBook, SuitOrderBook
+
+SUITS = list(FiggieSuit)
+
+
+def assert_same_book(heap: OrderBook, ladder: LadderOrderBook):
+    assert heap.best_bid() == ladder.best_bid()
+    assert heap.best_ask() == ladder.best_ask()
+    assert heap.orders(BUY) == ladder.orders(BUY)
+    assert heap.orders(SELL) == ladder.orders(SELL)
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_ladder_matches_heap(seed):
+    rng = np.random.default_rng(seed)
+    heap, ladder = OrderBook(), LadderOrderBook(150)
+    for _ in range(5000):
+        op = rng.integers(10)
+        side = int(rng.integers(2))
+        if op < 6:
+            # Few prices and players, so levels hold queues and ties
+            price, player_id = int(rng.integers(20, 30)), int(rng.integers(4))
+            heap.post_order(side, price, player_id)
+            ladder.post_order(side, price, player_id)
+        elif op < 8:
+            if side == BUY:
+                assert heap.pop_best_bid() == ladder.pop_best_bid()
+            else:
+                assert heap.pop_best_ask() == ladder.pop_best_ask()
+        elif op < 9:
+            orders = heap.orders(side)
+            if orders:
+                price, player_id = orders[rng.integers(len(orders))]
+                heap.cancel(side, price, player_id)
+                ladder.cancel(side, price, player_id)
+        elif rng.random() < 0.1:
+            heap.clear()
+            ladder.clear()
+        assert_same_book(heap, ladder)
+
+
+def test_quotes_match_across_book_classes():
+    # Quote tracking posts through replace_order and cancels by player, on either book class
+    config = FiggieConfig(continuous=True)
+    rng = np.random.default_rng(0)
+    books = [SuitOrderBook(SUITS, book_class, config=config) for book_class in (OrderBook, LadderOrderBook)]
+    for _ in range(5000):
+        player_id = int(rng.integers(4))
+        suit, side = SUITS[rng.integers(4)], list(FiggieSide)[rng.integers(2)]
+        op, price = rng.integers(10), int(rng.integers(20, 30))
+        for book in books:
+            if op < 7:
+                book.replace_order(player_id, suit, price, side)
+            elif op < 9:
+                book.cancel_order(player_id, suit, side)
+            else:
+                book.cancel_player(player_id)
+        heap, ladder = books
+        assert heap.quotes == ladder.quotes
+        assert np.array_equal(heap.best_prices, ladder.best_prices)
+        for suit in SUITS:
+            assert_same_book(heap.books[suit], ladder.books[suit])
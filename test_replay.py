@@ -0,0 +1,34 @@
+import pytest
+
+from config import FiggieConfig
+from environment import FiggieEnv
+from events import NULL_EVENTS
+from replay import ReplayReader, ReplayRecorder
+from telemetry import ActionTelemetry
+
+
+@pytest.mark.parametrize('num_players', [3, 4, 5])
+def test_records_are_sized_by_the_player_count(tmp_path, num_players):
+    recorder = ReplayRecorder(str(tmp_path), num_players=num_players)
+    config = FiggieConfig(num_players=num_players, game_seconds=20)
+    env = FiggieEnv(telemetry=ActionTelemetry(), events=recorder, config=config)
+    env.reset(seed=0)
+    terminated = False
+    while not terminated:
+        _, _, terminated, _, _ = env.step(env.action_space.sample())
+    recorder.close()
+    reader = ReplayReader(str(tmp_path))
+    assert reader.num_players == num_players
+    assert len(reader.episodes) == 1
+    assert reader.episodes[0]['hands'].shape == (num_players, 4)
+    assert reader.steps['actions'].shape == (len(reader.steps), num_players, 4)
+    with pytest.raises(ValueError):
+        ReplayRecorder(str(tmp_path), num_players=num_players + 1)
+
+
+def test_a_game_of_another_player_count_is_rejected(tmp_path):
+    recorder = ReplayRecorder(str(tmp_path), num_players=4)
+    env = FiggieEnv(telemetry=ActionTelemetry(), events=NULL_EVENTS, config=FiggieConfig(num_players=3))
+    env.reset(seed=0)
+    with pytest.raises(ValueError):
+        recorder.game_start(env.game.goal_suit.value, [350] * 3, env.game.hands)
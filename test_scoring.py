@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from enums import FiggieSuit
+from game import FiggieGame, FiggiePlayer
+from scoring import MAX_GOAL_CARDS, ScoringTable
+
+
+def reference_scores(game):
+    # FiggieGame.get_final_scores before the tables
+    counts = [p.get_suit_count(game.goal_suit) for p in game.players]
+    payouts = [0, 0, 0, 0]
+    payouts[0] += 10 * counts[0]
+    payouts[1] += 10 * counts[1]
+    payouts[2] += 10 * counts[2]
+    payouts[3] += 10 * counts[3]
+    game.pot -= sum(payouts)
+    max_val = max(counts)
+    winners = [i for i, val in enumerate(counts) if val == max_val]
+    number_of_winners = len(winners)
+    for w in winners:
+        payouts[w] += game.pot / number_of_winners
+    final_cash = [player.cash for player in game.players]
+    return [x + y for x, y in zip(payouts, final_cash)]
+
+
+def test_final_scores_match_the_reference():
+    # Random games end at random points with random goal suits, pots and cash
+    rng = np.random.default_rng(0)
+    game = FiggieGame([FiggiePlayer(i) for i in range(4)])
+    game.seed(0)
+    for case in range(5000):
+        game.reset(True)
+        game.goal_suit = FiggieSuit(int(rng.integers(4)))
+        # Arbitrary holdings, including ties and the deck's extremes
+        goal = game.goal_suit.value
+        game.hands[:, goal] = rng.multinomial(int(rng.choice([8, 10])), rng.dirichlet(np.ones(4)))
+        for player in game.players:
+            player.cash = float(rng.integers(0, 1000)) if case % 2 else float(rng.integers(0, 1000)) + rng.random()
+        game.pot = int(rng.choice([200, 150, 300])) if case % 3 else 200 + rng.random()
+        pot = game.pot
+        expected = reference_scores(game)
+        expected_pot = game.pot
+        game.pot = pot
+        assert game.get_final_scores() == expected, (game.hands[:, goal], pot)
+        assert game.pot == expected_pot
+
+
+@pytest.mark.parametrize('num_players', [2, 3, 4, 5, 6, 8])
+def test_batch_payouts_match_payouts(num_players):
+    rng = np.random.default_rng(num_players)
+    table = ScoringTable(num_players)
+    counts = rng.integers(0, MAX_GOAL_CARDS + 1, (2000, num_players))
+    pot = rng.choice([50.0 * num_players, 123.5], 2000)
+    batch = table.batch_payouts(counts, pot)
+    assert all(batch[i].tolist() == table.payouts(counts[i].tolist(), pot[i]) for i in range(len(counts)))
+    if table.tabulated:
+        # Computed payouts against the tables
+        computed = ScoringTable(num_players, max_rows=0)
+        assert np.array_equal(computed.batch_payouts(counts, pot), batch)
+        assert all(computed.payouts(counts[i].tolist(), pot[i]) == batch[i].tolist() for i in range(100))
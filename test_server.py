@@ -0,0 +1,62 @@
+import pytest
+
+from config import FiggieConfig
+from enums import FiggieInGameAction
+from protocol import NEW_GAME, OBSERVATION, OBSERVATIONS_PAYLOAD, TERMINATED, unpack_observations
+from server import FiggieServer
+
+
+class Connection:
+    # Stands in for AgentConnection, keeping the records of every flushed frame
+    paused = False
+
+    def __init__(self):
+        self.records = []
+        self.frames = []
+
+    def flush(self, tick: int):
+        data = b''.join(self.records)
+        self.frames.append(unpack_observations(OBSERVATIONS_PAYLOAD.pack(tick, len(data) // OBSERVATION.size) + data))
+        self.records.clear()
+
+    def last_record(self):
+        return self.frames[-1][1][-1]
+
+
+@pytest.mark.parametrize('batched', [True, False])
+def test_action_after_the_last_tick_is_dropped(batched):
+    server = FiggieServer(2, FiggieConfig(game_seconds=3), seed=0, batched=batched)
+    connection = Connection()
+    table = server.tables[0]
+    table.sit(1, (connection, 0))
+    server.step()
+    while not connection.last_record()[-1] & TERMINATED:
+        server.step()
+    # Answers the last observation of the game, the next tick deals a new one
+    table.submit(1, FiggieInGameAction.SHOW.value, 0, 10, 0)
+    server.step()
+    assert connection.last_record()[-1] & NEW_GAME
+    if batched:
+        assert not server.batch.has_action[0].any()
+    else:
+        assert table.pending == [None] * 4
+
+
+def test_batched_records_match_the_tables():
+    server = FiggieServer(3, seed=1)
+    connection = Connection()
+    for table_id, seat, handle in ((2, 0, 0), (0, 3, 1), (2, 1, 2)):
+        server.tables[table_id].sit(seat, (connection, handle))
+    tables = server.batch.tables
+    for _ in range(5):
+        server.step()
+        tick, records = connection.frames[-1]
+        assert tick == server.tick
+        for handle, table_id, seat in ((0, 2, 0), (1, 0, 3), (2, 2, 1)):
+            record = next(record for record in records if record[0] == handle)
+            assert list(record[1:5]) == tables.book_price[table_id, :, 0].tolist()
+            assert list(record[5:9]) == tables.book_price[table_id, :, 1].tolist()
+            assert list(record[9:13]) == tables.hands[table_id, seat].tolist()
+            assert record[13] == tables.cash[table_id, seat]
+            assert record[14] == tables.seconds_passed[table_id]
+
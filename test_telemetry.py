@@ -0,0 +1,18 @@
+import numpy as np
+
+from config import FiggieConfig
+from environment import FiggieEnv
+from events import NULL_EVENTS
+from telemetry import ActionTelemetry
+
+
+def test_price_histogram_covers_the_price_levels_of_the_env():
+    telemetry = ActionTelemetry(chunk_size=64)
+    env = FiggieEnv(telemetry=telemetry, events=NULL_EVENTS, config=FiggieConfig(price_levels=400, max_cash=2000))
+    env.reset(seed=0)
+    for price in (0, 149, 150, 399):
+        env.step(np.array([1, 0, price, 0]))
+    histograms = telemetry.histograms()
+    assert len(histograms['price']) == 400
+    assert histograms['price'][[0, 149, 150, 399]].tolist() == [1, 1, 1, 1]
+    assert np.array_equal(telemetry.histograms(last=4)['price'], histograms['price'])
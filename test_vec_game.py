@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from enums import *
+from environment import FiggieEnv
+from events import NULL_EVENTS
+from telemetry import ActionTelemetry
+from vec_game import ASK, BID, NUM_PLAYERS, FiggieTables
+
+SUITS = list(FiggieSuit)
+
+
+def table_env(tables: FiggieTables, row: int) -> FiggieEnv:
+    # FiggieEnv whose game is set to the game on one row of tables, books empty
+    env = FiggieEnv(telemetry=ActionTelemetry(), events=NULL_EVENTS)
+    env.reset(seed=0)
+    game = env.game
+    game.goal_suit = SUITS[tables.goal_suit[row]]
+    game.pot = tables.pot[row].item()
+    game.seconds_passed = int(tables.seconds_passed[row])
+    game.hands[:] = tables.hands[row]
+    for player, cash in zip(game.players, tables.cash[row].tolist()):
+        player.cash = cash
+    game.orderbook.reset()
+    return env
+
+
+def assert_same_game(game, tables: FiggieTables, row: int):
+    assert np.array_equal(game.hands, tables.hands[row])
+    assert [player.cash for player in game.players] == tables.cash[row].tolist()
+    for suit in SUITS:
+        book = game.orderbook.books[suit]
+        assert book.best_bid() == (tables.book_price[row, suit.value, BID], tables.book_owner[row, suit.value, BID])
+        assert book.best_ask() == (tables.book_price[row, suit.value, ASK], tables.book_owner[row, suit.value, ASK])
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_tables_play_like_the_game(seed):
+    # The same actions applied to FiggieTables and FiggieGame leave the same books, hands and
+    # cash, and FiggieTables.action_masks agrees with FiggieEnv.action_masks all along
+    rng = np.random.default_rng(seed)
+    tables = FiggieTables(2, seed)
+    everything = np.ones(2, dtype=bool)
+    tables.reset(everything, everything)
+    env = table_env(tables, 1)
+    game = env.game
+    trades = 0
+    for _ in range(240):
+        for seat in range(NUM_PLAYERS):
+            # Low prices stay affordable, so more takes trade
+            action, suit, side = int(rng.integers(3)), int(rng.integers(4)), int(rng.integers(2))
+            price = int(rng.integers(0, 40))
+            column = np.full(2, action), np.full(2, suit), np.full(2, price), np.full(2, side)
+            tables.apply_actions(seat, *column, everything)
+            cash = [player.cash for player in game.players]
+            game.apply_action(seat, FiggieAction(FiggieInGameAction(action), SUITS[suit], FiggieSide(side), price))
+            trades += cash != [player.cash for player in game.players]
+            assert_same_game(game, tables, 1)
+            assert np.array_equal(env.action_masks(), tables.action_masks(0)[1])
+        tables.advance_game_one_second(everything)
+        game.advance_game_one_second()
+    assert trades > 0
+    assert tables.game_has_ended()[1] and game.game_has_ended()
+    assert tables.get_final_scores(np.array([1]))[0].tolist() == game.get_final_scores()
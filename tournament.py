@@ -0,0 +1,176 @@
+import argparse
+import json
+import multiprocessing as mp
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from config import DEFAULT_CONFIG, FiggieConfig
+from vec_game import NUM_PLAYERS, FiggieTables, observation_buffers
+
+BOT = 'bot'
+
+
+def load_policies(seats: list) -> list:
+    # PPO model per seat, None for bot seats. A model saved once is loaded once however
+    # many seats it plays, torch is only imported when some seat is a saved model
+    models = {}
+    policies = []
+    for seat in seats:
+        if seat == BOT:
+            policies.append(None)
+            continue
+        if seat not in models:
+            from stable_baselines3 import PPO
+            models[seat] = PPO.load(seat, device='cpu')
+        policies.append(models[seat])
+    return policies
+
+
+def play_tables(seats: list, num_tables: int, rounds: int, seed=None, deterministic: bool = False,
+                config: FiggieConfig = DEFAULT_CONFIG):
+    # Plays rounds consecutive games on num_tables tables with the rules of FiggieGame under config.
+    # As in FiggieEnv, cash carries over between games of a table and everyone starts over
+    # at full cash after a knock-out. Seats act in order every second: a policy seat acts from
+    # one batched forward pass over all tables, a bot seat through the bot policy engine.
+    # Returns the PnL of every seat per game (cash change including the ante) and whether
+    # the seat was knocked out, both of shape (num_tables * rounds, NUM_PLAYERS).
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    policies = load_policies(seats)
+    if any(policy is not None for policy in policies):
+        import torch
+        torch.manual_seed(int(seed.generate_state(1)[0]))
+    tables = FiggieTables(num_tables, seed, config=config)
+    obs = observation_buffers(num_tables)
+    everything = np.ones(num_tables, dtype=bool)
+    player_knocked_out = np.zeros(num_tables, dtype=bool)
+    pnl = np.zeros((rounds, num_tables, NUM_PLAYERS))
+    knocked = np.zeros((rounds, num_tables, NUM_PLAYERS), dtype=bool)
+    for game in range(rounds):
+        tables.reset(everything, player_knocked_out)
+        start_cash = tables.cash + config.ante
+        for _ in range(config.ticks):
+            for seat, policy in enumerate(policies):
+                if policy is None:
+                    tables.bot_actions(seat, everything)
+                    continue
+                tables.observe(seat, obs)
+                actions, _ = policy.predict(obs, deterministic=deterministic)
+                tables.apply_actions(seat, actions[:, 0], actions[:, 1], actions[:, 2], actions[:, 3], everything)
+            tables.advance_game_one_second(everything)
+        final_cash = tables.get_final_scores(tables.rows)
+        tables.cash[:] = final_cash
+        pnl[game] = final_cash - start_cash
+        knocked[game] = final_cash < config.ante
+        player_knocked_out = knocked[game].any(axis=1)
+    return pnl.reshape(-1, NUM_PLAYERS), knocked.reshape(-1, NUM_PLAYERS)
+
+
+def _play_share(args):
+    seats = args[0]
+    if any(seat != BOT for seat in seats):
+        import torch
+        # Every worker is one of many processes, more torch threads only contend for the same cores
+        torch.set_num_threads(1)
+    return play_tables(*args)
+
+
+def run_tournament(seats: list, num_tables: int, rounds: int, workers: int = 0, seed=None,
+                   deterministic: bool = False, start_method: str = None, config: FiggieConfig = DEFAULT_CONFIG):
+    # play_tables with the tables split over a pool of workers processes, 0 plays them all in this process
+    if workers <= 0:
+        return play_tables(seats, num_tables, rounds, seed, deterministic, config)
+    workers = min(workers, num_tables)
+    bounds = np.linspace(0, num_tables, workers + 1).astype(int)
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    jobs = [(seats, stop - start, rounds, worker_seed, deterministic, config)
+            for worker_seed, start, stop in zip(seeds, bounds[:-1], bounds[1:])]
+    if start_method is None:
+        # Same reasoning as shared_rollout: do not fork a parent that holds torch threads
+        start_method = 'forkserver' if 'forkserver' in mp.get_all_start_methods() else 'spawn'
+    with ProcessPoolExecutor(workers, mp_context=mp.get_context(start_method)) as pool:
+        results = list(pool.map(_play_share, jobs))
+    return np.concatenate([pnl for pnl, _ in results]), np.concatenate([knocked for _, knocked in results])
+
+
+def _rate_interval(successes: int, n: int, z: float) -> list:
+    # Wilson score interval, well behaved for rates near 0 or 1
+    if n == 0:
+        return [0.0, 0.0]
+    rate = successes / n
+    denominator = 1 + z * z / n
+    centre = (rate + z * z / (2 * n)) / denominator
+    half = z * np.sqrt(rate * (1 - rate) / n + z * z / (4 * n * n)) / denominator
+    return [float(centre - half), float(centre + half)]
+
+
+def summarize(seats: list, pnl: np.ndarray, knocked: np.ndarray, z: float = 1.96) -> list:
+    # Per seat PnL distribution, knock-out rate and z-score confidence intervals of both
+    # (z=1.96 for 95%). The PnL interval uses the normal approximation of the mean.
+    games = len(pnl)
+    summary = []
+    for seat, name in enumerate(seats):
+        seat_pnl = pnl[:, seat]
+        mean = float(seat_pnl.mean())
+        std = float(seat_pnl.std(ddof=1)) if games > 1 else 0.0
+        half = z * std / np.sqrt(games)
+        knocks = int(knocked[:, seat].sum())
+        summary.append({
+            'seat': seat,
+            'player': name,
+            'games': games,
+            'pnl_mean': mean,
+            'pnl_std': std,
+            'pnl_ci': [mean - half, mean + half],
+            'pnl_percentiles': dict(zip(['p5', 'p25', 'p50', 'p75', 'p95'],
+                                        np.percentile(seat_pnl, [5, 25, 50, 75, 95]).tolist())),
+            'knockout_rate': knocks / games,
+            'knockout_ci': _rate_interval(knocks, games, z),
+        })
+    return summary
+
+
+def print_summary(summary: list):
+    print(f'{"seat":<5}{"player":<24}{"games":>9}{"mean PnL":>11}{"95% CI":>20}{"p5":>8}{"p50":>8}{"p95":>8}'
+          f'{"knocked":>9}{"95% CI":>18}')
+    for row in summary:
+        low, high = row['pnl_ci']
+        k_low, k_high = row['knockout_ci']
+        percentiles = row['pnl_percentiles']
+        print(f'{row["seat"]:<5}{row["player"][-23:]:<24}{row["games"]:>9}{row["pnl_mean"]:>11.2f}'
+              f'{f"[{low:.2f}, {high:.2f}]":>20}{percentiles["p5"]:>8.1f}{percentiles["p50"]:>8.1f}'
+              f'{percentiles["p95"]:>8.1f}{row["knockout_rate"]:>9.3f}{f"[{k_low:.3f}, {k_high:.3f}]":>18}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Play saved PPO agents against bots or each other over many Figgie games')
+    parser.add_argument('seats', nargs='*', default=['figgie_agent', BOT, BOT, BOT],
+                        help=f'What plays each of the {NUM_PLAYERS} seats: a model saved with model.save or "{BOT}"')
+    parser.add_argument('--tables', type=int, default=1024, help='Tables played side by side, one forward pass covers all of them')
+    parser.add_argument('--rounds', type=int, default=20, help='Consecutive games per table')
+    parser.add_argument('--workers', type=int, default=0, help='Worker processes sharing the tables, 0 plays them in this process')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--deterministic', action='store_true', help='Play the most likely action of every policy')
+    parser.add_argument('--json', default=None, help='Also write the summary to this file')
+    parser.add_argument('--game-seconds', type=int, default=DEFAULT_CONFIG.game_seconds)
+    parser.add_argument('--tick-seconds', type=int, default=DEFAULT_CONFIG.tick_seconds)
+    parser.add_argument('--start-cash', type=int, default=DEFAULT_CONFIG.start_cash)
+    parser.add_argument('--ante', type=int, default=DEFAULT_CONFIG.ante)
+    args = parser.parse_args()
+    if len(args.seats) != NUM_PLAYERS:
+        parser.error(f'expected {NUM_PLAYERS} seats, got {len(args.seats)}')
+    config = FiggieConfig(start_cash=args.start_cash, ante=args.ante, game_seconds=args.game_seconds,
+                          tick_seconds=args.tick_seconds)
+
+    start = time.perf_counter()
+    pnl, knocked = run_tournament(args.seats, args.tables, args.rounds, args.workers, args.seed, args.deterministic,
+                                  config=config)
+    elapsed = time.perf_counter() - start
+    summary = summarize(args.seats, pnl, knocked)
+    print_summary(summary)
+    print(f'{len(pnl):,} games in {elapsed:.1f}s ({len(pnl) / elapsed:,.0f} games/sec)')
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
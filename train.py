@@ -1,68 +1,124 @@
-from collections import Counter
-from matplotlib import pyplot as plt
-
-import numpy as np
-from stable_baselines3 import PPO
-from stable_baselines3.common.env_checker import check_env
-from environment import FiggieEnv, action_log
+import argparse
 import logging
-
-logging.basicConfig(
-    filename='./logs/figgie.log',          # Log file name
-    level=logging.INFO,             # Log level: DEBUG, INFO, WARNING, ERROR, CRITICAL
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
-
-dummyenv = FiggieEnv('human')
-
-check_env(dummyenv)
-
-model = PPO("MultiInputPolicy", dummyenv, verbose=1)
-model.learn(total_timesteps=500_000)
-model.save("figgie_agent")
-
-def plot_actions(actions: list, suits: list, sides: list, prices: list):
-    fig, axes = plt.subplots(2, 2, figsize=(10, 8))
-    # Plot Action distribution
-    ax = axes[0][0]
-    counts = Counter([a.name for a in actions])
-
-    ax.bar(counts.keys(), counts.values())
-    ax.set_ylabel("Count")
-    ax.set_title("Action Distribution")
-
-    # Plot Suit distribution
-    ax = axes[0][1]
-    counts = Counter([a.name for a in suits])
-
-    ax.bar(counts.keys(), counts.values())
-    ax.set_ylabel("Count")
-    ax.set_title("Suit Distribution")
-
-    # Plot Side distribution
-    ax = axes[1][0]
-
-    counts = Counter([a.name for a in sides])
-
-    ax.bar(counts.keys(), counts.values())
-    ax.set_ylabel("Count")
-    ax.set_title("Side Distribution")
-
-    # Plot Prices
-    ax = axes[1][1]
-    
-    bin_counts, bin_edges = np.histogram(prices, bins=15, range=(0.0, 150))
-
-    # Bar plot
-    bin_centers = 0.5 * (bin_edges[:-1] + bin_edges[1:])
-    ax.bar(bin_centers, bin_counts, width=0.15)
-    ax.set_ylabel("Count")
-    ax.set_title("Price Histogram")
-
-# All actions
-plot_actions(action_log['action'], action_log['suit'], action_log['side'], action_log['price'])
-
-# Last 1000 actions
-plot_actions(action_log['action'][-1000:], action_log['suit'][-1000:], action_log['side'][-1000:], action_log['price'][-1000:])
-
-plt.show()
\ No newline at end of file
+import os
+
+from events import LEVELS, OFF, NULL_EVENTS, BinaryEventRecorder, LoggingEventRecorder
+
+# gymnasium, stable-baselines3 and torch are only imported by the main block and make_env:
+# spawned rollout workers import this module as their main module, and only need the game core
+
+
+def make_env(tables: int, workers: int, events=None, profiler=None, action_masks: bool = False,
+             check: bool = False):
+    # A single FiggieEnv by default, many tables per process with --tables,
+    # and tables spread over a process pool with --workers. Only the single FiggieEnv is profiled,
+    # and checked with stable-baselines3's env checker when check is set.
+    if workers > 0:
+        from vec_env import SharedMemoryFiggieVecEnv
+        return SharedMemoryFiggieVecEnv(tables, workers, action_masks=action_masks)
+    if tables > 1:
+        from vec_env import FiggieVecEnv
+        return FiggieVecEnv(tables)
+    from environment import FiggieEnv
+    if check:
+        from stable_baselines3.common.env_checker import check_env
+        # The checker seeds, steps past the end of a game and can leave the series of games with
+        # a player below the ante, so it gets its own env and the trained one starts untouched
+        check_env(FiggieEnv(events=NULL_EVENTS))
+    return FiggieEnv('human', events=events, profiler=profiler)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Train a PPO Figgie agent')
+    parser.add_argument('--tables', type=int, default=1, help='Number of Figgie tables stepped per rollout step')
+    parser.add_argument('--workers', type=int, default=0, help='Worker processes sharing the tables, 0 steps them in this process')
+    parser.add_argument('--timesteps', type=int, default=500_000)
+    parser.add_argument('--spill-actions', default=None, help='Append every agent action to this file for later analysis')
+    parser.add_argument('--events', default='./logs/figgie.events', help='Binary game event log, read it with events.py decode')
+    parser.add_argument('--event-level', choices=list(LEVELS), default='trades')
+    parser.add_argument('--text-log', action='store_true', help='Log game events as text to ./logs/figgie.log instead')
+    parser.add_argument('--profile', action='store_true', help='Time every phase of FiggieEnv.step and log it under profile/')
+    parser.add_argument('--profile-capture', type=int, default=0,
+                        help='Also run cProfile over this many steps and write ./logs/figgie.pstats')
+    parser.add_argument('--mask-actions', action='store_true',
+                        help='Train with MaskablePPO from sb3-contrib, sampling only useful actions')
+    parser.add_argument('--self-play', action='store_true',
+                        help='Learner in seat 0 against snapshots of itself in seats 1-3 on --tables tables')
+    parser.add_argument('--snapshot-every', type=int, default=50_000, help='Steps between self-play snapshots')
+    parser.add_argument('--metrics', default='./logs/metrics.jsonl',
+                        help='Append training metric snapshots here, render them with metrics.py report')
+    parser.add_argument('--metrics-every', type=int, default=10_000, help='Steps between metric snapshots')
+    parser.add_argument('--report', action='store_true', help='Render the metrics report under ./logs/report at the end')
+    parser.add_argument('--curriculum', default=None,
+                        help='Game lengths to train on in turn as SECONDS:TIMESTEPS,...,SECONDS, e.g. 30:200000,120:200000,240')
+    parser.add_argument('--check-env', action='store_true', help="Run stable-baselines3's env checker on FiggieEnv first")
+    args = parser.parse_args()
+    if (args.profile or args.profile_capture) and (args.tables > 1 or args.workers > 0 or args.self_play):
+        # Only the single FiggieEnv steps the profiler, the vector envs would never time a phase
+        # nor close the capture window
+        parser.error('--profile and --profile-capture need a single FiggieEnv: drop --tables, --workers and --self-play')
+
+    from stable_baselines3 import PPO
+    from environment import action_telemetry
+    action_telemetry.spill_path = args.spill_actions
+
+    if args.text_log:
+        logging.basicConfig(
+            filename='./logs/figgie.log',          # Log file name
+            level=logging.INFO,             # Log level: DEBUG, INFO, WARNING, ERROR, CRITICAL
+            format='%(asctime)s - %(levelname)s - %(message)s'
+        )
+        events = LoggingEventRecorder(LEVELS[args.event_level])
+    elif LEVELS[args.event_level] == OFF:
+        events = NULL_EVENTS
+    else:
+        os.makedirs(os.path.dirname(args.events) or '.', exist_ok=True)
+        events = BinaryEventRecorder(args.events, LEVELS[args.event_level])
+
+    profiler = None
+    callbacks = []
+    if args.profile or args.profile_capture:
+        from callbacks import ProfileCallback
+        from profiling import Profiler
+        profiler = Profiler()
+        callbacks.append(ProfileCallback())
+
+    algorithm = PPO
+    if args.mask_actions:
+        try:
+            from sb3_contrib import MaskablePPO
+        except ImportError:
+            parser.error('--mask-actions needs sb3-contrib: pip install sb3-contrib')
+        algorithm = MaskablePPO
+
+    if args.self_play:
+        from callbacks import SelfPlayCallback
+        from multi_agent import LEARNER, POOL, OpponentPool, SelfPlayVecEnv
+        pool = OpponentPool()
+        env = SelfPlayVecEnv(args.tables, [LEARNER, POOL, POOL, POOL], pool)
+        callbacks.append(SelfPlayCallback(pool, args.snapshot_every))
+    else:
+        env = make_env(args.tables, args.workers, events, profiler, args.mask_actions, args.check_env)
+    if args.curriculum:
+        from callbacks import CurriculumCallback
+        from config import Curriculum
+        curriculum = Curriculum.parse(args.curriculum)
+        callbacks.append(CurriculumCallback(curriculum))
+
+    from callbacks import MetricsCallback
+    callbacks.append(MetricsCallback(args.metrics, args.metrics_every))
+
+    model = algorithm("MultiInputPolicy", env, verbose=1)
+    if args.profile_capture:
+        os.makedirs('./logs', exist_ok=True)
+        profiler.capture(args.profile_capture, './logs/figgie.pstats')
+    model.learn(total_timesteps=args.timesteps, callback=callbacks)
+    model.save("figgie_agent")
+    env.close()
+    action_telemetry.close()
+    events.close()
+
+    if args.report:
+        from metrics import render_report
+        for path in render_report(args.metrics, './logs/report'):
+            print(f'Wrote {path}')
@@ -0,0 +1,141 @@
+import numpy as np
+from stable_baselines3.common.vec_env.base_vec_env import VecEnv
+
+from config import DEFAULT_CONFIG, FiggieConfig
+from environment import action_telemetry, figgie_action_space, figgie_observation_space
+from vec_game import FiggieVecCore, OBS_SHAPES
+
+
+class InProcessVecEnv(VecEnv):
+    # VecEnv whose environments all live in this object, so attributes and methods are the
+    # same for every index. Subclasses compute action_masks for every env at once.
+    def _indices(self, indices):
+        if indices is None:
+            return range(self.num_envs)
+        if isinstance(indices, int):
+            return [indices]
+        return indices
+
+    def get_attr(self, attr_name, indices=None):
+        value = getattr(self, attr_name)
+        return [value for _ in self._indices(indices)]
+
+    def set_attr(self, attr_name, value, indices=None):
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        result = getattr(self, method_name)(*method_args, **method_kwargs)
+        if method_name == 'action_masks':
+            # Computed for every table at once, each env gets its own row as from a FiggieEnv
+            return [result[i] for i in self._indices(indices)]
+        return [result for _ in self._indices(indices)]
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._indices(indices)]
+
+    def render(self, mode=None):
+        return None
+
+
+class FiggieVecEnv(InProcessVecEnv):
+    # Steps num_envs Figgie tables at once with vectorized NumPy ops.
+    # Seat 0 on every table is the agent, seats 1-3 are random bots as in FiggieEnv.
+    # Tables are reset automatically when their game ends, following the VecEnv convention.
+    # bot_strategies tunes the bots, see FiggieVecCore. Agent actions go to telemetry,
+    # by default the same environment.action_telemetry as FiggieEnv.
+    def __init__(self, num_envs: int, seed=None, render_mode=None, bot_strategies=None, telemetry=None,
+                 config: FiggieConfig = DEFAULT_CONFIG):
+        self.render_mode = render_mode
+        self.telemetry = action_telemetry if telemetry is None else telemetry
+        self.core = FiggieVecCore(num_envs, seed, bot_strategies=bot_strategies, config=config)
+        super().__init__(num_envs, figgie_observation_space(config=config), figgie_action_space(config))
+
+    @property
+    def buffers(self) -> dict:
+        return self.core.buffers
+
+    def _obs_from_buf(self):
+        return {key: self.buffers[key].copy() for key in OBS_SHAPES}
+
+    def _step_results(self):
+        buffers = self.buffers
+        dones = buffers['dones'].copy()
+        infos = [{} for _ in range(self.num_envs)]
+        for row in np.flatnonzero(dones):
+            infos[row]['terminal_observation'] = {key: buffers['terminal_' + key][row].copy() for key in OBS_SHAPES}
+            infos[row]['TimeLimit.truncated'] = False
+        return self._obs_from_buf(), buffers['rewards'].copy(), dones, infos
+
+    def reset(self):
+        self.core.reset(self._seeds[0])
+        self._reset_seeds()
+        self._reset_options()
+        return self._obs_from_buf()
+
+    def set_config(self, config: FiggieConfig):
+        # New rules for every table, see FiggieTables.configure and FiggieEnv.set_config
+        if config.game_seconds >= self.observation_space['time_left'].n:
+            raise ValueError(f'Games of {config.game_seconds} seconds do not fit the observation space')
+        self.core.tables.configure(config)
+
+    def action_masks(self) -> np.ndarray:
+        # (num_envs, 159) factored masks of the agent's useful actions, see FiggieEnv.action_masks
+        return self.core.tables.action_masks(0)
+
+    def step_async(self, actions: np.ndarray):
+        np.copyto(self.buffers['actions'], actions, casting='unsafe')
+        self.telemetry.record_batch(actions)
+
+    def step_wait(self):
+        self.core.step()
+        return self._step_results()
+
+    def close(self):
+        pass
+
+
+class SharedMemoryFiggieVecEnv(FiggieVecEnv):
+    # FiggieVecEnv whose tables are split over a pool of worker processes.
+    # Every worker steps its own slice of tables and writes observations, rewards and done
+    # flags straight into one shared memory block, only a short command crosses the pipe per step.
+    # Workers only compute action masks along with the observations when action_masks is set.
+    def __init__(self, num_envs: int, num_workers: int, seed=None, render_mode=None, start_method=None,
+                 bot_strategies=None, telemetry=None, action_masks: bool = False, config: FiggieConfig = DEFAULT_CONFIG):
+        from shared_rollout import SharedRolloutPool
+        self.render_mode = render_mode
+        self.telemetry = action_telemetry if telemetry is None else telemetry
+        self.masked = action_masks
+        self.pool = SharedRolloutPool(num_envs, num_workers, seed, start_method, bot_strategies, action_masks, config)
+        VecEnv.__init__(self, num_envs, figgie_observation_space(config=config), figgie_action_space(config))
+
+    @property
+    def buffers(self) -> dict:
+        return self.pool.buffers
+
+    def reset(self):
+        self.pool.reset(self._seeds[0])
+        self._reset_seeds()
+        self._reset_options()
+        return self._obs_from_buf()
+
+    def set_config(self, config: FiggieConfig):
+        if config.game_seconds >= self.observation_space['time_left'].n:
+            raise ValueError(f'Games of {config.game_seconds} seconds do not fit the observation space')
+        self.pool.configure(config)
+
+    def action_masks(self) -> np.ndarray:
+        if not self.masked:
+            raise ValueError('Create the SharedMemoryFiggieVecEnv with action_masks=True to get action masks')
+        return self.buffers['action_masks'].copy()
+
+    def step_async(self, actions: np.ndarray):
+        np.copyto(self.buffers['actions'], actions, casting='unsafe')
+        self.telemetry.record_batch(actions)
+        self.pool.step_async()
+
+    def step_wait(self):
+        self.pool.step_wait()
+        return self._step_results()
+
+    def close(self):
+        self.pool.close()
@@ -0,0 +1,331 @@
+import numpy as np
+
+from bots import BotPolicyEngine, BotStrategy, strategy_params
+from config import DEFAULT_CONFIG, FiggieConfig
+from enums import *
+from scoring import scoring_table
+
+NUM_PLAYERS = 4
+NUM_SUITS = 4
+# Rules of the default game, FiggieTables.config holds the ones in play
+START_CASH = DEFAULT_CONFIG.start_cash
+ANTE = DEFAULT_CONFIG.ante
+GAME_SECONDS = DEFAULT_CONFIG.game_seconds
+# The deck holds at most 12 + 10 + 10 + 10 cards
+MAX_DECK_SIZE = 42
+
+# Last axis of the book arrays, indexed by FiggieSide value
+BID = FiggieSide.BUY.value
+ASK = FiggieSide.SELL.value
+
+# Highest price of the action space and the layout of the factored action masks:
+# [action (3), suit (4), price (150), side (2)]
+MAX_PRICE = 149
+MASK_SIZE = 3 + NUM_SUITS + MAX_PRICE + 1 + 2
+MASK_SPLITS = [3, 3 + NUM_SUITS, 3 + NUM_SUITS + MAX_PRICE + 1]
+# Row k marks the prices >= k (_AT_LEAST) or < k (_BELOW), k = 0..MAX_PRICE + 1,
+# so price ranges of many tables are gathered instead of compared
+_AT_LEAST = np.arange(MAX_PRICE + 1)[None, :] >= np.arange(MAX_PRICE + 2)[:, None]
+_BELOW = ~_AT_LEAST
+
+PASS = FiggieInGameAction.PASS.value
+SHOW = FiggieInGameAction.SHOW.value
+TAKE = FiggieInGameAction.TAKE.value
+
+
+def supports_config(config: FiggieConfig) -> bool:
+    # Whether FiggieTables can play games with these rules, see FiggieTables.configure
+    return config.num_players == NUM_PLAYERS and config.price_levels == MAX_PRICE + 1 and not config.continuous
+
+
+class FiggieTables:
+    # N Figgie tables held as struct-of-arrays state, following the rules of FiggieGame.
+    # Only the best quote of every book is kept: the game only ever reads the top of book
+    # and wipes all books after a trade attempt, so deeper levels are never observed.
+    def __init__(self, num_tables: int, seed=None, strategies=None, config: FiggieConfig = DEFAULT_CONFIG):
+        # strategies configures the bots as accepted by bots.strategy_params, one column per seat
+        self.configure(config)
+        n = num_tables
+        self.num_tables = n
+        self.rng = np.random.default_rng(seed)
+        self.hands = np.zeros((n, NUM_PLAYERS, NUM_SUITS), dtype=np.int64)
+        self.cash = np.full((n, NUM_PLAYERS), float(config.start_cash))
+        # Best bid / ask price and owner per suit, owner -1 means empty book
+        self.book_price = np.zeros((n, NUM_SUITS, 2), dtype=np.int64)
+        self.book_owner = np.full((n, NUM_SUITS, 2), -1, dtype=np.int64)
+        self.goal_suit = np.zeros(n, dtype=np.int64)
+        self.pot = np.zeros(n)
+        self.scoring = scoring_table(NUM_PLAYERS)
+        self.seconds_passed = np.zeros(n, dtype=np.int64)
+        self.rows = np.arange(n)
+        self._deck_pos = np.arange(MAX_DECK_SIZE)
+        self.bots = BotPolicyEngine(strategy_params(strategies, n, NUM_PLAYERS))
+
+    def seed(self, seed=None):
+        self.rng = np.random.default_rng(seed)
+
+    def configure(self, config: FiggieConfig):
+        # Cash, ante and game length apply to every table from now on: new cash and antes at
+        # the next reset of a table, the game length to games in progress too. The arrays
+        # are laid out for NUM_PLAYERS players and MAX_PRICE, which cannot change, and only
+        # hold the top of every book, as the original rules need.
+        if not supports_config(config):
+            raise ValueError(f'FiggieTables plays {NUM_PLAYERS} player games priced 0..{MAX_PRICE} without continuous matching')
+        self.config = config
+
+    def reset(self, mask: np.ndarray, player_knocked_out: np.ndarray):
+        # Start a new game on every table where mask is set, restoring cash where a player was knocked out
+        rows = np.flatnonzero(mask)
+        k = len(rows)
+        if k == 0:
+            return
+        config = self.config
+        self.cash[rows[player_knocked_out[rows]]] = config.start_cash
+        self.cash[rows] -= config.ante
+        self.pot[rows] = config.ante * NUM_PLAYERS
+        self.seconds_passed[rows] = 0
+        self.clear_books(rows)
+        goal_suit = self.rng.integers(NUM_SUITS, size=k)
+        self.goal_suit[rows] = goal_suit
+        self.hands[rows] = self._deal(goal_suit)
+
+    def _deal(self, goal_suit: np.ndarray) -> np.ndarray:
+        k = len(goal_suit)
+        local = np.arange(k)
+        # Deck layout as in FiggieGame._build_deck: the same-colour suit holds 12 cards,
+        # the goal suit 8 or 10 and the remaining two suits 10 each
+        deck_counts = np.full((k, NUM_SUITS), 10, dtype=np.int64)
+        deck_counts[local, (goal_suit + 2) % NUM_SUITS] = 12
+        deck_counts[local, goal_suit] = np.where(self.rng.random(k) < 0.5, 8, 10)
+        # Suit of every deck position, NUM_SUITS marks positions past the end of the deck
+        cum_counts = np.cumsum(deck_counts, axis=1)
+        cards = (self._deck_pos[None, :, None] >= cum_counts[:, None, :]).sum(axis=2)
+        # Shuffle by sorting random keys, pushing the padding to the end of every deck
+        keys = self.rng.random((k, MAX_DECK_SIZE))
+        keys[cards == NUM_SUITS] = 2.0
+        shuffled = np.take_along_axis(cards, np.argsort(keys, axis=1), axis=1)
+        # Deal round-robin: deck position i goes to player i % NUM_PLAYERS
+        seat = self._deck_pos % NUM_PLAYERS
+        idx = (local[:, None] * NUM_PLAYERS + seat[None, :]) * (NUM_SUITS + 1) + shuffled
+        counts = np.bincount(idx.ravel(), minlength=k * NUM_PLAYERS * (NUM_SUITS + 1))
+        return counts.reshape(k, NUM_PLAYERS, NUM_SUITS + 1)[:, :, :NUM_SUITS]
+
+    def clear_books(self, rows):
+        self.book_price[rows] = 0
+        self.book_owner[rows] = -1
+
+    def advance_game_one_second(self, mask: np.ndarray):
+        config = self.config
+        if config.tick_seconds == 1:
+            self.seconds_passed[mask] += 1
+        else:
+            self.seconds_passed[mask] = np.minimum(self.seconds_passed[mask] + config.tick_seconds, config.game_seconds)
+
+    def game_has_ended(self) -> np.ndarray:
+        return self.seconds_passed >= self.config.game_seconds
+
+    def apply_actions(self, seat: int, action: np.ndarray, suit: np.ndarray, price: np.ndarray,
+                      side: np.ndarray, mask: np.ndarray):
+        # Vectorized FiggieGame.apply_action for one seat on every table where mask is set
+        show = np.flatnonzero(mask & (action == SHOW))
+        if len(show):
+            self._post_orders(seat, show, suit[show], price[show], side[show])
+        take = np.flatnonzero(mask & (action == TAKE))
+        if len(take):
+            # Intent BUY accepts the best ask, intent SELL accepts the best bid
+            self._accept_best_prices(seat, take, suit[take], 1 - side[take])
+
+    def _post_orders(self, seat: int, rows, suit, price, side):
+        best_price = self.book_price[rows, suit, side]
+        # Equal prices keep the earlier quote, as the heap orders ties by arrival
+        better = np.where(side == BID, price > best_price, price < best_price)
+        better |= self.book_owner[rows, suit, side] == -1
+        rows, suit, price, side = rows[better], suit[better], price[better], side[better]
+        self.book_price[rows, suit, side] = price
+        self.book_owner[rows, suit, side] = seat
+
+    def _accept_best_prices(self, aggressor: int, rows, suit, best_price_side):
+        counterpart = self.book_owner[rows, suit, best_price_side]
+        # Do not allow trading with oneself or accept non-existing order
+        valid = (counterpart != -1) & (counterpart != aggressor)
+        rows, suit, best_price_side, counterpart = rows[valid], suit[valid], best_price_side[valid], counterpart[valid]
+        price = self.book_price[rows, suit, best_price_side]
+        # Counterpart is seller when the best price sits on the ask side
+        seller = np.where(best_price_side == ASK, counterpart, aggressor)
+        buyer = np.where(best_price_side == ASK, aggressor, counterpart)
+        # Seller must hold the card to trade AND buyer must have enough cash
+        ok = (self.hands[rows, seller, suit] > 0) & (self.cash[rows, buyer] >= price)
+        t_rows, t_suit, t_price = rows[ok], suit[ok], price[ok]
+        seller, buyer = seller[ok], buyer[ok]
+        self.hands[t_rows, seller, t_suit] -= 1
+        self.hands[t_rows, buyer, t_suit] += 1
+        self.cash[t_rows, seller] += t_price
+        self.cash[t_rows, buyer] -= t_price
+        self.clear_books(rows)
+
+    def bot_actions(self, seat: int, mask: np.ndarray):
+        # Vectorized FiggiePlayer.generate_action for one seat on every table
+        actions = self.bots.act(self.book_price[:, :, BID], self.book_price[:, :, ASK],
+                                self.hands[:, seat:seat + 1], self.cash[:, seat:seat + 1], self.rng, [seat])[:, 0]
+        self.apply_actions(seat, actions[:, 0], actions[:, 1], actions[:, 2], actions[:, 3], mask)
+
+    def observe(self, seat: int, out: dict):
+        # Writes the FiggieEnv observation of one seat on every table into the arrays of out
+        np.copyto(out['best_buys'], self.book_price[:, :, BID])
+        np.copyto(out['best_sells'], self.book_price[:, :, ASK])
+        np.minimum(self.hands[:, seat], OBS_MAX_CARDS, out=out['own_cards'])
+        # Cash can become fractional after a split pot, the observation holds whole units
+        np.copyto(out['own_cash'], np.clip(self.cash[:, seat], 0, OBS_MAX_CASH), casting='unsafe')
+        np.copyto(out['time_left'], self.seconds_passed)
+
+    def action_masks(self, seat: int, out: np.ndarray = None) -> np.ndarray:
+        # Batched FiggieEnv.action_masks for one seat on every table, (N, 3 + 4 + 150 + 2) bools
+        n = self.num_tables
+        if out is None:
+            out = np.empty((n, MASK_SIZE), dtype=bool)
+        action, suit_mask, price_mask, side_mask = np.split(out, MASK_SPLITS, axis=1)
+        cash = np.floor(self.cash[:, seat]).astype(np.int64)[:, None]
+        held = self.hands[:, seat] > 0
+        bid_price, ask_price = self.book_price[:, :, BID], self.book_price[:, :, ASK]
+        bid_owner, ask_owner = self.book_owner[:, :, BID], self.book_owner[:, :, ASK]
+        take_buy = (ask_owner != -1) & (ask_owner != seat) & (cash >= ask_price)
+        take_sell = (bid_owner != -1) & (bid_owner != seat) & held
+        bid_low = np.where(bid_owner != -1, bid_price + 1, 0)
+        bid_high = np.minimum(cash, MAX_PRICE)
+        ask_high = np.where(ask_owner != -1, ask_price - 1, MAX_PRICE)
+        show_buy = bid_low <= bid_high
+        show_sell = held & (ask_high >= 0)
+        # Every bid range ends at the same bid_high and every ask range starts at 0, so the
+        # allowed prices are one range from the lowest useful bid and one up to the highest useful ask
+        lowest_bid = np.where(show_buy, bid_low, MAX_PRICE + 1).min(axis=1)
+        highest_ask = np.where(show_sell, ask_high, -1).max(axis=1)
+        np.logical_or(_AT_LEAST[lowest_bid] & _BELOW[bid_high[:, 0] + 1], _BELOW[highest_ask + 1], out=price_mask)
+        np.logical_or(show_buy | show_sell, take_buy | take_sell, out=suit_mask)
+        action[:, PASS] = True
+        np.any(show_buy | show_sell, axis=1, out=action[:, SHOW])
+        np.any(take_buy | take_sell, axis=1, out=action[:, TAKE])
+        np.any(show_buy | take_buy, axis=1, out=side_mask[:, BID])
+        np.any(show_sell | take_sell, axis=1, out=side_mask[:, ASK])
+        # Dimensions without any useful value stay fully allowed
+        for block in (suit_mask, price_mask, side_mask):
+            block[~block.any(axis=1)] = True
+        return out
+
+    def get_final_scores(self, rows) -> np.ndarray:
+        # Vectorized FiggieGame.get_final_scores, returns (len(rows), NUM_PLAYERS) final cash
+        counts = self.hands[rows, :, self.goal_suit[rows]]
+        return self.scoring.batch_payouts(counts, self.pot[rows]) + self.cash[rows]
+
+
+# Bounds of the observation space in environment.figgie_observation_space
+OBS_MAX_CARDS = 12
+OBS_MAX_CASH = 1199
+
+OBS_SHAPES = {
+    'best_buys': (NUM_SUITS,),
+    'best_sells': (NUM_SUITS,),
+    'own_cards': (NUM_SUITS,),
+    'own_cash': (),
+    'time_left': (),
+}
+
+
+def observation_buffers(num_tables: int) -> dict:
+    # Arrays for FiggieTables.observe, one row per table
+    return {key: np.zeros((num_tables, *shape), dtype=np.int64) for key, shape in OBS_SHAPES.items()}
+
+
+def buffer_layout(num_tables: int) -> dict:
+    # Name -> (shape, dtype) of every array exchanged per step, observations use the
+    # same keys as the FiggieEnv observation space and terminal_<key> holds the last
+    # observation of tables that were reset during the step
+    layout = {'actions': ((num_tables, 4), np.int64)}
+    for key, shape in OBS_SHAPES.items():
+        layout[key] = ((num_tables, *shape), np.int64)
+    for key, shape in OBS_SHAPES.items():
+        layout['terminal_' + key] = ((num_tables, *shape), np.int64)
+    layout['action_masks'] = ((num_tables, MASK_SIZE), np.bool_)
+    layout['rewards'] = ((num_tables,), np.float32)
+    layout['dones'] = ((num_tables,), np.bool_)
+    return layout
+
+
+def _with_agent_seat(bot_strategies):
+    # Bot strategies for seats 1-3 padded to cover the agent seat, whose column is never used
+    if bot_strategies is None or isinstance(bot_strategies, BotStrategy):
+        return bot_strategies
+    if isinstance(bot_strategies, dict):
+        padded = {}
+        for name, values in bot_strategies.items():
+            values = np.asarray(values)
+            padded[name] = np.concatenate([values[..., :1], values], axis=-1) if values.ndim else values
+        return padded
+    return [BotStrategy()] + list(bot_strategies)
+
+
+class FiggieVecCore:
+    # Agent-side episode logic of FiggieEnv for N tables: seat 0 acts from buffers['actions'],
+    # seats 1-3 are bots, finished tables are scored and reset in place.
+    # All inputs and outputs live in buffers so they can be backed by shared memory.
+    # bot_strategies is one BotStrategy, one per bot seat or a dict of parameter arrays.
+    # With action_masks set, buffers['action_masks'] is refreshed along with the observations.
+    def __init__(self, num_tables: int, seed=None, buffers: dict = None, bot_strategies=None,
+                 action_masks: bool = False, config: FiggieConfig = DEFAULT_CONFIG):
+        self.num_tables = num_tables
+        self.action_masks = action_masks
+        self.tables = FiggieTables(num_tables, seed, _with_agent_seat(bot_strategies), config)
+        if buffers is None:
+            buffers = {name: np.zeros(shape, dtype=dtype) for name, (shape, dtype) in buffer_layout(num_tables).items()}
+        self.buffers = buffers
+        self.player_knocked_out = np.zeros(num_tables, dtype=bool)
+        self.player_start_cash = np.zeros(num_tables)
+
+    def _update_obs(self):
+        self.tables.observe(0, self.buffers)
+        if self.action_masks:
+            self.tables.action_masks(0, self.buffers['action_masks'])
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.tables.seed(seed)
+        everything = np.ones(self.num_tables, dtype=bool)
+        self.tables.reset(everything, self.player_knocked_out)
+        self.player_knocked_out[:] = False
+        self.player_start_cash[:] = self.tables.cash[:, 0]
+        self._update_obs()
+
+    def step(self):
+        tables = self.tables
+        buffers = self.buffers
+        actions = buffers['actions']
+        ended = tables.game_has_ended()
+        running = ~ended
+        # Agent acts, then the bots act in seat order, as in FiggieEnv.step
+        tables.apply_actions(0, actions[:, 0], actions[:, 1], actions[:, 2], actions[:, 3], running)
+        for seat in range(1, NUM_PLAYERS):
+            tables.bot_actions(seat, running)
+        tables.advance_game_one_second(running)
+
+        rewards = buffers['rewards']
+        rewards[:] = 0
+        np.copyto(buffers['dones'], ended)
+        rows = np.flatnonzero(ended)
+        if len(rows):
+            final_cash_from_round = tables.get_final_scores(rows)
+            tables.cash[rows] = final_cash_from_round
+            # Reward agent relative to how it placed in the round
+            agent_payout = final_cash_from_round[:, 0]
+            reward = agent_payout - self.player_start_cash[rows]
+            # If the agent is the one that cannot pay the ante assign punishment
+            ante = tables.config.ante
+            reward[agent_payout < ante] = -1000
+            rewards[rows] = reward
+            # If any player cannot pay the next ante, reset all players cash to restart a series of games
+            self.player_knocked_out[rows] = (final_cash_from_round < ante).any(axis=1)
+            # The observation of a finished table is the one from its last step
+            for key in OBS_SHAPES:
+                buffers['terminal_' + key][rows] = buffers[key][rows]
+            tables.reset(ended, self.player_knocked_out)
+            self.player_knocked_out[rows] = False
+            self.player_start_cash[rows] = tables.cash[rows, 0]
+        self._update_obs()